@@ -0,0 +1,300 @@
+"""
+Transit-to-Natal Aspect Engine
+
+Finds the aspects between transit planets and natal planets that go into
+the prediction prompt (the 10 tightest, see calculate_aspects).
+
+All transit x natal x aspect combinations are computed as NumPy arrays in
+one pass. Without NumPy the same rules run as a plain Python loop.
+
+For one day's transits, get_aspect_table returns a shared AspectTable:
+0.1 degree bins over 0-360 listing the (transit, aspect) pairs a natal
+point in the bin can form. Predictions (the scheduler's batch runs and
+on-demand generation) then resolve each natal point by one bin lookup
+plus exact orbs for its few candidates - O(natal points) per user.
+
+Results are identical to the original GeminiClient loop: same orbs,
+rounding, tie order and top 10.
+
+Benchmark against the old implementation with:
+    python benchmark_aspects.py
+"""
+import os
+import math
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any
+
+try:
+    import numpy as np
+except ImportError:
+    print("WARNING: numpy not installed. Aspects will be calculated without vectorisation.")
+    np = None
+
+
+# Aspect definitions: name, angle, orb_allowed
+ASPECT_DEFINITIONS = [
+    ("Conjunction", 0, 8),
+    ("Sextile", 60, 4),
+    ("Square", 90, 6),
+    ("Trine", 120, 6),
+    ("Opposition", 180, 8)
+]
+
+# House meanings for effect descriptions
+HOUSE_MEANINGS = {
+    1: "Self and identity",
+    2: "Finances and values",
+    3: "Communication and learning",
+    4: "Home and family",
+    5: "Creativity and self-expression",
+    6: "Work and health",
+    7: "Partnerships and relationships",
+    8: "Transformation and shared resources",
+    9: "Higher learning and travel",
+    10: "Career and public image",
+    11: "Friends and aspirations",
+    12: "Spirituality and subconscious"
+}
+
+SIGN_ORDER = ["Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
+              "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"]
+SIGN_INDEX = {sign: index for index, sign in enumerate(SIGN_ORDER)}
+
+MAX_ASPECTS = 10
+
+# Aspect lookup tables: bins over 0-360 (0.1 degree each) and number of tables kept
+ASPECT_TABLE_BINS = 3600
+ASPECT_TABLE_CACHE = int(os.getenv("ASPECT_TABLE_CACHE", "8"))
+
+# Separation ranges of the aspects (angle +- orb), ascending
+_ASPECT_WINDOWS = sorted(
+    (angle - orb, angle + orb, index, angle)
+    for index, (_, angle, orb) in enumerate(ASPECT_DEFINITIONS)
+)
+
+if np is not None:
+    _ASPECT_ANGLES = np.array([angle for _, angle, _ in ASPECT_DEFINITIONS], dtype=float)
+    _ASPECT_ORBS = np.array([orb for _, _, orb in ASPECT_DEFINITIONS], dtype=float)
+
+
+def _positions(planets: list) -> tuple:
+    """
+    Longitudes and sign offsets of a planet list.
+
+    The longitude is "lon", falling back to "degree". The sign offset is
+    used when both sides only have a degree within the sign (< 30).
+    """
+    lons = [planet.get("lon", planet.get("degree", 0)) for planet in planets]
+    offsets = [SIGN_INDEX.get(planet.get("sign", "Aries"), 0) * 30 for planet in planets]
+    return lons, offsets
+
+
+def _aspect_entry(transit: dict, natal: dict, aspect_index: int, diff: float, orb: float) -> Dict[str, Any]:
+    return {
+        "transit_planet": transit.get("planet", "Unknown"),
+        "natal_planet": natal.get("planet", "Unknown"),
+        "aspect": ASPECT_DEFINITIONS[aspect_index][0],
+        "angle": round(diff, 1),
+        "orb": round(orb, 1),
+        "house_effect": HOUSE_MEANINGS.get(natal.get("house", 1), "General life areas")
+    }
+
+
+def _top_aspects(candidates: list, natal_chart: list, current_transits: list) -> list:
+    """
+    Build the aspect dicts of the tightest candidates.
+
+    Candidates are (transit_index, natal_index, aspect_index, diff, orb) in
+    loop order. Sorted by the rounded orb; the sort is stable, so ties keep
+    loop order (as in the original implementation).
+    """
+    candidates.sort(key=lambda candidate: round(candidate[4], 1))
+    return [
+        _aspect_entry(current_transits[t_index], natal_chart[n_index], a_index, diff, orb)
+        for t_index, n_index, a_index, diff, orb in candidates[:MAX_ASPECTS]
+    ]
+
+
+def calculate_aspects(natal_chart: list, current_transits: list) -> List[Dict[str, Any]]:
+    """
+    Calculate aspects between natal and transit planets.
+
+    Args:
+        natal_chart: Natal planets (planet, sign, degree, lon, house)
+        current_transits: Transit planets in the same format
+
+    Returns:
+        Top 10 tightest aspects (transit_planet, natal_planet, aspect, angle, orb, house_effect)
+    """
+    if np is None or not natal_chart or not current_transits:
+        return _calculate_aspects_python(natal_chart, current_transits)
+    return _calculate_aspects_numpy(natal_chart, current_transits)
+
+
+def _calculate_aspects_numpy(natal_chart: list, current_transits: list) -> List[Dict[str, Any]]:
+    """Same as calculate_aspects, with every combination computed as NumPy arrays."""
+    transit_lons, transit_offsets = _positions(current_transits)
+    natal_lons, natal_offsets = _positions(natal_chart)
+
+    # Shapes: transits x natal planets
+    t_lon = np.array(transit_lons, dtype=float)[:, None]
+    n_lon = np.array(natal_lons, dtype=float)[None, :]
+    sign_based = (t_lon < 30) & (n_lon < 30)
+    t_abs = np.where(sign_based, t_lon + np.array(transit_offsets, dtype=float)[:, None], t_lon)
+    n_abs = np.where(sign_based, n_lon + np.array(natal_offsets, dtype=float)[None, :], n_lon)
+
+    diff = np.abs(t_abs - n_abs)
+    diff = np.where(diff > 180, 360 - diff, diff)
+
+    # transits x natal planets x aspects
+    orbs = np.abs(diff[..., None] - _ASPECT_ANGLES)
+    t_idx, n_idx, a_idx = np.nonzero(orbs <= _ASPECT_ORBS)
+    if not len(t_idx):
+        return []
+    match_diff = diff[t_idx, n_idx]
+    match_orb = orbs[t_idx, n_idx, a_idx]
+
+    # Pre-select with the NumPy-rounded orb. np.round may differ from
+    # round() by one step, so everything within 0.1 of the 10th tightest is
+    # kept and the exact sort happens in _top_aspects. np.nonzero walks the
+    # array in C order, so the candidates stay in transit, natal, aspect
+    # loop order.
+    selected = slice(None)
+    if len(match_orb) > MAX_ASPECTS:
+        rounded = np.round(match_orb, 1)
+        cutoff = np.partition(rounded, MAX_ASPECTS - 1)[MAX_ASPECTS - 1] + 0.1 + 1e-9
+        selected = rounded <= cutoff
+    candidates = list(zip(
+        t_idx[selected].tolist(),
+        n_idx[selected].tolist(),
+        a_idx[selected].tolist(),
+        match_diff[selected].tolist(),
+        match_orb[selected].tolist()
+    ))
+    return _top_aspects(candidates, natal_chart, current_transits)
+
+
+def _calculate_aspects_python(natal_chart: list, current_transits: list) -> List[Dict[str, Any]]:
+    """Same as calculate_aspects, without NumPy."""
+    candidates = []
+    natal_lons, natal_offsets = _positions(natal_chart)
+    transit_lons, transit_offsets = _positions(current_transits)
+
+    for t_index, (transit_lon, transit_offset) in enumerate(zip(transit_lons, transit_offsets)):
+        for n_index, (natal_lon, natal_offset) in enumerate(zip(natal_lons, natal_offsets)):
+            t_abs, n_abs = transit_lon, natal_lon
+            # If we only have sign degrees (0-30), estimate absolute longitude
+            if t_abs < 30 and n_abs < 30:
+                t_abs += transit_offset
+                n_abs += natal_offset
+
+            diff = abs(t_abs - n_abs)
+            if diff > 180:
+                diff = 360 - diff
+
+            for low, high, a_index, aspect_angle in _ASPECT_WINDOWS:
+                if diff < low:
+                    break
+                if diff <= high:
+                    candidates.append((t_index, n_index, a_index, diff, abs(diff - aspect_angle)))
+
+    return _top_aspects(candidates, natal_chart, current_transits)
+
+
+def _has_longitudes(planets: list) -> bool:
+    """
+    Check that planets carry real absolute longitudes (0-360).
+
+    Degree-only data, or a longitude under 30 outside Aries (which
+    _positions would shift by the sign), needs the pairwise calculation.
+    """
+    for planet in planets:
+        lon = planet.get("lon")
+        if not isinstance(lon, (int, float)) or not 0 <= lon < 360:
+            return False
+        if lon < 30 and SIGN_INDEX.get(planet.get("sign", "Aries"), 0) != 0:
+            return False
+    return True
+
+
+class AspectTable:
+    """
+    Transit aspects by natal longitude for one set of transits.
+
+    Bin b covers natal longitudes [b / 10, (b + 1) / 10) and lists every
+    (transit, aspect) pair within orb of some point in it, with the transit
+    longitude, aspect angle and orb. A natal point only needs the exact orb
+    of its bin's candidates.
+    """
+
+    def __init__(self, current_transits: list):
+        self.current_transits = current_transits
+        self.usable = bool(current_transits) and _has_longitudes(current_transits)
+        self._bins = [[] for _ in range(ASPECT_TABLE_BINS)] if self.usable else []
+        if not self.usable:
+            return
+
+        scale = ASPECT_TABLE_BINS / 360
+        for t_index, transit in enumerate(current_transits):
+            transit_lon = transit["lon"]
+            for a_index, (_, angle, orb) in enumerate(ASPECT_DEFINITIONS):
+                low, high = max(0, angle - orb), angle + orb
+                marked = set()
+                # Natal longitudes at separation low..high on either side of the transit
+                for start, end in ((transit_lon + low, transit_lon + high), (transit_lon - high, transit_lon - low)):
+                    first = math.floor((start - 1e-6) * scale)
+                    last = math.floor((end + 1e-6) * scale)
+                    for bin_index in range(first, last + 1):
+                        marked.add(bin_index % ASPECT_TABLE_BINS)
+                for bin_index in marked:
+                    self._bins[bin_index].append((t_index, a_index, transit_lon, angle, orb))
+
+    def calculate(self, natal_chart: list) -> List[Dict[str, Any]]:
+        """Same result as calculate_aspects(natal_chart, current_transits)."""
+        if not self.usable or not _has_longitudes(natal_chart):
+            return calculate_aspects(natal_chart, self.current_transits)
+
+        candidates = []
+        for n_index, natal in enumerate(natal_chart):
+            natal_lon = natal["lon"]
+            for t_index, a_index, transit_lon, angle, orb_allowed in self._bins[
+                int(natal_lon * ASPECT_TABLE_BINS / 360) % ASPECT_TABLE_BINS
+            ]:
+                diff = abs(transit_lon - natal_lon)
+                if diff > 180:
+                    diff = 360 - diff
+                orb = abs(diff - angle)
+                if orb <= orb_allowed:
+                    candidates.append((t_index, n_index, a_index, diff, orb))
+
+        # Loop order of the pairwise calculation (transit, natal, aspect) for equal orbs
+        candidates.sort(key=lambda candidate: candidate[:3])
+        return _top_aspects(candidates, natal_chart, self.current_transits)
+
+
+_aspect_tables = OrderedDict()
+_aspect_tables_lock = threading.Lock()
+
+
+def get_aspect_table(current_transits: list) -> AspectTable:
+    """
+    Get the shared AspectTable for a set of transits (built on first use).
+
+    Transit positions are the same for every user on a day, so the table is
+    keyed by them and kept in an LRU of ASPECT_TABLE_CACHE tables.
+    """
+    key = tuple(
+        (planet.get("planet"), planet.get("sign"), planet.get("lon", planet.get("degree")))
+        for planet in current_transits
+    )
+    with _aspect_tables_lock:
+        table = _aspect_tables.get(key)
+        if table is not None:
+            _aspect_tables.move_to_end(key)
+            return table
+        table = AspectTable(current_transits)
+        _aspect_tables[key] = table
+        while len(_aspect_tables) > ASPECT_TABLE_CACHE:
+            _aspect_tables.popitem(last=False)
+        return table
@@ -0,0 +1,188 @@
+"""
+Astrology Compute Pool
+
+Natal chart calculation is Swiss ephemeris math in a C extension that holds
+the GIL: run inline it stalls the event loop, and run in a thread it still
+blocks every other thread of the web worker. This module runs it in a pool
+of worker processes instead:
+
+- Awaitable API (natal_chart, natal_charts for batches); the event loop
+  only waits for the result
+- Batches are split into chunks so one submission spreads over all processes
+- At most ASTROLOGY_MAX_PENDING submissions are queued or running per event
+  loop; further callers wait for a free slot instead of growing the queue
+- The pool starts lazily (or at startup via start()) with the spawn start
+  method, so workers never inherit the web worker's threads and locks
+- ASTROLOGY_PROCESSES=0, or a pool that cannot start or has died, falls back
+  to a thread (asyncio.to_thread) so charts are still calculated
+
+Transit positions are not sent here: they are shared by every user and
+served from the in-process LRU and the ephemeris table (astrology_service).
+"""
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, List, Tuple
+
+
+# Worker processes for chart calculations (0 = calculate in a thread instead)
+ASTROLOGY_PROCESSES = int(os.getenv("ASTROLOGY_PROCESSES", str(min(4, os.cpu_count() or 1))))
+# Submissions queued or running at once (per event loop)
+ASTROLOGY_MAX_PENDING = int(os.getenv("ASTROLOGY_MAX_PENDING", "64"))
+# Charts per submission when a batch is split over the processes
+ASTROLOGY_BATCH_CHUNK = int(os.getenv("ASTROLOGY_BATCH_CHUNK", "16"))
+
+BirthData = Tuple[str, str, Optional[str]]
+
+
+def _warm_up():
+    """Worker initializer: load flatlib and the ephemeris once per process."""
+    from astrology_service import astrology_service
+    if astrology_service.enabled:
+        astrology_service.calculate_transit_longitudes("2000-01-01")
+
+
+def _calculate_natal_charts(birth_data: List[BirthData]) -> List[dict]:
+    """Calculate natal charts (runs in a worker process, or a thread as fallback)."""
+    from astrology_service import astrology_service
+    return [
+        astrology_service.calculate_natal_chart(birth_date, birth_time, birth_city)
+        for birth_date, birth_time, birth_city in birth_data
+    ]
+
+
+class AstrologyCompute:
+    """Process pool for CPU-bound chart calculations with an awaitable API."""
+
+    def __init__(self, processes: int = ASTROLOGY_PROCESSES, max_pending: int = ASTROLOGY_MAX_PENDING):
+        self.processes = processes
+        self.max_pending = max(1, max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # One semaphore per event loop (asyncio primitives are bound to a loop)
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._pending = 0
+        self._submitted = 0
+        self._charts = 0
+        self._fallbacks = 0
+        self._restarts = 0
+        self._total_seconds = 0.0
+
+    def start(self):
+        """Start the worker processes now instead of on the first calculation."""
+        self._get_executor()
+
+    def shutdown(self):
+        """Stop the worker processes (cancels queued submissions)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.processes <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                try:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.processes,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_warm_up
+                    )
+                    print(f"🧮 Astrology compute pool started ({self.processes} processes)")
+                except Exception as e:
+                    print(f"⚠️ Astrology compute pool not started, calculating in threads: {e}")
+                    self.processes = 0
+            return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        """Drop a broken pool; the next submission starts a new one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self._restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_pending)
+        return semaphore
+
+    async def _run(self, birth_data: List[BirthData]) -> List[dict]:
+        """Run one chunk in the pool (bounded by the semaphore), falling back to a thread."""
+        async with self._semaphore():
+            self._pending += 1
+            started = time.monotonic()
+            try:
+                executor = self._get_executor()
+                if executor is not None:
+                    try:
+                        return await asyncio.get_running_loop().run_in_executor(
+                            executor, _calculate_natal_charts, birth_data
+                        )
+                    except BrokenProcessPool as e:
+                        print(f"⚠️ Astrology compute pool died, restarting it: {e}")
+                        self._discard_executor(executor)
+                self._fallbacks += 1
+                return await asyncio.to_thread(_calculate_natal_charts, birth_data)
+            finally:
+                self._pending -= 1
+                self._submitted += 1
+                self._charts += len(birth_data)
+                self._total_seconds += time.monotonic() - started
+
+    async def natal_chart(self, birth_date: str, birth_time: str, birth_city: Optional[str]) -> dict:
+        """
+        Calculate a natal chart without blocking the event loop.
+
+        Args:
+            birth_date: "YYYY-MM-DD"
+            birth_time: "HH:MM"
+            birth_city: City name (coordinates from AstrologyService)
+
+        Returns:
+            Natal chart dict (calculate_natal_chart format)
+        """
+        charts = await self._run([(birth_date, birth_time, birth_city)])
+        return charts[0]
+
+    async def natal_charts(self, birth_data: List[BirthData]) -> List[dict]:
+        """
+        Calculate many natal charts, spread over all worker processes.
+
+        Args:
+            birth_data: (birth_date, birth_time, birth_city) tuples
+
+        Returns:
+            Natal chart dicts in the same order
+        """
+        chunk = max(1, ASTROLOGY_BATCH_CHUNK)
+        results = await asyncio.gather(*(
+            self._run(birth_data[i:i + chunk]) for i in range(0, len(birth_data), chunk)
+        ))
+        return [chart for charts in results for chart in charts]
+
+    def get_stats(self) -> dict:
+        return {
+            "processes": self.processes,
+            "running": self._executor is not None,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "submitted": self._submitted,
+            "charts": self._charts,
+            "thread_fallbacks": self._fallbacks,
+            "pool_restarts": self._restarts,
+            "avg_ms_per_submission": round(self._total_seconds / self._submitted * 1000, 2) if self._submitted else None
+        }
+
+
+# Singleton instance
+astrology_compute = AstrologyCompute()
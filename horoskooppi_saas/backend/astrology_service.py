@@ -2,7 +2,17 @@
 Astrology Service using Flatlib
 Handles calculation of Natal Charts, Transits, and Aspects.
 """
-from datetime import datetime
+import os
+import copy
+import threading
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+from typing import Optional, Dict, List
+
+from aspect_engine import SIGN_ORDER
+from ephemeris_table import ephemeris_table, TRANSIT_PLANETS
+from gazetteer import gazetteer
+from user_timezones import timezone_for_city, utc_offset_at
 try:
     from flatlib.datetime import Datetime
     from flatlib.geopos import GeoPos
@@ -16,10 +26,46 @@ except ImportError:
     aspects = None
     const = None
 
+# Number of dates kept in the in-process transit cache (LRU). Today and its
+# neighbours are the hot ones; weekly/monthly prompts and time zone buckets
+# touch a few more. Behind it is the on-disk ephemeris table (ephemeris_table.py).
+TRANSIT_CACHE_DATES = int(os.getenv("TRANSIT_CACHE_DATES", "64"))
+
+# Number of date ranges (weekly/monthly prediction periods) kept in memory
+TRANSIT_RANGE_CACHE = int(os.getenv("TRANSIT_RANGE_CACHE", "16"))
+
+# Sun-Moon elongation (degrees) of the four main moon phases
+MOON_PHASES = [(0, "New Moon"), (90, "First Quarter"), (180, "Full Moon"), (270, "Last Quarter")]
+
+
+# Objects calculated in charts (flatlib ids are the planet names). flatlib's
+# default list leaves out Uranus, Neptune and Pluto; its full list includes
+# Chiron, which needs asteroid files the Swiss ephemeris cannot find from
+# worker threads.
+CHART_OBJECTS = TRANSIT_PLANETS
+
+
+def flatlib_date(value: str) -> str:
+    """Convert "YYYY-MM-DD" to the "YYYY/MM/DD" format flatlib's Datetime expects."""
+    return value.strip().replace("-", "/")
+
+
 class AstrologyService:
     def __init__(self):
         self.enabled = Datetime is not None
         
+        # Transit snapshots keyed by date (LRU): planet positions for a date are
+        # the same for every user, so they are computed once per process
+        self._transit_snapshots = OrderedDict()
+        self._transit_lock = threading.Lock()
+        # Dates being calculated -> Event set when done (single-flight)
+        self._transit_in_flight = {}
+        
+        # Transit ranges keyed by (start date, days) (LRU), shared the same way
+        self._transit_ranges = OrderedDict()
+        self._range_lock = threading.Lock()
+        self._range_in_flight = {}
+        
         # Common city coordinates (latitude, longitude)
         self.city_coordinates = {
             "helsinki": (60.1699, 24.9384),
@@ -74,11 +120,16 @@ class AstrologyService:
     def _get_city_coordinates(self, city_name: str):
         """
         Get latitude and longitude for a city name.
+        Looked up in the offline gazetteer (gazetteer.py), then in the cities above.
         Returns (lat, lon) tuple or defaults to Helsinki if city not found.
         """
         if not city_name:
             return (60.1699, 24.9384)  # Default to Helsinki
         
+        place = gazetteer.lookup(city_name)
+        if place:
+            return (place.lat, place.lon)
+        
         city_lower = city_name.lower().strip()
         
         # Direct lookup
@@ -94,7 +145,7 @@ class AstrologyService:
         print(f"⚠️ City '{city_name}' not found in coordinates database. Using Helsinki default.")
         return (60.1699, 24.9384)  # Helsinki default
 
-    def calculate_natal_chart(self, birth_date: str, birth_time: str, city_or_lat, lon=None, tz_str: str = "+02:00"):
+    def calculate_natal_chart(self, birth_date: str, birth_time: str, city_or_lat, lon=None, tz_str: Optional[str] = None):
         """
         Calculate natal chart details.
         
@@ -103,7 +154,8 @@ class AstrologyService:
             birth_time: "HH:MM"
             city_or_lat: Either city name (str) or latitude (float)
             lon: Longitude float (required if city_or_lat is float, optional if it's a city name)
-            tz_str: Timezone offset string e.g. "+02:00"
+            tz_str: Timezone offset string e.g. "+02:00"; defaults to the offset in
+                    force at the birth city and time ("+02:00" if its time zone is unknown)
         """
         if not self.enabled:
             return self._mock_natal_data()
@@ -123,9 +175,13 @@ class AstrologyService:
                 # Default to Helsinki
                 lat, lon = self._get_city_coordinates("helsinki")
             
-            date = Datetime(birth_date, birth_time, tz_str)
+            if tz_str is None:
+                city_tz = timezone_for_city(city_or_lat) if isinstance(city_or_lat, str) else None
+                tz_str = utc_offset_at(city_tz, birth_date, birth_time)
+            
+            date = Datetime(flatlib_date(birth_date), birth_time, tz_str)
             pos = GeoPos(lat, lon)
-            chart = Chart(date, pos)
+            chart = Chart(date, pos, IDs=CHART_OBJECTS)
 
             # Get planet positions in signs and houses
             # Map flatlib constants to readable names
@@ -160,10 +216,10 @@ class AstrologyService:
                     house_num = 1
                     try:
                         # Use flatlib's house calculation
-                        # chart.houses.get() returns the house for a given longitude
-                        house = chart.houses.get(obj.lon)
+                        # getObjectHouse() returns the house containing the object (id "House1".."House12")
+                        house = chart.houses.getObjectHouse(obj)
                         if house and hasattr(house, 'id'):
-                            house_num = house.id
+                            house_num = int(str(house.id).replace("House", ""))
                             if house_num > 12:
                                 house_num = 12
                             if house_num < 1:
@@ -198,12 +254,39 @@ class AstrologyService:
                 "positions": planets,  # Changed from "planets" to "positions" for compatibility
                 "planets": planets,  # Keep both for backwards compatibility
                 "houses": {h.id: h.sign for h in chart.houses},
-                "meta": {"date": birth_date, "time": birth_time, "lat": lat, "lon": lon}
+                "meta": {"date": birth_date, "time": birth_time, "lat": lat, "lon": lon, "utc_offset": tz_str}
             }
         except Exception as e:
             print(f"Error calculating natal chart: {e}")
             return self._mock_natal_data()
 
+    def calculate_transit_longitudes(self, target_date: str) -> Optional[Dict[str, float]]:
+        """
+        Calculate the noon UTC longitudes of the transit planets with flatlib.
+        
+        Args:
+            target_date: "YYYY-MM-DD"
+        
+        Returns:
+            Dict of planet name -> absolute longitude (0-360), None without flatlib
+        """
+        if not self.enabled:
+            return None
+        
+        # Noon UTC for transits
+        date = Datetime(flatlib_date(target_date), "12:00", "+00:00")
+        pos = GeoPos(0, 0) # Location matters less for planetary sign positions
+        chart = Chart(date, pos, IDs=CHART_OBJECTS)
+        
+        longitudes = {}
+        for planet_name in TRANSIT_PLANETS:
+            try:
+                # flatlib object ids are the planet names
+                longitudes[planet_name] = chart.get(planet_name).lon
+            except Exception as e:
+                print(f"Error getting transit planet {planet_name}: {e}")
+        return longitudes
+
     def calculate_transits(self, target_date: str, natal_chart=None):
         """
         Calculate transits for a specific date.
@@ -213,51 +296,240 @@ class AstrologyService:
             return self._mock_transit_data()
 
         try:
-            # Noon UTC for transits
-            date = Datetime(target_date, "12:00", "+00:00")
-            pos = GeoPos(0, 0) # Location matters less for planetary sign positions
-            chart = Chart(date, pos)
+            return self._transit_data(self.calculate_transit_longitudes(target_date))
+        except Exception as e:
+            print(f"Error calculating transits: {e}")
+            return self._mock_transit_data()
 
-            # Map flatlib constants to readable names for transits
-            transit_planet_names = {
-                const.SUN: "Sun",
-                const.MOON: "Moon",
-                const.MERCURY: "Mercury",
-                const.VENUS: "Venus",
-                const.MARS: "Mars",
-                const.JUPITER: "Jupiter",
-                const.SATURN: "Saturn",
-                const.URANUS: "Uranus",
-                const.NEPTUNE: "Neptune",
-                const.PLUTO: "Pluto"
+    @staticmethod
+    def _transit_data(longitudes: Dict[str, float]) -> dict:
+        """Transit data dict (positions with sign, degree in sign and longitude) from longitudes."""
+        transits = {}
+        for planet_name, lon in longitudes.items():
+            transits[planet_name] = {
+                "sign": SIGN_ORDER[int(lon // 30) % 12],
+                "deg": round(lon % 30, 2),  # Degree within sign (0-30)
+                "lon": round(lon, 2)  # Absolute longitude (0-360) for aspect calculations
             }
+        return {
+            "positions": transits,
+            "moon_phase": "Unknown" # Flatlib doesn't have direct moon phase utility in basic
+        }
+
+    def get_transit_snapshot(self, target_date: str) -> dict:
+        """
+        Get transit positions for a date.
+        
+        Looked up in two cache levels before anything is calculated:
+        1. In-process LRU of the most recent TRANSIT_CACHE_DATES dates
+        2. The precomputed daily ephemeris table on disk (ephemeris_table.py)
+        Only dates in neither run calculate_transits(), outside the lock and
+        once per date however many callers ask at the same time. Mock data
+        is not cached. Every caller (scheduler workers, on-demand
+        generation, previews) gets a copy of the same snapshot.
+        
+        Args:
+            target_date: "YYYY-MM-DD"
+        
+        Returns:
+            Transit data dict (same shape as calculate_transits, plus "date")
+        """
+        def compute():
+            longitudes = ephemeris_table.get_longitudes(target_date)
+            snapshot = self._transit_data(longitudes) if longitudes else self.calculate_transits(target_date)
+            snapshot["date"] = target_date
+            return snapshot
+        
+        snapshot = self._get_shared(
+            self._transit_snapshots, self._transit_lock, self._transit_in_flight,
+            target_date, compute, TRANSIT_CACHE_DATES,
+            # Mock data (flatlib missing or failing) is not kept, so the next call retries
+            cacheable=lambda snapshot: "note" not in snapshot
+        )
+        
+        # Callers get their own copy so the shared snapshot is never mutated
+        return copy.deepcopy(snapshot)
+
+    def _range_longitudes(self, start_date: str, days: int) -> Optional[List[Dict[str, float]]]:
+        """Daily longitudes of a range: one table read, else per-day table lookups or calculations."""
+        rows = ephemeris_table.get_range(start_date, days)
+        if rows is not None:
+            return rows
+        
+        first = date.fromisoformat(start_date)
+        rows = []
+        for offset in range(days):
+            day = (first + timedelta(days=offset)).isoformat()
+            longitudes = ephemeris_table.get_longitudes(day) or self.calculate_transit_longitudes(day)
+            if not longitudes or len(longitudes) != len(TRANSIT_PLANETS):
+                return None
+            rows.append(longitudes)
+        return rows
+
+    def calculate_transit_range(self, start_date: str, days: int) -> Optional[dict]:
+        """
+        Calculate daily transit positions and events for a date range.
+        
+        Positions come back as dense per-planet arrays (one noon UTC longitude
+        per day). Events are derived from the day-to-day motion:
+        - ingress: a planet enters a new sign
+        - station: a planet turns retrograde or direct
+        - moon_phase: New Moon, First Quarter, Full Moon or Last Quarter
+          (the day whose noon is closest to the exact phase)
+        
+        Args:
+            start_date: First day ("YYYY-MM-DD")
+            days: Number of days
+        
+        Returns:
+            Dict with start, end, days, dates, longitudes, retrograde and events,
+            or None when positions are not available (flatlib missing and the
+            range not in the ephemeris table)
+        """
+        first = date.fromisoformat(start_date)
+        # One extra day on both sides for the motion on the first and last day
+        rows = self._range_longitudes((first - timedelta(days=1)).isoformat(), days + 2)
+        if rows is None:
+            return None
+        
+        dates = [(first + timedelta(days=offset)).isoformat() for offset in range(days)]
+        # motion[i] is the movement from day i-1 to day i of the window (rows[i] -> rows[i + 1])
+        motion = {
+            planet: [(rows[i + 1][planet] - rows[i][planet] + 180) % 360 - 180 for i in range(days + 1)]
+            for planet in TRANSIT_PLANETS
+        }
+        
+        events = []
+        retrograde = []
+        for planet in TRANSIT_PLANETS:
+            signs = [int(row[planet] // 30) % 12 for row in rows]
+            for i in range(days):
+                if signs[i + 1] != signs[i]:
+                    event = {"date": dates[i], "type": "ingress", "planet": planet, "sign": SIGN_ORDER[signs[i + 1]]}
+                    if motion[planet][i] < 0:
+                        event["retrograde"] = True  # Re-entering the previous sign
+                    events.append(event)
             
-            transits = {}
-            for planet_const in [const.SUN, const.MOON, const.MERCURY, const.VENUS, const.MARS, 
-                          const.JUPITER, const.SATURN, const.URANUS, const.NEPTUNE, const.PLUTO]:
-                try:
-                    obj = chart.get(planet_const)
-                    planet_name = transit_planet_names.get(planet_const, str(planet_const))
-                    
-                    # Calculate degree within sign (0-30 degrees)
-                    sign_degree = obj.lon % 30
-                    
-                    transits[planet_name] = {
-                        "sign": obj.sign,
-                        "deg": round(sign_degree, 2),  # Degree within sign (0-30)
-                        "lon": round(obj.lon, 2)  # Absolute longitude (0-360) for aspect calculations
-                    }
-                except Exception as e:
-                    print(f"Error getting transit planet {planet_const}: {e}")
+            if planet in ("Sun", "Moon"):
+                continue
+            daily = motion[planet]
+            if any(step < 0 for step in daily[1:]):
+                retrograde.append(planet)
+            for i in range(1, days + 1):
+                if (daily[i] < 0) != (daily[i - 1] < 0):
+                    events.append({
+                        "date": dates[i - 1],
+                        "type": "station",
+                        "planet": planet,
+                        "direction": "retrograde" if daily[i] < 0 else "direct",
+                        "sign": SIGN_ORDER[int(rows[i][planet] // 30) % 12]
+                    })
+        
+        elongation = [(row["Moon"] - row["Sun"]) % 360 for row in rows]
+        for i in range(len(rows) - 1):
+            step = (elongation[i + 1] - elongation[i]) % 360
+            for angle, phase in MOON_PHASES:
+                to_phase = (angle - elongation[i]) % 360
+                if not 0 < to_phase <= step:
                     continue
-            
-            return {
-                "positions": transits,
-                "moon_phase": "Unknown" # Flatlib doesn't have direct moon phase utility in basic
-            }
-        except Exception as e:
-            print(f"Error calculating transits: {e}")
-            return self._mock_transit_data()
+                day = i if to_phase / step < 0.5 else i + 1
+                # rows[0] is the day before the window
+                if 1 <= day <= days:
+                    events.append({
+                        "date": dates[day - 1],
+                        "type": "moon_phase",
+                        "phase": phase,
+                        "sign": SIGN_ORDER[int(rows[day]["Moon"] // 30) % 12]
+                    })
+        
+        events.sort(key=lambda event: event["date"])
+        return {
+            "start": dates[0],
+            "end": dates[-1],
+            "days": days,
+            "dates": dates,
+            "longitudes": {
+                planet: [round(row[planet], 2) for row in rows[1:-1]]
+                for planet in TRANSIT_PLANETS
+            },
+            "retrograde": retrograde,
+            "events": events
+        }
+
+    def get_transit_range(self, start_date: str, days: int) -> Optional[dict]:
+        """
+        Get daily transit positions and events for a date range.
+        
+        A prediction period (a week or a month) is the same for every
+        subscriber, so each range is calculated once per process and kept in
+        an LRU of TRANSIT_RANGE_CACHE ranges.
+        
+        Args:
+            start_date: First day ("YYYY-MM-DD")
+            days: Number of days
+        
+        Returns:
+            calculate_transit_range dict (a copy), or None if not available
+        """
+        def compute():
+            try:
+                return self.calculate_transit_range(start_date, days)
+            except Exception as e:
+                print(f"Error calculating transit range {start_date} +{days}d: {e}")
+                return None
+        
+        transit_range = self._get_shared(
+            self._transit_ranges, self._range_lock, self._range_in_flight,
+            (start_date, days), compute, TRANSIT_RANGE_CACHE
+        )
+        return copy.deepcopy(transit_range)
+
+    @staticmethod
+    def _get_shared(cache: OrderedDict, lock: threading.Lock, in_flight: dict, key, compute,
+                    max_size: int, cacheable=lambda value: True):
+        """
+        Look up key in an LRU, calculating a missing value outside the lock.
+        
+        Only one thread calculates a given key at a time (single-flight):
+        others wait for it and then read the cached value, while lookups of
+        other keys go ahead. A value that is not cacheable is returned to the
+        thread that calculated it, and a waiting thread calculates again.
+        
+        Args:
+            cache: OrderedDict used as the LRU
+            lock: Lock guarding cache and in_flight
+            in_flight: key -> threading.Event of calculations in progress
+            key: Cache key
+            compute: Function calculating the value
+            max_size: Maximum number of cached values
+            cacheable: Whether a calculated value may be cached
+        
+        Returns:
+            The cached or calculated value (shared, not a copy)
+        """
+        while True:
+            with lock:
+                if key in cache:
+                    cache.move_to_end(key)
+                    return cache[key]
+                done = in_flight.get(key)
+                if done is None:
+                    done = in_flight[key] = threading.Event()
+                    break
+            done.wait()
+        
+        try:
+            value = compute()
+            with lock:
+                if cacheable(value):
+                    cache[key] = value
+                    while len(cache) > max_size:
+                        cache.popitem(last=False)
+            return value
+        finally:
+            with lock:
+                del in_flight[key]
+            done.set()
 
     def _mock_natal_data(self):
         # Mock data with proper sign degrees (0-30) and absolute longitudes (0-360)
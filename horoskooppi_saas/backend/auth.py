@@ -6,9 +6,10 @@ from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status, Request
-from fastapi.security import OAuth2PasswordBearer, HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.security import OAuth2PasswordBearer, HTTPBearer, HTTPAuthorizationCredentials, HTTPBasic, HTTPBasicCredentials
 from sqlalchemy.orm import Session
 import os
+import secrets
 
 from database import get_db
 from models import User
@@ -28,6 +29,9 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/magic-link", auto_error=
 # HTTP Bearer scheme for Authorization header
 http_bearer = HTTPBearer(auto_error=False)
 
+# HTTP Basic for admin endpoints (ADMIN_DOWNLOAD_USER / ADMIN_DOWNLOAD_PASS)
+admin_basic = HTTPBasic()
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash (deprecated - kept for migration)"""
     if not hashed_password:
@@ -127,4 +131,29 @@ async def get_current_subscriber(current_user: User = Depends(get_current_active
         )
     return current_user
 
+def require_admin(credentials: HTTPBasicCredentials = Depends(admin_basic)) -> str:
+    """
+    Verify admin credentials (HTTP Basic, env ADMIN_DOWNLOAD_USER / ADMIN_DOWNLOAD_PASS).
+    Admin endpoints are disabled (503) until ADMIN_DOWNLOAD_PASS is set.
+    
+    Returns:
+        The admin username
+    """
+    admin_user = os.getenv("ADMIN_DOWNLOAD_USER", "admin")
+    admin_pass = os.getenv("ADMIN_DOWNLOAD_PASS")
 
+    if not admin_pass:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Admin access is not configured (missing ADMIN_DOWNLOAD_PASS)"
+        )
+
+    valid_user = secrets.compare_digest(credentials.username, admin_user)
+    valid_pass = secrets.compare_digest(credentials.password, admin_pass)
+    if not (valid_user and valid_pass):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Unauthorized",
+            headers={"WWW-Authenticate": "Basic"},
+        )
+    return credentials.username
@@ -0,0 +1,186 @@
+"""
+Aspect Engine Benchmark
+
+Compares aspect_engine against the original nested-loop implementation
+(kept below as the reference): checks that both return identical aspects
+for random charts and prints the timings.
+
+Usage (from the backend directory):
+    python benchmark_aspects.py [users]
+"""
+import os
+import sys
+import random
+import time
+
+# Allow running as a script from the backend directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import aspect_engine
+from aspect_engine import calculate_aspects, _calculate_aspects_python, AspectTable, SIGN_ORDER, ASPECT_DEFINITIONS
+
+PLANETS = ["Sun", "Moon", "Mercury", "Venus", "Mars", "Jupiter", "Saturn", "Uranus", "Neptune", "Pluto"]
+
+
+# Original GeminiClient._calculate_aspects (reference)
+def legacy_calculate_aspects(natal_chart: list, current_transits: list) -> list:
+    """
+    Calculate aspects between natal and transit planets.
+    Returns list of aspect dictionaries.
+    """
+    aspects = []
+
+    # Aspect definitions: name, angle, orb_allowed
+    aspect_definitions = [
+        ("Conjunction", 0, 8),
+        ("Sextile", 60, 4),
+        ("Square", 90, 6),
+        ("Trine", 120, 6),
+        ("Opposition", 180, 8)
+    ]
+
+    # House meanings for effect descriptions
+    house_meanings = {
+        1: "Self and identity",
+        2: "Finances and values",
+        3: "Communication and learning",
+        4: "Home and family",
+        5: "Creativity and self-expression",
+        6: "Work and health",
+        7: "Partnerships and relationships",
+        8: "Transformation and shared resources",
+        9: "Higher learning and travel",
+        10: "Career and public image",
+        11: "Friends and aspirations",
+        12: "Spirituality and subconscious"
+    }
+
+    for transit in current_transits:
+        for natal in natal_chart:
+            # Use absolute longitude (lon) for aspect calculations, fallback to degree if lon not available
+            transit_lon = transit.get("lon", transit.get("degree", 0))
+            natal_lon = natal.get("lon", natal.get("degree", 0))
+
+            # If we only have sign degrees (0-30), we need to estimate absolute longitude
+            # This is approximate - ideally we'd have the full longitude
+            if transit_lon < 30 and natal_lon < 30:
+                # Estimate: assume middle of sign for approximation
+                # This is not ideal but better than 0
+                transit_sign = transit.get("sign", "Aries")
+                natal_sign = natal.get("sign", "Aries")
+                sign_order = ["Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo", 
+                             "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"]
+                try:
+                    transit_sign_idx = sign_order.index(transit_sign) if transit_sign in sign_order else 0
+                    natal_sign_idx = sign_order.index(natal_sign) if natal_sign in sign_order else 0
+                    transit_lon = (transit_sign_idx * 30) + transit_lon
+                    natal_lon = (natal_sign_idx * 30) + natal_lon
+                except:
+                    pass
+
+            # Calculate angle difference (absolute longitude 0-360)
+            diff = abs(transit_lon - natal_lon)
+            if diff > 180:
+                diff = 360 - diff
+
+            # Check each aspect type
+            for aspect_name, aspect_angle, max_orb in aspect_definitions:
+                orb = abs(diff - aspect_angle)
+
+                if orb <= max_orb:
+                    house = natal.get("house", 1)
+                    aspects.append({
+                        "transit_planet": transit.get("planet", "Unknown"),
+                        "natal_planet": natal.get("planet", "Unknown"),
+                        "aspect": aspect_name,
+                        "angle": round(diff, 1),
+                        "orb": round(orb, 1),
+                        "house_effect": house_meanings.get(house, "General life areas")
+                    })
+
+    # Sort by orb (tightest aspects first)
+    aspects.sort(key=lambda x: x["orb"])
+
+    return aspects[:10]  # Return top 10 tightest aspects
+
+
+def random_chart(rng: random.Random, with_lon: bool = True) -> list:
+    """Random planet list in the prompt format (lon omitted for sign-only charts)."""
+    chart = []
+    for house, planet in enumerate(PLANETS, start=1):
+        lon = rng.uniform(0, 360)
+        entry = {
+            "planet": planet,
+            "sign": SIGN_ORDER[int(lon // 30)],
+            "degree": round(lon % 30, 2),
+            "house": house % 12 + 1
+        }
+        if with_lon:
+            entry["lon"] = round(lon, 4)
+        chart.append(entry)
+    return chart
+
+
+def edge_charts(transits: list) -> list:
+    """Natal charts with points exactly at the orb limits of the first transit (aspect table bin edges)."""
+    transit_lon = transits[0]["lon"]
+    charts = []
+    for _, angle, orb in ASPECT_DEFINITIONS:
+        for separation in (angle - orb, angle + orb, angle):
+            for side in (1, -1):
+                lon = round((transit_lon + side * separation) % 360, 4)
+                charts.append([{
+                    "planet": "Sun",
+                    "sign": SIGN_ORDER[int(lon // 30)],
+                    "degree": round(lon % 30, 2),
+                    "lon": lon,
+                    "house": 1
+                }])
+    return charts
+
+
+def timed(label: str, func, repeat: int = 3) -> float:
+    best = min(_run_once(func) for _ in range(repeat))
+    print(f"   {label:<38} {best * 1000:9.1f} ms")
+    return best
+
+
+def _run_once(func) -> float:
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rng = random.Random(42)
+    transits = random_chart(rng)
+    natal_charts = [random_chart(rng, with_lon=i % 5 != 0) for i in range(users)] + edge_charts(transits)
+    table = AspectTable(transits)
+
+    # Correctness first: every chart must give exactly the original result
+    expected = [legacy_calculate_aspects(natal, transits) for natal in natal_charts]
+    assert [calculate_aspects(natal, transits) for natal in natal_charts] == expected, "single mismatch"
+    assert [_calculate_aspects_python(natal, transits) for natal in natal_charts] == expected, "python mismatch"
+    assert [table.calculate(natal) for natal in natal_charts] == expected, "aspect table mismatch"
+    print(f"✅ Identical aspects for {len(natal_charts)} charts")
+
+    print(f"⏱️ {users} natal charts against one day's transits (numpy: {aspect_engine.np is not None})")
+    legacy = timed("original loop", lambda: [legacy_calculate_aspects(n, transits) for n in natal_charts])
+    python = timed("aspect_engine without numpy", lambda: [_calculate_aspects_python(n, transits) for n in natal_charts])
+    print(f"      speed-up {legacy / python:.1f}x")
+    if aspect_engine.np is not None:
+        single = timed("aspect_engine with numpy", lambda: [calculate_aspects(n, transits) for n in natal_charts])
+        print(f"      speed-up {legacy / single:.1f}x")
+
+    # Charts with longitudes only: the aspect table's case (others fall back to calculate_aspects)
+    lon_charts = [natal for natal in natal_charts if all("lon" in planet for planet in natal)]
+    print(f"⏱️ {len(lon_charts)} natal charts with longitudes")
+    timed("aspect table build (once per day)", lambda: AspectTable(transits))
+    legacy = timed("original loop", lambda: [legacy_calculate_aspects(n, transits) for n in lon_charts])
+    lookup = timed("aspect table lookup", lambda: [table.calculate(n) for n in lon_charts])
+    print(f"      speed-up {legacy / lookup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,13 @@
 Checkout funnel routes and tracking
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
 import secrets
 from sqlalchemy.orm import Session
 from datetime import datetime
 import secrets
 
 from database import get_db
+from auth import require_admin
 from checkout_models import CheckoutProgress, Waitlist
 from checkout_schemas import (
     CheckoutSessionCreate, CheckoutEmailStep, CheckoutPhoneStep,
@@ -20,7 +20,6 @@ from csv_export import save_to_csv
 import os
 
 router = APIRouter(prefix="/api/checkout", tags=["checkout"])
-security = HTTPBasic()
 
 # Plan to Stripe Price ID mapping
 PLAN_PRICE_MAP = {
@@ -274,6 +273,13 @@ async def save_birthdate_step(data: CheckoutBirthdateStep, db: Session = Depends
     except Exception as e:
         print(f"⚠️ CSV save error (non-critical): {e}")
     
+    # Compute and store the natal chart now, so predictions never recompute it
+    try:
+        from natal_charts import get_or_create_natal_chart_async
+        await get_or_create_natal_chart_async(progress.birth_date, progress.birth_time, progress.birth_city, db)
+    except Exception as e:
+        print(f"⚠️ Natal chart calculation error (non-critical): {e}")
+    
     # Go directly to payment (capacity check removed)
     return CheckoutProgressResponse(
         session_id=progress.session_id,
@@ -349,6 +355,8 @@ async def create_payment_session(session_id: str, db: Session = Depends(get_db))
         from models import User, Subscription, MagicLinkToken
         from datetime import timedelta
         from email_service import email_service
+        from natal_charts import natal_chart_key
+        from user_timezones import resolve_timezone
         import secrets as sec
         
         # Check if user already exists (case-insensitive)
@@ -370,7 +378,9 @@ async def create_payment_session(session_id: str, db: Session = Depends(get_db))
                 birth_time=progress.birth_time,
                 birth_city=progress.birth_city,
                 zodiac_sign=progress.zodiac_sign,
+                natal_chart_key=natal_chart_key(progress.birth_date, progress.birth_time, progress.birth_city),
                 prediction_language=progress.prediction_language or 'fi',
+                timezone=resolve_timezone(country=progress.country, birth_city=progress.birth_city),
                 is_active=True,
                 is_subscriber=True
             )
@@ -397,6 +407,8 @@ async def create_payment_session(session_id: str, db: Session = Depends(get_db))
             existing_user.is_subscriber = True
             if progress.prediction_language:
                 existing_user.prediction_language = progress.prediction_language
+            if not existing_user.timezone:
+                existing_user.timezone = resolve_timezone(country=progress.country, birth_city=existing_user.birth_city)
             db.commit()
             user_for_email = existing_user
             print(f"✅ DEMO: Updated existing user {progress.email}")
@@ -534,31 +546,13 @@ async def get_checkout_analytics(db: Session = Depends(get_db)):
 # Submissions endpoint removed - use /analytics dashboard instead for privacy
 
 @router.get("/download-csv")
-async def download_csv(credentials: HTTPBasicCredentials = Depends(security)):
+async def download_csv(admin: str = Depends(require_admin)):
     """
     Download CSV file with all checkout submissions.
     Protected by HTTP Basic (set env ADMIN_DOWNLOAD_USER / ADMIN_DOWNLOAD_PASS).
     """
     from fastapi.responses import FileResponse
     from csv_export import get_csv_path
-
-    admin_user = os.getenv("ADMIN_DOWNLOAD_USER", "admin")
-    admin_pass = os.getenv("ADMIN_DOWNLOAD_PASS")
-
-    if not admin_pass:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Download is not configured (missing ADMIN_DOWNLOAD_PASS)"
-        )
-
-    valid_user = secrets.compare_digest(credentials.username, admin_user)
-    valid_pass = secrets.compare_digest(credentials.password, admin_pass)
-    if not (valid_user and valid_pass):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Unauthorized",
-            headers={"WWW-Authenticate": "Basic"},
-        )
     
     csv_path = get_csv_path()
     
@@ -109,7 +109,8 @@ Use your Mars in Cancer energy to nurture your home base before setting out on y
             prediction_type="daily",
             content=content.strip(),
             raw_data=json.dumps(raw_data),
-            prediction_date=datetime.utcnow()
+            prediction_date=datetime.utcnow(),
+            released_at=datetime.utcnow()
         )
         db.add(horoscope)
         db.commit()
@@ -113,6 +113,20 @@ def migrate_database():
                 print("Adding prediction_language column to users table...")
                 conn.execute(text("ALTER TABLE users ADD COLUMN prediction_language VARCHAR DEFAULT 'en'"))
                 conn.commit()
+            
+            # Add natal_chart_key (reference to the stored natal chart - see natal_charts.py)
+            if 'natal_chart_key' not in columns:
+                print("Adding natal_chart_key column to users table...")
+                conn.execute(text("ALTER TABLE users ADD COLUMN natal_chart_key VARCHAR"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_natal_chart_key ON users(natal_chart_key)"))
+                conn.commit()
+            
+            # Add timezone (delivery time zone for scheduled predictions - see user_timezones.py)
+            if 'timezone' not in columns:
+                print("Adding timezone column to users table...")
+                conn.execute(text("ALTER TABLE users ADD COLUMN timezone VARCHAR"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_timezone ON users(timezone)"))
+                conn.commit()
     
     # Check if horoscopes table exists
     if 'horoscopes' in inspector.get_table_names():
@@ -124,6 +138,44 @@ def migrate_database():
                 print("Adding raw_data column to horoscopes table...")
                 conn.execute(text("ALTER TABLE horoscopes ADD COLUMN raw_data TEXT"))
                 conn.commit()
+            
+            # Add released_at (pre-generated predictions are hidden until delivered)
+            if 'released_at' not in columns:
+                print("Adding released_at column to horoscopes table...")
+                conn.execute(text("ALTER TABLE horoscopes ADD COLUMN released_at DATETIME"))
+                conn.execute(text("UPDATE horoscopes SET released_at = created_at"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_horoscopes_released_at ON horoscopes(released_at)"))
+                conn.commit()
+            
+            # Add period_key (one prediction per user, type and period - older rows stay NULL)
+            if 'period_key' not in columns:
+                print("Adding period_key column to horoscopes table...")
+                conn.execute(text("ALTER TABLE horoscopes ADD COLUMN period_key VARCHAR"))
+                conn.execute(text(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS uq_horoscope_period "
+                    "ON horoscopes(user_id, prediction_type, period_key)"
+                ))
+                conn.commit()
+    
+    # Check if prediction_runs table exists (time zone buckets and delivery time for scheduled runs)
+    if 'prediction_runs' in inspector.get_table_names():
+        columns = [col['name'] for col in inspector.get_columns('prediction_runs')]
+        
+        with engine.connect() as conn:
+            if 'timezone' not in columns:
+                print("Adding timezone and period_date columns to prediction_runs table...")
+                conn.execute(text("ALTER TABLE prediction_runs ADD COLUMN timezone VARCHAR"))
+                conn.execute(text("ALTER TABLE prediction_runs ADD COLUMN period_date VARCHAR"))
+                conn.execute(text(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS uq_prediction_run_bucket "
+                    "ON prediction_runs(prediction_type, timezone, period_date)"
+                ))
+                conn.commit()
+            
+            if 'send_at' not in columns:
+                print("Adding send_at column to prediction_runs table...")
+                conn.execute(text("ALTER TABLE prediction_runs ADD COLUMN send_at DATETIME"))
+                conn.commit()
     
     # Check if checkout_progress table exists (for birth date fields)
     if 'checkout_progress' in inspector.get_table_names():
@@ -335,7 +387,8 @@ Use your Mars in Cancer energy to nurture your home base before setting out on y
             prediction_type="daily",
             content=content.strip(),
             raw_data=json.dumps(raw_data),
-            prediction_date=datetime.utcnow()
+            prediction_date=datetime.utcnow(),
+            released_at=datetime.utcnow()
         )
         db.add(horoscope)
         db.commit()
@@ -0,0 +1,230 @@
+"""
+Daily Ephemeris Table
+
+Transit positions only depend on the date (noon UTC, see
+AstrologyService.calculate_transits), so they can be computed ahead of
+time. This module stores the ecliptic longitude of the ten transit planets
+for every day of a range of years in one compact binary file, and reads it
+back through a read-only memory map:
+
+- The file is opened lazily on first use and shared by all threads; the
+  OS page cache shares it between worker processes
+- A lookup is one offset computation and one 80-byte read instead of a
+  Swiss ephemeris run; a range of days is one contiguous read (get_range)
+- Dates outside the table (or a missing file) return None and the caller
+  calculates as before
+
+File layout (little-endian):
+    header: magic (8 bytes), start date ordinal (int32), days (int32), planets (int16)
+    body:   days x planets float64 longitudes, in TRANSIT_PLANETS order (NaN = not available)
+
+Build (or rebuild) the table from the backend directory with:
+    python ephemeris_table.py build --start-year 2020 --end-year 2040
+"""
+import os
+import sys
+import math
+import mmap
+import struct
+import argparse
+import threading
+from datetime import date, timedelta
+from typing import Optional, Dict, List, Callable
+
+# Allow running as a script from the backend directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+EPHEMERIS_TABLE_PATH = os.getenv(
+    "EPHEMERIS_TABLE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "ephemeris_daily.bin")
+)
+
+TRANSIT_PLANETS = ["Sun", "Moon", "Mercury", "Venus", "Mars",
+                   "Jupiter", "Saturn", "Uranus", "Neptune", "Pluto"]
+
+MAGIC = b"EPHEMD01"
+HEADER = struct.Struct("<8siih")
+ROW = struct.Struct("<" + "d" * len(TRANSIT_PLANETS))
+
+
+class EphemerisTable:
+    """Read-only, lazily memory-mapped daily longitude table."""
+
+    def __init__(self, path: str = EPHEMERIS_TABLE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._file = None
+        self._mmap = None
+        self._start = 0
+        self._days = 0
+        self._hits = 0
+        self._misses = 0
+
+    def _load(self):
+        """Open and validate the table file (once). A missing or invalid file disables the table."""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not os.path.exists(self.path):
+                print(f"ℹ️ No ephemeris table at {self.path} - transits are calculated on demand")
+                return
+            try:
+                table_file = open(self.path, "rb")
+                table_map = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, start, days, planets = HEADER.unpack_from(table_map, 0)
+                if magic != MAGIC or planets != len(TRANSIT_PLANETS):
+                    raise ValueError("unknown file format")
+                if len(table_map) < HEADER.size + days * ROW.size:
+                    raise ValueError("file is truncated")
+            except Exception as e:
+                print(f"⚠️ Ephemeris table {self.path} not used: {e}")
+                return
+            self._file = table_file
+            self._mmap = table_map
+            self._start = start
+            self._days = days
+            print(f"🪐 Ephemeris table loaded: {self.first_date()} - {self.last_date()} ({days} days)")
+
+    def first_date(self) -> Optional[date]:
+        return date.fromordinal(self._start) if self._days else None
+
+    def last_date(self) -> Optional[date]:
+        return date.fromordinal(self._start + self._days - 1) if self._days else None
+
+    def get_longitudes(self, target_date: str) -> Optional[Dict[str, float]]:
+        """
+        Get the noon UTC longitudes of the transit planets on a date.
+
+        Args:
+            target_date: "YYYY-MM-DD"
+
+        Returns:
+            Dict of planet name -> absolute longitude (0-360), or None if the
+            date is not in the table
+        """
+        if not self._loaded:
+            self._load()
+        if self._mmap is None:
+            return None
+
+        try:
+            index = date.fromisoformat(target_date).toordinal() - self._start
+        except ValueError:
+            return None
+        if not 0 <= index < self._days:
+            self._misses += 1
+            return None
+
+        longitudes = ROW.unpack_from(self._mmap, HEADER.size + index * ROW.size)
+        if any(math.isnan(lon) for lon in longitudes):
+            self._misses += 1
+            return None
+        self._hits += 1
+        return dict(zip(TRANSIT_PLANETS, longitudes))
+
+    def get_range(self, start_date: str, days: int) -> Optional[List[Dict[str, float]]]:
+        """
+        Get the longitudes of consecutive days with one read.
+
+        Args:
+            start_date: First day ("YYYY-MM-DD")
+            days: Number of days
+
+        Returns:
+            One get_longitudes dict per day, or None if any day is not in the table
+        """
+        if not self._loaded:
+            self._load()
+        if self._mmap is None:
+            return None
+
+        try:
+            index = date.fromisoformat(start_date).toordinal() - self._start
+        except ValueError:
+            return None
+        if index < 0 or index + days > self._days:
+            self._misses += 1
+            return None
+
+        offset = HEADER.size + index * ROW.size
+        rows = list(ROW.iter_unpack(self._mmap[offset:offset + days * ROW.size]))
+        if any(math.isnan(lon) for row in rows for lon in row):
+            self._misses += 1
+            return None
+        self._hits += 1
+        return [dict(zip(TRANSIT_PLANETS, row)) for row in rows]
+
+    def get_stats(self) -> dict:
+        first, last = self.first_date(), self.last_date()
+        return {
+            "path": self.path,
+            "loaded": self._mmap is not None,
+            "first_date": first.isoformat() if first else None,
+            "last_date": last.isoformat() if last else None,
+            "hits": self._hits,
+            "misses": self._misses
+        }
+
+
+def build_table(
+    path: str,
+    start_year: int,
+    end_year: int,
+    compute: Callable[[str], Optional[Dict[str, float]]]
+) -> int:
+    """
+    Write a table covering 1 Jan start_year - 31 Dec end_year.
+
+    Args:
+        path: Output file (written to a temporary file and renamed)
+        start_year: First year
+        end_year: Last year (inclusive)
+        compute: Function date string -> planet longitudes (missing planets become NaN)
+
+    Returns:
+        Number of days written
+    """
+    start = date(start_year, 1, 1)
+    days = (date(end_year, 12, 31) - start).days + 1
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as table_file:
+        table_file.write(HEADER.pack(MAGIC, start.toordinal(), days, len(TRANSIT_PLANETS)))
+        for offset in range(days):
+            day = (start + timedelta(days=offset)).isoformat()
+            longitudes = compute(day) or {}
+            table_file.write(ROW.pack(*(longitudes.get(planet, math.nan) for planet in TRANSIT_PLANETS)))
+            if offset and offset % 1000 == 0:
+                print(f"   {offset}/{days} days")
+    os.replace(temp_path, path)
+    return days
+
+
+# Singleton instance
+ephemeris_table = EphemerisTable()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daily ephemeris table for transit lookups")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Calculate and write the table")
+    build.add_argument("--start-year", type=int, default=date.today().year - 2)
+    build.add_argument("--end-year", type=int, default=date.today().year + 10)
+    build.add_argument("--path", default=EPHEMERIS_TABLE_PATH)
+    args = parser.parse_args()
+
+    from astrology_service import astrology_service
+    if not astrology_service.enabled:
+        print("❌ flatlib not installed - cannot build the ephemeris table")
+        sys.exit(1)
+
+    print(f"🪐 Building ephemeris table {args.start_year}-{args.end_year} -> {args.path}")
+    days = build_table(args.path, args.start_year, args.end_year, astrology_service.calculate_transit_longitudes)
+    print(f"✅ Wrote {days} days ({os.path.getsize(args.path) // 1024} KB)")
+
+
+if __name__ == "__main__":
+    main()
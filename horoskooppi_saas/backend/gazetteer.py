@@ -0,0 +1,425 @@
+"""
+Offline Gazetteer
+
+Birth cities are geocoded from a GeoNames city dump converted into one
+compact binary file, read through a read-only memory map:
+
+- The file is opened lazily on first use (startup stays fast) and shared
+  by all threads; the OS page cache shares it between worker processes
+- Exact lookups go through an open-addressing hash index of normalised
+  names (lower case, accents and punctuation removed): constant time
+- Autocomplete (GET /api/geo/cities) binary-searches the name-sorted
+  records for the prefix range and returns its most populous cities
+- Every place carries its IANA time zone, used for delivery time zones and
+  the UTC offset of the birth time
+
+Without the file, the cities built into AstrologyService are used.
+
+File layout (little-endian):
+    header:  magic, record count, hash slots, time zone count and section offsets (HEADER)
+    records: RECORD per (normalised name, place), sorted by name, then population descending
+    hash:    uint32 slots (record index + 1, 0 = empty) keyed by crc32 of the name
+    zones:   time zone names joined with "\\n"
+    strings: UTF-8 names
+
+Build from the backend directory with (cities15000.zip from
+https://download.geonames.org/export/dump/):
+    python gazetteer.py build --source cities15000.zip
+"""
+import os
+import sys
+import mmap
+import zlib
+import heapq
+import struct
+import zipfile
+import argparse
+import threading
+import unicodedata
+from collections import namedtuple
+from typing import Optional, List
+
+# Allow running as a script from the backend directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+GAZETTEER_PATH = os.getenv(
+    "GAZETTEER_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.bin")
+)
+
+# Records with a matching prefix examined per autocomplete query
+GAZETTEER_SCAN_LIMIT = int(os.getenv("GAZETTEER_SCAN_LIMIT", "5000"))
+
+MAGIC = b"GAZETT01"
+HEADER = struct.Struct("<8sIIIIIII")
+# key offset, key length, name offset, name length, lat, lon, population, country, time zone index
+RECORD = struct.Struct("<IHIHffI2sH")
+SLOT = struct.Struct("<I")
+
+Place = namedtuple("Place", ["name", "country", "lat", "lon", "timezone", "population"])
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Lower case, accents removed, punctuation and repeated spaces collapsed ("Jyväskylä" -> "jyvaskyla")."""
+    if not name:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", name.lower())
+    chars = [
+        char if char.isalnum() else " "
+        for char in decomposed
+        if not unicodedata.combining(char)
+    ]
+    return " ".join("".join(chars).split())
+
+
+def split_country(query: str):
+    """Split "Springfield, US" into ("Springfield", "US"); the country is None without a code."""
+    if "," in query:
+        name, _, qualifier = query.rpartition(",")
+        qualifier = qualifier.strip()
+        if len(qualifier) == 2 and qualifier.isalpha():
+            return name.strip(), qualifier.upper()
+    return query, None
+
+
+def _hash(key: bytes) -> int:
+    return zlib.crc32(key)
+
+
+class Gazetteer:
+    """Read-only, lazily memory-mapped city index with an in-memory fallback."""
+
+    def __init__(self, path: str = GAZETTEER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._file = None
+        self._mmap = None
+        self._count = 0
+        self._hash_size = 0
+        self._records_off = 0
+        self._hash_off = 0
+        self._strings_off = 0
+        self._timezones: List[str] = []
+        # Fallback: normalised name -> places, and the sorted names for prefixes
+        self._builtin = {}
+        self._builtin_keys: List[str] = []
+        self._lookups = 0
+        self._misses = 0
+
+    def _load(self):
+        """Open and validate the index file (once); without it, index the built-in cities."""
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                if not os.path.exists(self.path):
+                    print(f"ℹ️ No gazetteer at {self.path} - using the built-in cities")
+                else:
+                    self._open()
+            except Exception as e:
+                print(f"⚠️ Gazetteer {self.path} not used: {e}")
+            if self._mmap is None:
+                self._load_builtin()
+            self._loaded = True
+
+    def _open(self):
+        index_file = open(self.path, "rb")
+        index_map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, count, hash_size, tz_count,
+         records_off, hash_off, tz_off, strings_off) = HEADER.unpack_from(index_map, 0)
+        if magic != MAGIC:
+            raise ValueError("unknown file format")
+        if hash_size & (hash_size - 1) or len(index_map) < strings_off:
+            raise ValueError("file is corrupt or truncated")
+
+        self._timezones = index_map[tz_off:strings_off].decode("utf-8").split("\n")[:tz_count]
+        self._file = index_file
+        self._mmap = index_map
+        self._count = count
+        self._hash_size = hash_size
+        self._records_off = records_off
+        self._hash_off = hash_off
+        self._strings_off = strings_off
+        print(f"🗺️ Gazetteer loaded: {count} names")
+
+    def _load_builtin(self):
+        from astrology_service import astrology_service
+        from user_timezones import CITY_TIMEZONES
+
+        for city, (lat, lon) in astrology_service.city_coordinates.items():
+            place = Place(city.title(), None, lat, lon, CITY_TIMEZONES.get(city), 0)
+            self._builtin.setdefault(normalize_name(city), []).append(place)
+        self._builtin_keys = sorted(self._builtin)
+
+    def _record(self, index: int):
+        return RECORD.unpack_from(self._mmap, self._records_off + index * RECORD.size)
+
+    def _key(self, index: int) -> bytes:
+        key_off, key_len = struct.unpack_from("<IH", self._mmap, self._records_off + index * RECORD.size)
+        start = self._strings_off + key_off
+        return self._mmap[start:start + key_len]
+
+    def _place(self, index: int) -> Place:
+        _, _, name_off, name_len, lat, lon, population, country, tz_index = self._record(index)
+        start = self._strings_off + name_off
+        return Place(
+            self._mmap[start:start + name_len].decode("utf-8"),
+            country.decode("ascii"),
+            round(lat, 4),
+            round(lon, 4),
+            self._timezones[tz_index] if tz_index < len(self._timezones) else None,
+            population
+        )
+
+    def _find(self, key: bytes) -> Optional[int]:
+        """Index of the first (most populous) record named key, via the hash index."""
+        mask = self._hash_size - 1
+        slot = _hash(key) & mask
+        while True:
+            (value,) = SLOT.unpack_from(self._mmap, self._hash_off + slot * SLOT.size)
+            if value == 0:
+                return None
+            if self._key(value - 1) == key:
+                return value - 1
+            slot = (slot + 1) & mask
+
+    def lookup(self, query: Optional[str]) -> Optional[Place]:
+        """
+        Find a city by name.
+
+        Args:
+            query: City name, optionally with a country code ("Paris" or "Paris, FR")
+
+        Returns:
+            The most populous place with that name (in that country), or None
+        """
+        if not self._loaded:
+            self._load()
+
+        name, country = split_country(query or "")
+        key = normalize_name(name)
+        if not key:
+            return None
+        self._lookups += 1
+
+        if self._mmap is None:
+            places = self._builtin.get(key, [])
+        else:
+            places = []
+            index = self._find(key.encode("utf-8"))
+            if index is not None:
+                encoded = key.encode("utf-8")
+                # Records with the same name are adjacent, most populous first
+                while index < self._count and self._key(index) == encoded:
+                    places.append(self._place(index))
+                    if not country:
+                        break
+                    index += 1
+
+        for place in places:
+            # Built-in cities have no country
+            if not country or place.country in (country, None):
+                return place
+        self._misses += 1
+        return None
+
+    def _prefix_range(self, prefix: bytes):
+        """Records whose name starts with prefix (binary search for the first one)."""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        index = low
+        end = min(self._count, low + GAZETTEER_SCAN_LIMIT)
+        while index < end and self._key(index).startswith(prefix):
+            yield index
+            index += 1
+
+    def suggest(self, query: Optional[str], limit: int = 10) -> List[Place]:
+        """
+        Autocomplete city names.
+
+        Args:
+            query: Beginning of a city name
+            limit: Maximum number of places
+
+        Returns:
+            The most populous places whose name starts with the query
+        """
+        if not self._loaded:
+            self._load()
+
+        name, country = split_country(query or "")
+        prefix = normalize_name(name)
+        if not prefix:
+            return []
+
+        if self._mmap is None:
+            return [
+                place
+                for key in self._builtin_keys if key.startswith(prefix)
+                for place in self._builtin[key]
+            ][:limit]
+
+        best = heapq.nlargest(
+            limit * 3,
+            self._prefix_range(prefix.encode("utf-8")),
+            key=lambda index: self._record(index)[6]
+        )
+        places = []
+        seen = set()
+        for index in best:
+            place = self._place(index)
+            # A city indexed under several names (e.g. with and without accents) is listed once
+            if (place.lat, place.lon) in seen or (country and place.country != country):
+                continue
+            seen.add((place.lat, place.lon))
+            places.append(place)
+            if len(places) == limit:
+                break
+        return places
+
+    def get_stats(self) -> dict:
+        if not self._loaded:
+            self._load()
+        return {
+            "path": self.path,
+            "loaded": self._mmap is not None,
+            "names": self._count if self._mmap is not None else len(self._builtin_keys),
+            "lookups": self._lookups,
+            "misses": self._misses
+        }
+
+
+def read_geonames(source: str, alternate_names: bool = False):
+    """
+    Read places from a GeoNames cities dump (cities15000.txt, or the .zip).
+
+    Yields:
+        (normalised name, Place) for the name, the ASCII name and optionally
+        the alternate names of each city
+    """
+    if source.endswith(".zip"):
+        archive = zipfile.ZipFile(source)
+        member = next(name for name in archive.namelist() if name.endswith(".txt"))
+        lines = (line.decode("utf-8") for line in archive.open(member))
+    else:
+        lines = open(source, encoding="utf-8")
+
+    for line in lines:
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) < 18:
+            continue
+        place = Place(
+            fields[1],
+            fields[8][:2].upper() or "--",
+            float(fields[4]),
+            float(fields[5]),
+            fields[17],
+            int(fields[14] or 0)
+        )
+        names = {fields[1], fields[2]}
+        if alternate_names:
+            names.update(
+                alias for alias in fields[3].split(",")
+                if len(alias) >= 3 and not any(char.isdigit() for char in alias)
+            )
+        for key in {normalize_name(name) for name in names}:
+            if key:
+                yield key, place
+
+
+def build_index(path: str, entries) -> int:
+    """
+    Write the index file.
+
+    Args:
+        path: Output file (written to a temporary file and renamed)
+        entries: (normalised name, Place) pairs, e.g. from read_geonames
+
+    Returns:
+        Number of names written
+    """
+    entries = sorted(entries, key=lambda entry: (entry[0].encode("utf-8"), -entry[1].population))
+    count = len(entries)
+    hash_size = 1
+    while hash_size < count * 2:
+        hash_size *= 2
+
+    timezones = sorted({place.timezone for _, place in entries if place.timezone})
+    tz_indexes = {name: index for index, name in enumerate(timezones)}
+    no_timezone = 0xFFFF
+
+    strings = bytearray()
+    string_offsets = {}
+
+    def add_string(value: str):
+        encoded = value.encode("utf-8")
+        if encoded not in string_offsets:
+            string_offsets[encoded] = len(strings)
+            strings.extend(encoded)
+        return string_offsets[encoded], len(encoded)
+
+    records = bytearray()
+    slots = [0] * hash_size
+    for index, (key, place) in enumerate(entries):
+        key_off, key_len = add_string(key)
+        name_off, name_len = add_string(place.name)
+        records.extend(RECORD.pack(
+            key_off, key_len, name_off, name_len,
+            place.lat, place.lon, min(place.population, 0xFFFFFFFF),
+            (place.country or "--").encode("ascii", "replace")[:2],
+            tz_indexes.get(place.timezone, no_timezone)
+        ))
+        if index and entries[index - 1][0] == key:
+            continue  # The hash points at the first record of a name
+        slot = _hash(key.encode("utf-8")) & (hash_size - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (hash_size - 1)
+        slots[slot] = index + 1
+
+    zones = "\n".join(timezones).encode("utf-8")
+    records_off = HEADER.size
+    hash_off = records_off + len(records)
+    tz_off = hash_off + hash_size * SLOT.size
+    strings_off = tz_off + len(zones)
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as index_file:
+        index_file.write(HEADER.pack(
+            MAGIC, count, hash_size, len(timezones), records_off, hash_off, tz_off, strings_off
+        ))
+        index_file.write(records)
+        index_file.write(struct.pack(f"<{hash_size}I", *slots))
+        index_file.write(zones)
+        index_file.write(strings)
+    os.replace(temp_path, path)
+    return count
+
+
+# Singleton instance
+gazetteer = Gazetteer()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline gazetteer for birth city lookups")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Convert a GeoNames cities dump into the index file")
+    build.add_argument("--source", required=True, help="GeoNames cities file (cities15000.txt or .zip)")
+    build.add_argument("--path", default=GAZETTEER_PATH)
+    build.add_argument("--alternate-names", action="store_true",
+                       help="Also index alternate names (e.g. Tukholma); makes the file several times larger")
+    args = parser.parse_args()
+
+    print(f"🗺️ Building gazetteer from {args.source} -> {args.path}")
+    count = build_index(args.path, read_geonames(args.source, args.alternate_names))
+    print(f"✅ Wrote {count} names ({os.path.getsize(args.path) // 1024} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,13 +13,73 @@ CRITICAL: NO FALLBACK HOROSCOPES ARE ALLOWED
 - If Gemini fails, return an error - NEVER return fallback text
 """
 import os
-import google.generativeai as genai
-from typing import Optional, Tuple, Any, Dict
+import time
+import asyncio
+import random
+import threading
+from typing import Optional, Tuple, Any, Dict, AsyncIterator
 from datetime import datetime
-import json
 
-# Import generation rules
-from gemini_rules import GENERAL_RULES, VOCABULARY_BANK, load_prediction_rules
+from aspect_engine import get_aspect_table
+from prompt_builder import prompt_builder, compact_json, get_age_bracket
+from llm_cache import llm_cache
+from llm_call_log import llm_call_log
+from prediction_runs import prediction_period_range
+from llm_providers import create_provider, LLMProviderError, GEMINI_MODEL
+from gemini_rate_limiter import gemini_rate_limiter, is_rate_limit_error, estimate_tokens, GEMINI_MAX_RETRIES
+from gemini_resilience import gemini_breaker, gemini_latency, is_retryable_error, is_outage_error, retry_delay
+
+
+# Per-call timeouts (seconds) - a hung request must not hold a worker or a user forever
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "60"))
+GEMINI_PREVIEW_TIMEOUT_SECONDS = float(os.getenv("GEMINI_PREVIEW_TIMEOUT_SECONDS", "20"))
+
+# Expected output tokens per call (reserved against the TPM budget up front,
+# corrected with the real usage afterwards)
+OUTPUT_TOKEN_ESTIMATES = {
+    "daily": 1500,
+    "weekly": 2500,
+    "monthly": 3000,
+    "preview": 100
+}
+
+
+# Stands in for the user's name in predictions shared by several users
+# (see anonymous_profile / personalize_horoscope)
+NAME_PLACEHOLDER = "[NAME]"
+
+
+def anonymous_profile(user_profile: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Strip a profile down to what a prompt without natal chart depends on:
+    sign, language and age bracket. The name becomes NAME_PLACEHOLDER.
+    
+    Users whose anonymous profiles are equal get identical prompts, so one
+    generated text can be personalised for all of them.
+    """
+    return {
+        "zodiac_sign": user_profile.get("zodiac_sign"),
+        "prediction_language": user_profile.get("prediction_language", "fi"),
+        "age_bracket": get_age_bracket(user_profile.get("age")),
+        "first_name": NAME_PLACEHOLDER
+    }
+
+
+def profile_language(user_profile: Optional[Dict[str, Any]]) -> str:
+    """Language a prediction for the profile is written in (as in _create_prompt)."""
+    return (user_profile or {}).get("prediction_language", "fi")
+
+
+def personalize_horoscope(text: str, user_profile: Dict[str, Any]) -> str:
+    """
+    Put the user's name into a prediction generated for anonymous_profile().
+    
+    Only share a prediction that contains NAME_PLACEHOLDER: without it the
+    text cannot be personalized (generate the user separately instead).
+    """
+    first = user_profile.get("first_name") or ""
+    last = user_profile.get("last_name") or ""
+    return text.replace(NAME_PLACEHOLDER, f"{first} {last}".strip() or "Cosmic Traveler")
 
 
 class GeminiAPIError(Exception):
@@ -27,43 +87,289 @@ class GeminiAPIError(Exception):
     pass
 
 
+class GeminiTimeoutError(GeminiAPIError):
+    """Gemini did not answer within the call's deadline"""
+    pass
+
+
+class GeminiCircuitOpenError(GeminiAPIError):
+    """Call rejected without trying because the circuit breaker is open"""
+    pass
+
+
+def call_outcome(error: Exception) -> str:
+    """Outcome of a failed call for the call log (llm_call_log)."""
+    if isinstance(error, GeminiCircuitOpenError):
+        return "circuit_open"
+    if is_rate_limit_error(error):
+        return "rate_limited"
+    if isinstance(error, (GeminiTimeoutError, asyncio.TimeoutError)) or type(error).__name__ == "DeadlineExceeded":
+        return "timeout"
+    return "error"
+
+
 class GeminiClient:
     """Client for interacting with Google Gemini API for personalized horoscope generation"""
     
     def __init__(self):
         """Initialize Gemini client"""
+        # LLM provider (llm_providers.py): Gemini, or the offline fake with LLM_PROVIDER=fake
         self.model = None
+        self.model_name = GEMINI_MODEL
         self._initialized = False
         self._api_key_available = False
+        self._init_lock = threading.Lock()
     
     def _ensure_initialized(self):
-        """Lazy initialization of Gemini client"""
+        """Lazy initialization of the LLM provider (once, even when called from several threads)"""
         if self._initialized:
             return
         
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            print("ERROR: GEMINI_API_KEY not set. Horoscope generation will fail.")
+        with self._init_lock:
+            if self._initialized:
+                return
+            try:
+                self.model = create_provider()
+                self.model_name = self.model.model_name
+                self._api_key_available = True
+            except LLMProviderError as e:
+                print(f"ERROR: {e}. Horoscope generation will fail.")
+                self._api_key_available = False
+            except Exception as e:
+                print(f"ERROR: Failed to initialize Gemini: {e}")
+                self._api_key_available = False
+            # Set last: the unlocked check above must not see a half-initialized client
             self._initialized = True
-            self._api_key_available = False
-            return
+    
+    def _generate_content(self, prompt: str, output_tokens: int, timeout: float = GEMINI_TIMEOUT_SECONDS):
+        """
+        Send a prompt to Gemini through the process-wide rate limiter.
         
+        Transient errors (429/5xx/timeouts) are retried up to GEMINI_MAX_RETRIES
+        times: 429/503 after the limiter's backoff, others after an exponential
+        backoff with jitter. While the circuit breaker is open, fails fast.
+        """
+        tokens = estimate_tokens(prompt) + output_tokens
+        
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            self._check_breaker()
+            gemini_rate_limiter.acquire(tokens)
+            started = time.monotonic()
+            try:
+                response = self.model.generate_content(prompt, request_options={"timeout": timeout})
+            except Exception as e:
+                if self._should_retry(e, attempt):
+                    if not is_rate_limit_error(e):
+                        time.sleep(retry_delay(attempt))
+                    continue
+                raise
+            
+            self._record_success(response, tokens, time.monotonic() - started)
+            return response
+    
+    async def _generate_content_async(self, prompt: str, output_tokens: int, timeout: float = GEMINI_TIMEOUT_SECONDS):
+        """
+        Async variant of _generate_content: waits for the rate limiter and the
+        response without blocking the event loop.
+        
+        The model's async gRPC client is created once and reused, so
+        concurrent calls share one connection. With GEMINI_HEDGE_ENABLED a
+        slow call is hedged (see _hedged_call).
+        """
+        tokens = estimate_tokens(prompt) + output_tokens
+        
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            self._check_breaker()
+            try:
+                response, latency = await self._hedged_call(prompt, tokens, timeout)
+            except Exception as e:
+                if self._should_retry(e, attempt):
+                    if not is_rate_limit_error(e):
+                        await asyncio.sleep(retry_delay(attempt))
+                    continue
+                if isinstance(e, asyncio.TimeoutError):
+                    raise GeminiTimeoutError(f"Gemini did not respond within {timeout:.0f}s")
+                raise
+            
+            self._record_success(response, tokens, latency)
+            return response
+    
+    async def _single_call(self, prompt: str, tokens: int, timeout: float):
+        """One rate-limited async request. Returns (response, latency in seconds)."""
+        await gemini_rate_limiter.acquire_async(tokens)
+        started = time.monotonic()
+        # The request timeout is enforced by the API client; wait_for is a
+        # hard stop in case the transport never returns
+        response = await asyncio.wait_for(
+            self.model.generate_content_async(prompt, request_options={"timeout": timeout}),
+            timeout + 5
+        )
+        return response, time.monotonic() - started
+    
+    async def _hedged_call(self, prompt: str, tokens: int, timeout: float):
+        """
+        _single_call with an optional hedge: if no answer has arrived within
+        the GEMINI_HEDGE_PERCENTILE latency of recent calls, the same request
+        is sent again and whichever answers first wins (the other is cancelled).
+        """
+        delay = gemini_latency.hedge_delay()
+        if delay is None:
+            return await self._single_call(prompt, tokens, timeout)
+        
+        tasks = [asyncio.ensure_future(self._single_call(prompt, tokens, timeout))]
         try:
-            genai.configure(api_key=api_key)
-            # Use gemini-2.5-flash model
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
-            self._initialized = True
-            self._api_key_available = True
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return tasks[0].result()
+            
+            gemini_latency.hedged += 1
+            tasks.append(asyncio.ensure_future(self._single_call(prompt, tokens, timeout)))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is tasks[1]:
+                            gemini_latency.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    def _check_breaker(self):
+        if not gemini_breaker.allow():
+            raise GeminiCircuitOpenError("Gemini is unavailable (circuit breaker open) - try again shortly")
+    
+    def _should_retry(self, error: Exception, attempt: int) -> bool:
+        """Record a failed call and decide whether to retry it."""
+        self._record_breaker(error)
+        if not is_retryable_error(error) or attempt >= GEMINI_MAX_RETRIES:
+            return False
+        if is_rate_limit_error(error):
+            gemini_rate_limiter.record_throttle()
+        print(f"⚠️ Gemini call failed ({type(error).__name__}), retry {attempt + 1}/{GEMINI_MAX_RETRIES}")
+        return True
+    
+    @staticmethod
+    def _record_breaker(error: Exception):
+        """Count a failed call for the circuit breaker."""
+        if is_outage_error(error):
+            gemini_breaker.record_failure(error)
+        elif is_rate_limit_error(error):
+            # A 429 means Gemini is up, just busy
+            gemini_breaker.record_success()
+        else:
+            # Other client errors (bad request, auth, safety) say nothing about availability
+            gemini_breaker.release_probe()
+    
+    def _record_success(self, response, tokens: int, latency: Optional[float] = None):
+        gemini_breaker.record_success()
+        if latency is not None:
+            gemini_latency.record(latency)
+        usage = getattr(response, "usage_metadata", None)
+        gemini_rate_limiter.record_success(tokens, getattr(usage, "total_token_count", None) or None)
+    
+    def _call_record(
+        self,
+        prompt: str,
+        kind: str,
+        language: Optional[str],
+        started: float,
+        response=None,
+        error: Optional[Exception] = None,
+        cached: bool = False,
+        streamed: bool = False
+    ) -> Dict[str, Any]:
+        """Arguments of llm_call_log.record for a finished call."""
+        record = {
+            "model": self.model_name,
+            "prediction_type": kind,
+            "language": language,
+            "prompt": prompt,
+            "latency": time.monotonic() - started,
+            "outcome": "cached" if cached else "success",
+            "streamed": streamed
+        }
+        if error is not None:
+            record["outcome"] = call_outcome(error)
+            record["error"] = str(error)
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            record["prompt_tokens"] = getattr(usage, "prompt_token_count", None)
+            record["output_tokens"] = getattr(usage, "candidates_token_count", None)
+        return record
+    
+    def _generate_text(
+        self,
+        prompt: str,
+        kind: str,
+        timeout: float = GEMINI_TIMEOUT_SECONDS,
+        language: Optional[str] = None
+    ) -> str:
+        """
+        Get the response text for a prompt. A prompt that was answered before
+        (within its TTL) is served from llm_cache without calling Gemini.
+        Every call is recorded in llm_call_log.
+        
+        Args:
+            prompt: Full prompt
+            kind: 'daily', 'weekly', 'monthly' or 'preview' (token estimate and cache TTL)
+            timeout: Request timeout in seconds
+            language: Prediction language (for the call log)
+        """
+        started = time.monotonic()
+        cached = llm_cache.get(self.model_name, prompt)
+        if cached is not None:
+            llm_call_log.record(**self._call_record(prompt, kind, language, started, cached=True))
+            return cached
+        
+        try:
+            response = self._generate_content(prompt, OUTPUT_TOKEN_ESTIMATES.get(kind, 1500), timeout)
+            if not response.text:
+                raise GeminiAPIError("Gemini returned empty response")
         except Exception as e:
-            print(f"ERROR: Failed to initialize Gemini: {e}")
-            self._initialized = True
-            self._api_key_available = False
+            llm_call_log.record(**self._call_record(prompt, kind, language, started, error=e))
+            raise
+        llm_call_log.record(**self._call_record(prompt, kind, language, started, response=response))
+        llm_cache.put(self.model_name, prompt, kind, response.text)
+        return response.text
+    
+    async def _generate_text_async(
+        self,
+        prompt: str,
+        kind: str,
+        timeout: float = GEMINI_TIMEOUT_SECONDS,
+        language: Optional[str] = None
+    ) -> str:
+        """Async variant of _generate_text (cache and call log writes run in a thread)."""
+        started = time.monotonic()
+        cached = await asyncio.to_thread(llm_cache.get, self.model_name, prompt)
+        if cached is not None:
+            await asyncio.to_thread(llm_call_log.record, **self._call_record(prompt, kind, language, started, cached=True))
+            return cached
+        
+        try:
+            response = await self._generate_content_async(prompt, OUTPUT_TOKEN_ESTIMATES.get(kind, 1500), timeout)
+            if not response.text:
+                raise GeminiAPIError("Gemini returned empty response")
+        except Exception as e:
+            await asyncio.to_thread(llm_call_log.record, **self._call_record(prompt, kind, language, started, error=e))
+            raise
+        await asyncio.to_thread(llm_call_log.record, **self._call_record(prompt, kind, language, started, response=response))
+        await asyncio.to_thread(llm_cache.put, self.model_name, prompt, kind, response.text)
+        return response.text
     
     def generate_horoscope(
         self, 
         zodiac_sign: str, 
         prediction_type: str = "daily",
-        user_profile: Optional[Dict[str, Any]] = None
+        user_profile: Optional[Dict[str, Any]] = None,
+        natal_chart: Optional[Dict[str, Any]] = None,
+        target_date: Optional[str] = None
     ) -> Tuple[str, Dict[str, Any]]:
         """
         Generate a horoscope prediction based on user's stored profile data.
@@ -77,12 +383,207 @@ class GeminiClient:
             zodiac_sign: The user's zodiac sign from database (IMMUTABLE)
             prediction_type: Type of prediction ('daily', 'weekly', 'monthly')
             user_profile: User's stored profile data from database (birth_date, birth_time, birth_city, etc.)
+            natal_chart: Stored natal chart for the user's birth data (see natal_charts.py).
+                         Computed from user_profile only when not given.
+            target_date: Date the prediction is for (YYYY-MM-DD, the user's local date).
+                         Defaults to today.
         
         Returns:
             Tuple containing:
             - Generated horoscope text
             - Dictionary with raw calculation data used for generation
         """
+        prompt, raw_data = self._prepare_horoscope(zodiac_sign, prediction_type, user_profile, natal_chart, target_date)
+        
+        # Generate Content - NO FALLBACKS ALLOWED
+        try:
+            return self._generate_text(prompt, prediction_type, language=profile_language(user_profile)), raw_data
+        except GeminiAPIError:
+            raise
+        except Exception as e:
+            print(f"Gemini API error: {e}")
+            raise GeminiAPIError(f"Failed to generate horoscope: {str(e)}")
+    
+    async def generate_horoscope_async(
+        self,
+        zodiac_sign: str,
+        prediction_type: str = "daily",
+        user_profile: Optional[Dict[str, Any]] = None,
+        natal_chart: Optional[Dict[str, Any]] = None,
+        target_date: Optional[str] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Non-blocking variant of generate_horoscope (same arguments and result).
+        
+        Use from async handlers and the scheduler: the event loop keeps
+        serving other requests while the prediction is generated.
+        """
+        # Astrology calculations are CPU work - keep them off the event loop
+        prompt, raw_data = await asyncio.to_thread(
+            self._prepare_horoscope, zodiac_sign, prediction_type, user_profile, natal_chart, target_date
+        )
+        
+        # Generate Content - NO FALLBACKS ALLOWED
+        try:
+            return await self._generate_text_async(
+                prompt, prediction_type, language=profile_language(user_profile)
+            ), raw_data
+        except GeminiAPIError:
+            raise
+        except Exception as e:
+            print(f"Gemini API error: {e}")
+            raise GeminiAPIError(f"Failed to generate horoscope: {str(e)}")
+    
+    async def prepare_horoscope_async(
+        self,
+        zodiac_sign: str,
+        prediction_type: str = "daily",
+        user_profile: Optional[Dict[str, Any]] = None,
+        natal_chart: Optional[Dict[str, Any]] = None,
+        target_date: Optional[str] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Calculate the chart data and build the prompt without generating
+        (for stream_text_async). Same arguments as generate_horoscope.
+        
+        Returns:
+            Tuple of (prompt, raw calculation data)
+        """
+        return await asyncio.to_thread(
+            self._prepare_horoscope, zodiac_sign, prediction_type, user_profile, natal_chart, target_date
+        )
+    
+    async def stream_text_async(
+        self,
+        prompt: str,
+        kind: str,
+        timeout: float = GEMINI_TIMEOUT_SECONDS,
+        language: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream the response to a prompt as text chunks while Gemini writes it.
+        
+        Goes through the rate limiter and circuit breaker like
+        _generate_content_async (transient errors before the first chunk are
+        retried; a stream is never hedged). A prompt answered before is
+        yielded from llm_cache in one chunk; a completed stream is stored there.
+        
+        If the consumer stops early (e.g. the client disconnected), the
+        upstream request is cancelled. The call is recorded in llm_call_log.
+        
+        Args:
+            prompt: Full prompt
+            kind: 'daily', 'weekly', 'monthly' or 'preview' (token estimate and cache TTL)
+            timeout: Timeout of the whole request in seconds
+            language: Prediction language (for the call log)
+        
+        Raises:
+            GeminiAPIError: If the request fails or returns no text
+        """
+        started = time.monotonic()
+        cached = await asyncio.to_thread(llm_cache.get, self.model_name, prompt)
+        if cached is not None:
+            await asyncio.to_thread(llm_call_log.record, **self._call_record(
+                prompt, kind, language, started, cached=True, streamed=True
+            ))
+            yield cached
+            return
+        
+        if not self.model:
+            raise GeminiAPIError("Gemini API not initialized. GEMINI_API_KEY may not be set.")
+        
+        tokens = estimate_tokens(prompt) + OUTPUT_TOKEN_ESTIMATES.get(kind, 1500)
+        try:
+            for attempt in range(GEMINI_MAX_RETRIES + 1):
+                self._check_breaker()
+                await gemini_rate_limiter.acquire_async(tokens)
+                try:
+                    # Returns once the first chunk has arrived
+                    response = await asyncio.wait_for(
+                        self.model.generate_content_async(prompt, stream=True, request_options={"timeout": timeout}),
+                        timeout + 5
+                    )
+                    break
+                except Exception as e:
+                    if self._should_retry(e, attempt):
+                        if not is_rate_limit_error(e):
+                            await asyncio.sleep(retry_delay(attempt))
+                        continue
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise GeminiTimeoutError(f"Gemini did not respond within {timeout:.0f}s")
+                    print(f"Gemini API error: {e}")
+                    raise GeminiAPIError(f"Failed to generate horoscope: {str(e)}") from e
+        except GeminiAPIError as e:
+            await asyncio.to_thread(llm_call_log.record, **self._call_record(
+                prompt, kind, language, started, error=e.__cause__ or e, streamed=True
+            ))
+            raise
+        
+        parts = []
+        completed = False
+        failed = False
+        try:
+            async for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk without text parts (e.g. only finish metadata)
+                    text = ""
+                if text:
+                    parts.append(text)
+                    yield text
+            completed = True
+        except Exception as e:
+            print(f"Gemini stream error: {e}")
+            failed = True
+            self._record_breaker(e)
+            await asyncio.to_thread(llm_call_log.record, **self._call_record(
+                prompt, kind, language, started, error=e, streamed=True
+            ))
+            raise GeminiAPIError(f"Horoscope stream interrupted: {str(e)}")
+        finally:
+            if not completed:
+                self._cancel_stream(response)
+                if not failed:
+                    # Consumer went away: log without awaiting (the task may be cancelled)
+                    record = self._call_record(prompt, kind, language, started, streamed=True)
+                    record["outcome"] = "cancelled"
+                    asyncio.get_running_loop().run_in_executor(None, lambda: llm_call_log.record(**record))
+        
+        full_text = "".join(parts)
+        if not full_text:
+            await asyncio.to_thread(llm_call_log.record, **self._call_record(
+                prompt, kind, language, started, error=GeminiAPIError("Gemini returned empty response"), streamed=True
+            ))
+            raise GeminiAPIError("Gemini returned empty response")
+        
+        await asyncio.to_thread(llm_call_log.record, **self._call_record(
+            prompt, kind, language, started, response=response, streamed=True
+        ))
+        # Not recorded as a latency sample: stream duration depends on the reader
+        self._record_success(response, tokens)
+        await asyncio.to_thread(llm_cache.put, self.model_name, prompt, kind, full_text)
+    
+    @staticmethod
+    def _cancel_stream(response):
+        """Cancel the gRPC call behind a streamed response that is not read to the end."""
+        # The SDK keeps the api_core stream wrapper (which has cancel()) in _iterator
+        cancel = getattr(getattr(response, "_iterator", None), "cancel", None)
+        if cancel:
+            try:
+                cancel()
+            except Exception as e:
+                print(f"⚠️ Failed to cancel Gemini stream: {e}")
+    
+    def _prepare_horoscope(
+        self,
+        zodiac_sign: str,
+        prediction_type: str,
+        user_profile: Optional[Dict[str, Any]],
+        natal_chart: Optional[Dict[str, Any]],
+        target_date: Optional[str]
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Calculate the chart data and build the prompt for a horoscope."""
         self._ensure_initialized()
         
         # Build raw data structure
@@ -97,12 +598,23 @@ class GeminiClient:
         # 1. Fetch Astrology Data (transits)
         try:
             from astrology_service import astrology_service
-            current_date = datetime.now().strftime("%Y-%m-%d")
-            raw_data["transits"] = astrology_service.calculate_transits(current_date)
-            raw_data["transits"]["date"] = current_date
+            current_date = target_date or datetime.now().strftime("%Y-%m-%d")
+            raw_data["transits"] = astrology_service.get_transit_snapshot(current_date)
+            
+            # Weekly/monthly: events of the whole period, calculated once per period
+            if prediction_type in ("weekly", "monthly"):
+                start, days = prediction_period_range(prediction_type, datetime.strptime(current_date, "%Y-%m-%d").date())
+                transit_range = astrology_service.get_transit_range(start.isoformat(), days)
+                if transit_range:
+                    # The daily longitude arrays stay out of the prompt and the stored raw data
+                    raw_data["transit_period"] = {
+                        key: transit_range[key] for key in ("start", "end", "retrograde", "events")
+                    }
             
-            # Calculate natal chart if user has birth data
-            if user_profile and user_profile.get("birth_date") and user_profile.get("birth_time"):
+            # Use the stored natal chart, or calculate it if user has birth data
+            if natal_chart:
+                raw_data["natal_chart"] = natal_chart
+            elif user_profile and user_profile.get("birth_date") and user_profile.get("birth_time"):
                 natal_data = astrology_service.calculate_natal_chart(
                     user_profile["birth_date"],
                     user_profile["birth_time"],
@@ -116,22 +628,12 @@ class GeminiClient:
             print(f"Astrology calculation failed: {e}")
             raw_data["transits"] = {"error": str(e)}
 
-        # 2. Generate Content - NO FALLBACKS ALLOWED
+        # 2. Check the model before building the prompt - NO FALLBACKS ALLOWED
         if not self.model:
             raise GeminiAPIError("Gemini API not initialized. GEMINI_API_KEY may not be set.")
         
         prompt = self._create_prompt(zodiac_sign, prediction_type, raw_data, user_profile)
-        
-        try:
-            response = self.model.generate_content(prompt)
-            if not response.text:
-                raise GeminiAPIError("Gemini returned empty response")
-            return response.text, raw_data
-        except GeminiAPIError:
-            raise
-        except Exception as e:
-            print(f"Gemini API error: {e}")
-            raise GeminiAPIError(f"Failed to generate horoscope: {str(e)}")
+        return prompt, raw_data
     
     def _create_prompt(
         self, 
@@ -145,77 +647,18 @@ class GeminiClient:
         
         The AI will generate predictions STRICTLY from the provided chart data.
         Output format: 3 sections (Key Influences, Detailed Prediction, Technical Summary)
+        
+        The rules, vocabulary and output format come from the cached prefix
+        of prompt_builder; only the chart data is built per call.
         """
         
         # Get prediction language from user profile (default to 'fi' for Finnish)
         prediction_language = "fi"
-        if user_profile:
-            prediction_language = user_profile.get("prediction_language", "fi")
-        
-        # Language instructions
-        language_instructions = {
-            "fi": "IMPORTANT: Write ALL predictions in Finnish (Suomi). Use natural Finnish language.",
-            "sv": "IMPORTANT: Write ALL predictions in Swedish (Svenska). Use natural Swedish language.",
-            "no": "IMPORTANT: Write ALL predictions in Norwegian (Norsk). Use natural Norwegian language.",
-            "da": "IMPORTANT: Write ALL predictions in Danish (Dansk). Use natural Danish language.",
-            "de": "IMPORTANT: Write ALL predictions in German (Deutsch). Use natural German language.",
-            "fr": "IMPORTANT: Write ALL predictions in French (Français). Use natural French language.",
-            "es": "IMPORTANT: Write ALL predictions in Spanish (Español). Use natural Spanish language.",
-            "it": "IMPORTANT: Write ALL predictions in Italian (Italiano). Use natural Italian language.",
-            "en": "Write predictions in English."
-        }
-        
-        lang_instruction = language_instructions.get(prediction_language, language_instructions["en"])
-        
-        # Load type-specific rules from separate file
-        specific_rules, get_output_format = load_prediction_rules(prediction_type)
-        
-        # Get user age for age-specific voice
         user_age = None
         if user_profile:
+            prediction_language = user_profile.get("prediction_language", "fi")
             user_age = user_profile.get("age")
         
-        age_instruction = ""
-        if user_age is not None:
-            age_instruction = f"\nIMPORTANT: The user's age is {user_age} years old. You MUST use the age-specific voice guidelines from GENERAL_RULES section 6 to match the appropriate tone, focus, and language style for this age group."
-        
-        # SYSTEM PROMPT - Strict technical rules with gemini_rules
-        system_prompt = f"""You are an astrology prediction engine.
-
-{lang_instruction}{age_instruction}
-
-{GENERAL_RULES}
-
-{specific_rules}
-
-{VOCABULARY_BANK}
-
-You generate predictions strictly and only from the technical chart data provided to you.
-
-Never invent planets, aspects, angles or meanings not included in the input.
-
-Follow these rules:
-1. Use only the data given in the input JSON.
-2. Interpret planetary positions, houses, and aspects using classical astrological rules.
-3. Stronger aspects (orb under 1 degree) must be highlighted clearly.
-4. Tie each interpretation to the correct life area based on the house system.
-5. If no relevant aspect exists for a topic, say nothing about that topic.
-6. Produce a prediction that feels personal but is fully traceable back to the data.
-7. Do not mention that you are an AI.
-8. Never change the user's zodiac sign.
-
-All predictions must be derived from:
-- natal positions
-- current transits
-- aspects between current and natal planets
-- house meanings
-- planetary nature
-
-IMMUTABLE DATA RULES:
-- The user's zodiac_sign is calculated from birth_date and CANNOT be changed
-- All birth data (birth_date, birth_time, birth_city) are permanent
-- Predictions must use stored profile data, not user-edited values"""
-
         # Build natal chart array
         natal_chart = raw_data.get("natal_chart", {})
         birth_chart_array = []
@@ -270,8 +713,9 @@ IMMUTABLE DATA RULES:
                 {"planet": "Venus", "sign": "Scorpio", "degree": 20.0, "house": 2}
             ]
         
-        # Calculate aspects between transits and natal
-        aspects_array = self._calculate_aspects(birth_chart_array, current_transits_array)
+        # Calculate aspects between transits and natal (the day's aspect table
+        # is built once and shared by every prediction for that day)
+        aspects_array = get_aspect_table(current_transits_array).calculate(birth_chart_array)
         
         # Build the structured input JSON
         user_name = ""
@@ -291,23 +735,19 @@ IMMUTABLE DATA RULES:
             "current_transits": current_transits_array,
             "aspects": aspects_array
         }
-        
-        # Get output format from the type-specific rules file
-        output_format = get_output_format(prediction_language)
-        
-        # Assemble full prompt
-        full_prompt = f"""{system_prompt}
-
-{output_format}
-
-=== INPUT DATA (JSON) ===
-{json.dumps(input_data, indent=2)}
-=== END INPUT DATA ===
-
-Generate the {prediction_type} prediction for {zodiac_sign.capitalize()} now.
-Use ONLY the data provided above. Do not invent aspects or positions not in the input."""
-        
-        return full_prompt
+        if user_age is not None:
+            input_data["user"]["age"] = user_age
+        if raw_data.get("transit_period"):
+            input_data["period"] = raw_data["transit_period"]
+        
+        return prompt_builder.build(
+            prediction_type,
+            zodiac_sign,
+            input_data,
+            language=prediction_language,
+            age=user_age,
+            age_bracket=user_profile.get("age_bracket") if user_profile else None
+        )
     
     def _get_current_sun_sign(self) -> str:
         """Get the current Sun sign based on date"""
@@ -340,90 +780,6 @@ Use ONLY the data provided above. Do not invent aspects or positions not in the
         else:
             return "Pisces"
     
-    def _calculate_aspects(
-        self, 
-        natal_chart: list, 
-        current_transits: list
-    ) -> list:
-        """
-        Calculate aspects between natal and transit planets.
-        Returns list of aspect dictionaries.
-        """
-        aspects = []
-        
-        # Aspect definitions: name, angle, orb_allowed
-        aspect_definitions = [
-            ("Conjunction", 0, 8),
-            ("Sextile", 60, 4),
-            ("Square", 90, 6),
-            ("Trine", 120, 6),
-            ("Opposition", 180, 8)
-        ]
-        
-        # House meanings for effect descriptions
-        house_meanings = {
-            1: "Self and identity",
-            2: "Finances and values",
-            3: "Communication and learning",
-            4: "Home and family",
-            5: "Creativity and self-expression",
-            6: "Work and health",
-            7: "Partnerships and relationships",
-            8: "Transformation and shared resources",
-            9: "Higher learning and travel",
-            10: "Career and public image",
-            11: "Friends and aspirations",
-            12: "Spirituality and subconscious"
-        }
-        
-        for transit in current_transits:
-            for natal in natal_chart:
-                # Use absolute longitude (lon) for aspect calculations, fallback to degree if lon not available
-                transit_lon = transit.get("lon", transit.get("degree", 0))
-                natal_lon = natal.get("lon", natal.get("degree", 0))
-                
-                # If we only have sign degrees (0-30), we need to estimate absolute longitude
-                # This is approximate - ideally we'd have the full longitude
-                if transit_lon < 30 and natal_lon < 30:
-                    # Estimate: assume middle of sign for approximation
-                    # This is not ideal but better than 0
-                    transit_sign = transit.get("sign", "Aries")
-                    natal_sign = natal.get("sign", "Aries")
-                    sign_order = ["Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo", 
-                                 "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"]
-                    try:
-                        transit_sign_idx = sign_order.index(transit_sign) if transit_sign in sign_order else 0
-                        natal_sign_idx = sign_order.index(natal_sign) if natal_sign in sign_order else 0
-                        transit_lon = (transit_sign_idx * 30) + transit_lon
-                        natal_lon = (natal_sign_idx * 30) + natal_lon
-                    except:
-                        pass
-                
-                # Calculate angle difference (absolute longitude 0-360)
-                diff = abs(transit_lon - natal_lon)
-                if diff > 180:
-                    diff = 360 - diff
-                
-                # Check each aspect type
-                for aspect_name, aspect_angle, max_orb in aspect_definitions:
-                    orb = abs(diff - aspect_angle)
-                    
-                    if orb <= max_orb:
-                        house = natal.get("house", 1)
-                        aspects.append({
-                            "transit_planet": transit.get("planet", "Unknown"),
-                            "natal_planet": natal.get("planet", "Unknown"),
-                            "aspect": aspect_name,
-                            "angle": round(diff, 1),
-                            "orb": round(orb, 1),
-                            "house_effect": house_meanings.get(house, "General life areas")
-                        })
-        
-        # Sort by orb (tightest aspects first)
-        aspects.sort(key=lambda x: x["orb"])
-        
-        return aspects[:10]  # Return top 10 tightest aspects
-    
     def generate_preview_horoscope(self, zodiac_sign: str) -> tuple[str, int]:
         """
         Generate a short one-sentence horoscope preview for the front page.
@@ -437,6 +793,32 @@ Use ONLY the data provided above. Do not invent aspects or positions not in the
             - One sentence horoscope text
             - Lucky number (1-40)
         """
+        prompt = self._prepare_preview(zodiac_sign)
+        
+        try:
+            text = self._generate_text(prompt, "preview", GEMINI_PREVIEW_TIMEOUT_SECONDS, language="fi")
+            return text.strip(), self._lucky_number(zodiac_sign)
+        except GeminiAPIError:
+            raise
+        except Exception as e:
+            print(f"Gemini API error for preview: {e}")
+            raise GeminiAPIError(f"Failed to generate preview horoscope: {str(e)}")
+    
+    async def generate_preview_horoscope_async(self, zodiac_sign: str) -> tuple[str, int]:
+        """Non-blocking variant of generate_preview_horoscope (same argument and result)."""
+        prompt = await asyncio.to_thread(self._prepare_preview, zodiac_sign)
+        
+        try:
+            text = await self._generate_text_async(prompt, "preview", GEMINI_PREVIEW_TIMEOUT_SECONDS, language="fi")
+            return text.strip(), self._lucky_number(zodiac_sign)
+        except GeminiAPIError:
+            raise
+        except Exception as e:
+            print(f"Gemini API error for preview: {e}")
+            raise GeminiAPIError(f"Failed to generate preview horoscope: {str(e)}")
+    
+    def _prepare_preview(self, zodiac_sign: str) -> str:
+        """Calculate current transits and build the one-sentence preview prompt."""
         self._ensure_initialized()
         
         if not self.model:
@@ -447,19 +829,18 @@ Use ONLY the data provided above. Do not invent aspects or positions not in the
         try:
             from astrology_service import astrology_service
             current_date = datetime.now().strftime("%Y-%m-%d")
-            raw_data["transits"] = astrology_service.calculate_transits(current_date)
-            raw_data["transits"]["date"] = current_date
+            raw_data["transits"] = astrology_service.get_transit_snapshot(current_date)
         except Exception as e:
             print(f"Astrology calculation failed for preview: {e}")
             raw_data["transits"] = {"error": str(e)}
         
         # Create simple prompt for one-sentence preview
-        prompt = f"""You are an astrology prediction engine.
+        return f"""You are an astrology prediction engine.
 
 Generate a ONE SENTENCE horoscope for {zodiac_sign} based on current planetary transits.
 
 Current transits data:
-{json.dumps(raw_data.get("transits", {}), indent=2)}
+{compact_json(raw_data.get("transits", {}))}
 
 Rules:
 1. Write EXACTLY one complete sentence in Finnish.
@@ -469,26 +850,11 @@ Rules:
 5. Maximum 25 words.
 
 Output ONLY the sentence, nothing else."""
-
-        try:
-            response = self.model.generate_content(prompt)
-            if not response.text:
-                raise GeminiAPIError("Gemini returned empty response")
-            
-            horoscope_text = response.text.strip()
-            
-            # Generate lucky number (1-40) based on zodiac and current date
-            import random
-            random.seed(zodiac_sign + datetime.now().strftime("%Y-%m-%d"))
-            lucky_number = random.randint(1, 40)
-            
-            return horoscope_text, lucky_number
-            
-        except GeminiAPIError:
-            raise
-        except Exception as e:
-            print(f"Gemini API error for preview: {e}")
-            raise GeminiAPIError(f"Failed to generate preview horoscope: {str(e)}")
+    
+    @staticmethod
+    def _lucky_number(zodiac_sign: str) -> int:
+        """Lucky number (1-40), the same for a zodiac sign all day."""
+        return random.Random(zodiac_sign + datetime.now().strftime("%Y-%m-%d")).randint(1, 40)
 
 
 # Create a singleton instance
@@ -0,0 +1,216 @@
+"""
+Gemini Rate Limiter
+
+All Gemini traffic (scheduled runs, /api/horoscopes/generate and
+/api/preview-horoscope) goes through one process-wide limiter, so the
+process as a whole stays within the API quota instead of sending bursts
+that come back as 429.
+
+How it works:
+- Requests-per-minute and tokens-per-minute budgets (GEMINI_RPM, GEMINI_TPM)
+- Each call reserves a start time up front (GCRA-style). Reservations are
+  handed out in call order under a lock, so callers are served first come,
+  first served, whether they wait in a thread or in the event loop
+- The token cost is estimated before the call and corrected with the real
+  usage afterwards. Tokens have their own burst allowance (GEMINI_TOKEN_BURST)
+- A caller cancelled while waiting (e.g. a timed-out request) gives its
+  reservation back
+- On 429/503 the effective rate is halved and new calls are held back with
+  an exponential backoff; every success gives a little rate back (AIMD)
+"""
+import os
+import time
+import asyncio
+import threading
+from typing import Optional
+
+try:
+    from google.api_core import exceptions as google_exceptions
+    RATE_LIMIT_ERRORS = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.TooManyRequests,
+        google_exceptions.ServiceUnavailable,
+    )
+except ImportError:
+    RATE_LIMIT_ERRORS = ()
+
+
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "250000"))
+# Number of requests that may start back to back before pacing kicks in
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "5"))
+# Tokens that may be sent back to back (0 = GEMINI_BURST requests' share of GEMINI_TPM)
+GEMINI_TOKEN_BURST = int(os.getenv("GEMINI_TOKEN_BURST", "0"))
+# Retries of a call that was rejected with 429/503
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+
+# Never throttle below this share of the configured budgets
+MIN_RATE_FACTOR = 0.1
+# Rate given back per successful call after a throttle
+RATE_RECOVERY_STEP = 0.02
+MAX_BACKOFF_SECONDS = 60.0
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for quota (429) and overload (503) errors from the Gemini API."""
+    if RATE_LIMIT_ERRORS and isinstance(error, RATE_LIMIT_ERRORS):
+        return True
+    message = str(error)
+    return "429" in message or "503" in message or "Resource has been exhausted" in message
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a prompt (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class GeminiRateLimiter:
+    """Process-wide pacing of Gemini calls against RPM and TPM budgets."""
+
+    def __init__(self, rpm: int = GEMINI_RPM, tpm: int = GEMINI_TPM, burst: int = GEMINI_BURST,
+                 token_burst: int = GEMINI_TOKEN_BURST):
+        self.rpm = max(1, rpm)
+        self.tpm = max(1, tpm)
+        self.burst = max(1, burst)
+        self.token_burst = token_burst if token_burst > 0 else max(1, self.burst * self.tpm // self.rpm)
+
+        self._lock = threading.Lock()
+        # Theoretical arrival times (time.monotonic) of the request and token budgets
+        self._request_tat = 0.0
+        self._token_tat = 0.0
+        self._blocked_until = 0.0
+        self._rate_factor = 1.0
+        self._consecutive_throttles = 0
+
+        # Stats
+        self._requests = 0
+        self._throttled = 0
+        self._waiting = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._tokens_reserved = 0
+        self._cancelled = 0
+
+    def reserve(self, tokens: int) -> float:
+        """
+        Reserve the next free slot for a call of the given token cost.
+
+        Returns:
+            Seconds the caller has to wait before sending the request
+        """
+        return self._reserve(tokens)[0]
+
+    def _reserve(self, tokens: int):
+        """Reserve a slot; returns (delay, request interval, token interval) so it can be refunded."""
+        with self._lock:
+            now = time.monotonic()
+            request_interval = 60.0 / (self.rpm * self._rate_factor)
+            # Seconds of token budget per token, and for this call
+            token_time = 60.0 / (self.tpm * self._rate_factor)
+            token_interval = tokens * token_time
+
+            # GCRA: a call may start once its budget fits within the burst allowance
+            start = max(
+                now,
+                self._blocked_until,
+                self._request_tat + request_interval - self.burst * request_interval,
+                self._token_tat + token_interval - self.token_burst * token_time
+            )
+            self._request_tat = max(self._request_tat, start) + request_interval
+            self._token_tat = max(self._token_tat, start) + token_interval
+
+            delay = start - now
+            self._requests += 1
+            self._tokens_reserved += tokens
+            self._total_wait += delay
+            self._max_wait = max(self._max_wait, delay)
+            return delay, request_interval, token_interval
+
+    def _refund(self, tokens: int, request_interval: float, token_interval: float):
+        """Give back the budget of a reservation that was never used."""
+        with self._lock:
+            self._request_tat -= request_interval
+            self._token_tat -= token_interval
+            self._tokens_reserved -= tokens
+            self._cancelled += 1
+
+    def acquire(self, tokens: int):
+        """Wait (blocking the current thread) until a call may be sent."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            self._track_waiting(1)
+            try:
+                time.sleep(delay)
+            finally:
+                self._track_waiting(-1)
+
+    async def acquire_async(self, tokens: int):
+        """Wait (without blocking the event loop) until a call may be sent."""
+        delay, request_interval, token_interval = self._reserve(tokens)
+        if delay > 0:
+            self._track_waiting(1)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                # The call will not be sent: free its slot for the callers behind it
+                self._refund(tokens, request_interval, token_interval)
+                raise
+            finally:
+                self._track_waiting(-1)
+
+    def record_success(self, estimated_tokens: int, actual_tokens: Optional[int] = None):
+        """Correct the token reservation with the real usage and recover the rate."""
+        with self._lock:
+            if actual_tokens is not None:
+                difference = actual_tokens - estimated_tokens
+                self._token_tat += difference * 60.0 / (self.tpm * self._rate_factor)
+                self._tokens_reserved += difference
+            self._consecutive_throttles = 0
+            self._rate_factor = min(1.0, self._rate_factor + RATE_RECOVERY_STEP)
+
+    def record_throttle(self) -> float:
+        """
+        Back off after a 429/503: halve the rate and hold new calls back.
+
+        Returns:
+            Backoff in seconds
+        """
+        with self._lock:
+            self._throttled += 1
+            self._consecutive_throttles += 1
+            self._rate_factor = max(MIN_RATE_FACTOR, self._rate_factor / 2)
+            backoff = min(MAX_BACKOFF_SECONDS, 2.0 ** self._consecutive_throttles)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + backoff)
+            print(f"⚠️ Gemini rate limited - backing off {backoff:.0f}s, rate at {self._rate_factor:.0%} of budget")
+            return backoff
+
+    def _track_waiting(self, change: int):
+        with self._lock:
+            self._waiting += change
+
+    def get_stats(self) -> dict:
+        """Get limiter state and counters for the admin API."""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "rpm_budget": self.rpm,
+                "tpm_budget": self.tpm,
+                "burst": self.burst,
+                "token_burst": self.token_burst,
+                "rate_factor": round(self._rate_factor, 2),
+                "effective_rpm": round(self.rpm * self._rate_factor, 1),
+                "effective_tpm": round(self.tpm * self._rate_factor),
+                "backoff_remaining_seconds": round(max(0.0, self._blocked_until - now), 1),
+                "queue_delay_seconds": round(max(0.0, self._request_tat - now, self._token_tat - now), 1),
+                "waiting": self._waiting,
+                "requests": self._requests,
+                "throttled": self._throttled,
+                "cancelled": self._cancelled,
+                "tokens_reserved": self._tokens_reserved,
+                "avg_wait_seconds": round(self._total_wait / self._requests, 2) if self._requests else 0.0,
+                "max_wait_seconds": round(self._max_wait, 2)
+            }
+
+
+# Singleton instance
+gemini_rate_limiter = GeminiRateLimiter()
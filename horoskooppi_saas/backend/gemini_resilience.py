@@ -0,0 +1,219 @@
+"""
+Gemini Resilience
+
+Controls around every Gemini call (used by GeminiClient):
+- Deadlines: each call has a timeout (GEMINI_TIMEOUT_SECONDS, see gemini_client)
+- Retries: transient errors (timeouts, 5xx, 429) are retried up to
+  GEMINI_MAX_RETRIES times with exponential backoff and full jitter
+  (429/503 back off through the rate limiter instead)
+- Hedging (optional, GEMINI_HEDGE_ENABLED): if a call is slower than the
+  GEMINI_HEDGE_PERCENTILE latency of recent calls, a second identical
+  request is sent and the first answer wins
+- Circuit breaker: after GEMINI_BREAKER_FAILURES consecutive failed calls
+  (timeouts and 5xx - a 429 means Gemini is up, just busy) new calls fail fast for GEMINI_BREAKER_COOLDOWN_SECONDS, then one probe
+  call decides whether to close it again
+
+State is visible at GET /api/admin/gemini/breaker.
+"""
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from typing import Optional
+
+from gemini_rate_limiter import is_rate_limit_error
+
+try:
+    from google.api_core import exceptions as google_exceptions
+    TRANSIENT_ERRORS = (
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.BadGateway,
+        google_exceptions.GatewayTimeout,
+    )
+except ImportError:
+    TRANSIENT_ERRORS = ()
+
+
+GEMINI_RETRY_BASE_SECONDS = float(os.getenv("GEMINI_RETRY_BASE_SECONDS", "1"))
+GEMINI_RETRY_MAX_SECONDS = float(os.getenv("GEMINI_RETRY_MAX_SECONDS", "20"))
+
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_COOLDOWN_SECONDS = float(os.getenv("GEMINI_BREAKER_COOLDOWN_SECONDS", "30"))
+
+GEMINI_HEDGE_ENABLED = os.getenv("GEMINI_HEDGE_ENABLED", "false").lower() == "true"
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95"))
+# Recent successful calls needed before hedging starts
+GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+
+# Successful call latencies kept for the percentile
+LATENCY_WINDOW = 200
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+def is_outage_error(error: Exception) -> bool:
+    """True for errors that count against the circuit breaker: timeouts, connection errors and 5xx."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if TRANSIENT_ERRORS and isinstance(error, TRANSIENT_ERRORS):
+        return True
+    return "503" in str(error)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """True for errors worth retrying: outages (see is_outage_error) and 429."""
+    return is_outage_error(error) or is_rate_limit_error(error)
+
+
+def retry_delay(attempt: int) -> float:
+    """Backoff before retry number attempt + 1: exponential with full jitter."""
+    return random.uniform(0, min(GEMINI_RETRY_MAX_SECONDS, GEMINI_RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Fails Gemini calls fast while the API is down."""
+
+    def __init__(self, failure_threshold: int = GEMINI_BREAKER_FAILURES, cooldown: float = GEMINI_BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._state = BREAKER_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+
+        # Stats
+        self._times_opened = 0
+        self._rejected = 0
+        self._last_error: Optional[str] = None
+
+    def allow(self) -> bool:
+        """
+        Check whether a call may be sent.
+
+        Returns:
+            False while the breaker is open (and while the half-open probe is running)
+        """
+        with self._lock:
+            if self._state == BREAKER_OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self._state = BREAKER_HALF_OPEN
+                self._probe_in_flight = False
+
+            if self._state == BREAKER_CLOSED:
+                return True
+            # A probe that never reported back (e.g. cancelled) is replaced after a cooldown
+            if self._state == BREAKER_HALF_OPEN and (
+                not self._probe_in_flight or time.monotonic() - self._probe_started >= self.cooldown
+            ):
+                self._probe_in_flight = True
+                self._probe_started = time.monotonic()
+                return True
+
+            self._rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != BREAKER_CLOSED:
+                print("✅ Gemini circuit breaker closed")
+            self._state = BREAKER_CLOSED
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """End a call that neither succeeded nor failed, so a half-open breaker can send the next probe."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self, error: Exception):
+        with self._lock:
+            self._consecutive_failures += 1
+            self._last_error = str(error)[:200]
+            if self._state == BREAKER_HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != BREAKER_OPEN:
+                    self._times_opened += 1
+                    print(f"🔌 Gemini circuit breaker opened after {self._consecutive_failures} failures - failing fast for {self.cooldown:.0f}s")
+                self._state = BREAKER_OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def reset(self):
+        """Close the breaker manually (admin)."""
+        with self._lock:
+            self._state = BREAKER_CLOSED
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def get_status(self) -> dict:
+        with self._lock:
+            retry_in = 0.0
+            if self._state == BREAKER_OPEN:
+                retry_in = max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+            return {
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "cooldown_seconds": self.cooldown,
+                "retry_in_seconds": round(retry_in, 1),
+                "times_opened": self._times_opened,
+                "rejected_calls": self._rejected,
+                "last_error": self._last_error
+            }
+
+
+class LatencyTracker:
+    """Latencies of recent successful calls, for the hedging delay."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        with self._lock:
+            if not self._latencies:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return ordered[index]
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, None if hedging is off or there are too few samples."""
+        if not GEMINI_HEDGE_ENABLED:
+            return None
+        with self._lock:
+            if len(self._latencies) < GEMINI_HEDGE_MIN_SAMPLES:
+                return None
+        return self.percentile(GEMINI_HEDGE_PERCENTILE)
+
+    def get_stats(self) -> dict:
+        p50 = self.percentile(50)
+        p95 = self.percentile(95)
+        with self._lock:
+            samples = len(self._latencies)
+        return {
+            "samples": samples,
+            "p50_seconds": round(p50, 2) if p50 is not None else None,
+            "p95_seconds": round(p95, 2) if p95 is not None else None,
+            "hedging_enabled": GEMINI_HEDGE_ENABLED,
+            "hedge_percentile": GEMINI_HEDGE_PERCENTILE,
+            "hedged_calls": self.hedged,
+            "hedge_wins": self.hedge_wins
+        }
+
+
+# Singleton instances
+gemini_breaker = CircuitBreaker()
+gemini_latency = LatencyTracker()
@@ -0,0 +1,215 @@
+"""
+Gemini Response Cache
+
+Identical prompts are answered from the database instead of calling Gemini
+again - e.g. a run item retried after a failed commit, a repeated admin
+trigger or the same preview requested by several workers.
+
+- Key: sha256 of the model name and the full prompt. The prompt is built
+  deterministically from all inputs (prompt_builder), so equal inputs give
+  an equal key
+- Stored in the llm_cache table, so all workers and instances share it
+- Per-type TTLs (LLM_CACHE_TTL_DAILY/WEEKLY/MONTHLY/PREVIEW, in hours)
+- Size-bounded: above LLM_CACHE_MAX_ENTRIES the least recently used
+  entries are evicted
+"""
+import os
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from models import LLMCacheEntry
+
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+
+# How long a response stays valid, per prediction type (hours)
+LLM_CACHE_TTL_HOURS = {
+    "daily": float(os.getenv("LLM_CACHE_TTL_DAILY", "36")),
+    "weekly": float(os.getenv("LLM_CACHE_TTL_WEEKLY", "192")),
+    "monthly": float(os.getenv("LLM_CACHE_TTL_MONTHLY", "768")),
+    "preview": float(os.getenv("LLM_CACHE_TTL_PREVIEW", "24"))
+}
+
+# Eviction runs after this many writes instead of on every write
+EVICT_EVERY_WRITES = 100
+
+
+def llm_cache_key(model: str, prompt: str) -> str:
+    """Content address of a prompt for a model."""
+    return hashlib.sha256(f"{model}\n{prompt.strip()}".encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Database-backed Gemini response cache with TTL and LRU eviction."""
+
+    def __init__(self, enabled: bool = LLM_CACHE_ENABLED, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._evicted = 0
+        self._errors = 0
+
+    def get(self, model: str, prompt: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Returns:
+            Response text, or None on a miss (or when the cache is disabled)
+        """
+        if not self.enabled:
+            return None
+
+        key = llm_cache_key(model, prompt)
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            entry = db.query(LLMCacheEntry).filter(
+                LLMCacheEntry.cache_key == key,
+                LLMCacheEntry.expires_at > now
+            ).first()
+            if not entry:
+                self._count("_misses")
+                return None
+
+            text = entry.response_text
+            db.query(LLMCacheEntry).filter(LLMCacheEntry.cache_key == key).update({
+                LLMCacheEntry.hits: LLMCacheEntry.hits + 1,
+                LLMCacheEntry.last_accessed_at: now
+            }, synchronize_session=False)
+            db.commit()
+            self._count("_hits")
+            return text
+        except Exception as e:
+            # The cache must never fail a prediction
+            db.rollback()
+            self._count("_errors")
+            print(f"⚠️ LLM cache lookup failed: {e}")
+            return None
+        finally:
+            db.close()
+
+    def put(self, model: str, prompt: str, prediction_type: str, response_text: str):
+        """Store a response (replaces an existing entry for the same key)."""
+        if not self.enabled or not response_text:
+            return
+
+        key = llm_cache_key(model, prompt)
+        now = datetime.utcnow()
+        ttl = timedelta(hours=LLM_CACHE_TTL_HOURS.get(prediction_type, LLM_CACHE_TTL_HOURS["daily"]))
+        db = SessionLocal()
+        try:
+            db.query(LLMCacheEntry).filter(LLMCacheEntry.cache_key == key).delete(synchronize_session=False)
+            db.add(LLMCacheEntry(
+                cache_key=key,
+                model=model,
+                prediction_type=prediction_type,
+                response_text=response_text,
+                hits=0,
+                created_at=now,
+                expires_at=now + ttl,
+                last_accessed_at=now
+            ))
+            db.commit()
+        except IntegrityError:
+            # Another worker stored the same response concurrently
+            db.rollback()
+        except Exception as e:
+            db.rollback()
+            self._count("_errors")
+            print(f"⚠️ LLM cache write failed: {e}")
+            return
+        finally:
+            db.close()
+
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % EVICT_EVERY_WRITES == 0
+        if evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Delete expired entries, then the least recently used ones above max_entries.
+
+        Returns:
+            Number of deleted entries
+        """
+        db = SessionLocal()
+        try:
+            deleted = db.query(LLMCacheEntry).filter(
+                LLMCacheEntry.expires_at <= datetime.utcnow()
+            ).delete(synchronize_session=False)
+
+            excess = db.query(func.count(LLMCacheEntry.cache_key)).scalar() - self.max_entries
+            if excess > 0:
+                oldest = db.query(LLMCacheEntry.cache_key).order_by(
+                    LLMCacheEntry.last_accessed_at.asc()
+                ).limit(excess).subquery()
+                deleted += db.query(LLMCacheEntry).filter(
+                    LLMCacheEntry.cache_key.in_(oldest.select())
+                ).delete(synchronize_session=False)
+            db.commit()
+
+            if deleted:
+                self._count("_evicted", deleted)
+                print(f"🧹 Evicted {deleted} LLM cache entries")
+            return deleted
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ LLM cache eviction failed: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def clear(self) -> int:
+        """Delete all entries. Returns the number of deleted entries."""
+        db = SessionLocal()
+        try:
+            deleted = db.query(LLMCacheEntry).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def get_stats(self) -> dict:
+        """Get hit/miss counters (this process) and table size for the admin API."""
+        db = SessionLocal()
+        try:
+            entries = db.query(
+                LLMCacheEntry.prediction_type, func.count(LLMCacheEntry.cache_key)
+            ).group_by(LLMCacheEntry.prediction_type).all()
+        finally:
+            db.close()
+
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "max_entries": self.max_entries,
+                "ttl_hours": LLM_CACHE_TTL_HOURS,
+                "entries": sum(count for _, count in entries),
+                "entries_by_type": {prediction_type: count for prediction_type, count in entries},
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "writes": self._writes,
+                "evicted": self._evicted,
+                "errors": self._errors
+            }
+
+
+# Singleton instance
+llm_cache = LLMCache()
@@ -0,0 +1,277 @@
+"""
+LLM Call Log
+
+Every generation through GeminiClient is recorded in the llm_call_log
+table: model, prediction type, language, prompt size, prompt/output tokens,
+latency and outcome. Calls made during a scheduled run carry its run id
+(set with track_run), so cost can be reported per run.
+
+Admin reports (GET /api/admin/gemini/calls, /api/admin/gemini/calls/runs):
+- p50/p95/p99 latency per prediction type
+- tokens and estimated cost per type and per run
+
+Rows older than LLM_CALL_LOG_RETENTION_DAYS are deleted.
+"""
+import os
+import math
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Optional, List
+
+from database import SessionLocal
+from models import LLMCallLog
+
+
+LLM_CALL_LOG_ENABLED = os.getenv("LLM_CALL_LOG_ENABLED", "true").lower() == "true"
+LLM_CALL_LOG_RETENTION_DAYS = int(os.getenv("LLM_CALL_LOG_RETENTION_DAYS", "30"))
+
+# USD per million tokens, for cost estimates (Gemini 2.5 Flash list prices)
+LLM_PRICE_INPUT_PER_MTOK = float(os.getenv("LLM_PRICE_INPUT_PER_MTOK", "0.30"))
+LLM_PRICE_OUTPUT_PER_MTOK = float(os.getenv("LLM_PRICE_OUTPUT_PER_MTOK", "2.50"))
+
+# Old rows are purged after this many writes instead of on every write
+PURGE_EVERY_WRITES = 500
+
+# Prediction run the current task works for (see track_run)
+_current_run_id: ContextVar[Optional[int]] = ContextVar("llm_call_run_id", default=None)
+
+
+def percentile(values: List[float], percent: float) -> Optional[float]:
+    """Nearest-rank percentile of a list, None if it is empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(len(ordered) * percent / 100) - 1))
+    return ordered[index]
+
+
+def estimate_cost(prompt_tokens: int, output_tokens: int) -> float:
+    """Estimated USD cost of the given token counts."""
+    return (prompt_tokens * LLM_PRICE_INPUT_PER_MTOK + output_tokens * LLM_PRICE_OUTPUT_PER_MTOK) / 1_000_000
+
+
+class LLMCallLogger:
+    """Writes LLMCallLog rows and builds the admin reports."""
+
+    def __init__(self, enabled: bool = LLM_CALL_LOG_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._errors = 0
+
+    @contextmanager
+    def track_run(self, run_id: int):
+        """Attribute the calls made inside the block (and tasks started there) to a prediction run."""
+        token = _current_run_id.set(run_id)
+        try:
+            yield
+        finally:
+            _current_run_id.reset(token)
+
+    def record(
+        self,
+        model: str,
+        prediction_type: str,
+        language: Optional[str],
+        prompt: str,
+        latency: float,
+        outcome: str,
+        prompt_tokens: Optional[int] = None,
+        output_tokens: Optional[int] = None,
+        streamed: bool = False,
+        error: Optional[str] = None,
+        run_id: Optional[int] = None
+    ):
+        """
+        Store one call.
+
+        Args:
+            model: Model name (provider's)
+            prediction_type: daily, weekly, monthly or preview
+            language: Prediction language, if known
+            prompt: Full prompt (only its length is stored)
+            latency: Seconds from request to full response
+            outcome: success, cached, rate_limited, timeout, circuit_open, error or cancelled
+            prompt_tokens: Prompt tokens reported by the API (estimated when missing)
+            output_tokens: Output tokens reported by the API
+            streamed: Whether the response was streamed
+            error: Error message for failed calls
+            run_id: Prediction run; defaults to the one set with track_run
+        """
+        if not self.enabled:
+            return
+
+        if prompt_tokens is None:
+            prompt_tokens = len(prompt) // 4 if outcome == "success" else 0
+        db = SessionLocal()
+        try:
+            db.add(LLMCallLog(
+                run_id=run_id if run_id is not None else _current_run_id.get(),
+                model=model,
+                prediction_type=prediction_type,
+                language=language,
+                streamed=streamed,
+                prompt_chars=len(prompt),
+                prompt_tokens=prompt_tokens,
+                output_tokens=output_tokens or 0,
+                latency_ms=int(latency * 1000),
+                outcome=outcome,
+                error=error[:500] if error else None
+            ))
+            db.commit()
+        except Exception as e:
+            # Accounting must never fail a prediction
+            db.rollback()
+            with self._lock:
+                self._errors += 1
+            print(f"⚠️ LLM call log write failed: {e}")
+            return
+        finally:
+            db.close()
+
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % PURGE_EVERY_WRITES == 0
+        if purge:
+            self.purge()
+
+    def purge(self) -> int:
+        """Delete rows older than the retention period. Returns the number deleted."""
+        db = SessionLocal()
+        try:
+            deleted = db.query(LLMCallLog).filter(
+                LLMCallLog.created_at < datetime.utcnow() - timedelta(days=LLM_CALL_LOG_RETENTION_DAYS)
+            ).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ LLM call log purge failed: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def get_stats(self, hours: float = 24) -> dict:
+        """
+        Aggregate the calls of the last hours per prediction type.
+
+        Returns:
+            Dict with per-type call counts by outcome, latency percentiles
+            (of calls that reached the model), token totals/averages and cost
+        """
+        since = datetime.utcnow() - timedelta(hours=hours)
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                LLMCallLog.prediction_type,
+                LLMCallLog.outcome,
+                LLMCallLog.latency_ms,
+                LLMCallLog.prompt_tokens,
+                LLMCallLog.output_tokens
+            ).filter(LLMCallLog.created_at >= since).all()
+        finally:
+            db.close()
+
+        by_type = {}
+        for prediction_type, outcome, latency_ms, prompt_tokens, output_tokens in rows:
+            entry = by_type.setdefault(prediction_type, {
+                "calls": 0, "outcomes": {}, "latencies": [],
+                "prompt_tokens": 0, "output_tokens": 0
+            })
+            entry["calls"] += 1
+            entry["outcomes"][outcome] = entry["outcomes"].get(outcome, 0) + 1
+            if outcome == "success":
+                entry["latencies"].append(latency_ms)
+            entry["prompt_tokens"] += prompt_tokens or 0
+            entry["output_tokens"] += output_tokens or 0
+
+        types = {}
+        for prediction_type, entry in sorted(by_type.items()):
+            latencies = entry.pop("latencies")
+            successes = entry["outcomes"].get("success", 0)
+            types[prediction_type] = {
+                **entry,
+                "latency_ms": {
+                    "p50": percentile(latencies, 50),
+                    "p95": percentile(latencies, 95),
+                    "p99": percentile(latencies, 99),
+                    "max": max(latencies) if latencies else None
+                },
+                "avg_prompt_tokens": round(entry["prompt_tokens"] / successes) if successes else 0,
+                "avg_output_tokens": round(entry["output_tokens"] / successes) if successes else 0,
+                "cost_usd": round(estimate_cost(entry["prompt_tokens"], entry["output_tokens"]), 4)
+            }
+
+        return {
+            "hours": hours,
+            "calls": len(rows),
+            "cost_usd": round(sum(entry["cost_usd"] for entry in types.values()), 4),
+            "by_type": types,
+            "prices_per_million_tokens": {
+                "input": LLM_PRICE_INPUT_PER_MTOK,
+                "output": LLM_PRICE_OUTPUT_PER_MTOK
+            },
+            "write_errors": self._errors
+        }
+
+    def get_run_stats(self, limit: int = 20) -> list:
+        """
+        Calls, tokens, latency and cost of the most recent prediction runs.
+
+        Returns:
+            List of get_run_summary dicts, newest run first
+        """
+        db = SessionLocal()
+        try:
+            run_ids = [row[0] for row in db.query(LLMCallLog.run_id).filter(
+                LLMCallLog.run_id.isnot(None)
+            ).distinct().order_by(LLMCallLog.run_id.desc()).limit(limit).all()]
+        finally:
+            db.close()
+        return [self.get_run_summary(run_id) for run_id in run_ids]
+
+    def get_run_summary(self, run_id: int) -> dict:
+        """
+        Calls, outcomes, tokens, latency percentiles and cost of one prediction run.
+        """
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                LLMCallLog.prediction_type,
+                LLMCallLog.outcome,
+                LLMCallLog.latency_ms,
+                LLMCallLog.prompt_tokens,
+                LLMCallLog.output_tokens,
+                LLMCallLog.created_at
+            ).filter(LLMCallLog.run_id == run_id).all()
+        finally:
+            db.close()
+
+        outcomes = {}
+        for row in rows:
+            outcomes[row.outcome] = outcomes.get(row.outcome, 0) + 1
+        latencies = [row.latency_ms for row in rows if row.outcome == "success"]
+        prompt_tokens = sum(row.prompt_tokens or 0 for row in rows)
+        output_tokens = sum(row.output_tokens or 0 for row in rows)
+        return {
+            "run_id": run_id,
+            "prediction_type": rows[0].prediction_type if rows else None,
+            "calls": len(rows),
+            "outcomes": outcomes,
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "cost_usd": round(estimate_cost(prompt_tokens, output_tokens), 4),
+            "latency_ms": {
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99)
+            },
+            "first_call_at": min(row.created_at for row in rows).isoformat() if rows else None,
+            "last_call_at": max(row.created_at for row in rows).isoformat() if rows else None
+        }
+
+
+# Singleton instance
+llm_call_log = LLMCallLogger()
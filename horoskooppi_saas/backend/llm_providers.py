@@ -0,0 +1,384 @@
+"""
+LLM Providers
+
+GeminiClient talks to the model through a provider, selected with
+LLM_PROVIDER:
+
+- gemini (default): Google Gemini via google-generativeai
+- fake: offline provider for load tests. Answers deterministically (same
+  prompt -> same text) in the output format the prompt asks for, after a
+  configurable latency, and can inject 429/500 errors. Rate limiting,
+  retries, caching and the scheduler work exactly as with Gemini.
+
+Fake provider settings:
+    FAKE_LLM_LATENCY          fixed | uniform | lognormal | exponential (default lognormal)
+    FAKE_LLM_LATENCY_MS       Median latency (default 800)
+    FAKE_LLM_LATENCY_SIGMA    Spread: lognormal sigma, uniform +-fraction (default 0.3)
+    FAKE_LLM_TAIL_RATE        Share of calls that are stragglers (default 0)
+    FAKE_LLM_TAIL_MS          Extra latency of a straggler (default 10000)
+    FAKE_LLM_ERROR_RATE_429   Share of calls rejected with 429 (default 0)
+    FAKE_LLM_ERROR_RATE_500   Share of calls failing with 500 (default 0)
+    FAKE_LLM_SEED             Seed for latencies and errors (default: random)
+
+Example:
+    LLM_PROVIDER=fake FAKE_LLM_LATENCY_MS=1500 FAKE_LLM_ERROR_RATE_429=0.05 uvicorn main:app
+"""
+import os
+import re
+import abc
+import math
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from types import SimpleNamespace
+from typing import Optional
+
+try:
+    import google.generativeai as genai
+except ImportError:
+    print("WARNING: google-generativeai not installed. Only LLM_PROVIDER=fake will work.")
+    genai = None
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    google_exceptions = None
+
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()
+
+FAKE_LLM_LATENCY = os.getenv("FAKE_LLM_LATENCY", "lognormal").lower()
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.3"))
+FAKE_LLM_TAIL_RATE = float(os.getenv("FAKE_LLM_TAIL_RATE", "0"))
+FAKE_LLM_TAIL_MS = float(os.getenv("FAKE_LLM_TAIL_MS", "10000"))
+FAKE_LLM_ERROR_RATE_429 = float(os.getenv("FAKE_LLM_ERROR_RATE_429", "0"))
+FAKE_LLM_ERROR_RATE_500 = float(os.getenv("FAKE_LLM_ERROR_RATE_500", "0"))
+FAKE_LLM_SEED = os.getenv("FAKE_LLM_SEED")
+
+# Share of the latency before the first streamed chunk
+FAKE_FIRST_CHUNK_SHARE = 0.2
+# Words per streamed chunk
+FAKE_CHUNK_WORDS = 8
+
+
+class LLMProviderError(Exception):
+    """Raised when a provider cannot be set up (missing key or package, unknown name)."""
+    pass
+
+
+class LLMProvider(abc.ABC):
+    """
+    Interface GeminiClient uses: the generate_content / generate_content_async
+    part of genai.GenerativeModel.
+
+    Responses have .text and .usage_metadata.total_token_count. A streamed
+    response (stream=True) is an async iterator of chunks with .text.
+    """
+
+    name = ""
+    model_name = ""
+
+    @abc.abstractmethod
+    def generate_content(self, prompt: str, request_options: Optional[dict] = None):
+        ...
+
+    @abc.abstractmethod
+    async def generate_content_async(self, prompt: str, stream: bool = False, request_options: Optional[dict] = None):
+        ...
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, model_name: str = GEMINI_MODEL):
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise LLMProviderError("GEMINI_API_KEY not set")
+        if genai is None:
+            raise LLMProviderError("google-generativeai not installed")
+
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self._model = genai.GenerativeModel(model_name)
+
+    def generate_content(self, prompt: str, request_options: Optional[dict] = None):
+        return self._model.generate_content(prompt, request_options=request_options)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, request_options: Optional[dict] = None):
+        return await self._model.generate_content_async(prompt, stream=stream, request_options=request_options)
+
+
+# ============================================================================
+# Fake provider
+# ============================================================================
+
+_FAKE_SENTENCES = [
+    "{name}, the Moon moves through a calm part of your chart today.",
+    "Venus softens the way you speak with the people closest to you.",
+    "Mars gives you the energy to finish something you postponed.",
+    "Mercury asks you to read the details twice before you agree.",
+    "Jupiter opens a door that looked closed a week ago.",
+    "Saturn rewards patience more than speed right now.",
+    "A small conversation turns out to matter more than it seemed.",
+    "Trust the plan you made when your head was clear.",
+    "Your intuition is sharper than usual, so listen to it.",
+    "Rest is part of the work, not a break from it.",
+    "Someone notices the effort you have been quietly putting in.",
+    "Money matters ask for a practical, unhurried look.",
+    "An old idea finds a new use.",
+    "Keep your evening free for something that restores you.",
+]
+
+_FAKE_PHRASES = [
+    "Steady light", "Open door", "Quiet strength", "New rhythm",
+    "Clear intention", "Patience", "Warm connection", "Fresh start"
+]
+
+_FORMAT_LINE = re.compile(r"^(?P<label>[^\[\]:]+):\s*\[(?P<hint>[^\]]*)\]\s*$")
+_WORD_RANGE = re.compile(r"(\d+)\s*-\s*(\d+)")
+_USER_NAME = re.compile(r'"user":\{"name":"([^"]*)"')
+
+
+def _prompt_seed(prompt: str) -> int:
+    return int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16], 16)
+
+
+def _paragraph(rng: random.Random, words: int, name: str) -> str:
+    """Sentences from _FAKE_SENTENCES until the paragraph has about `words` words."""
+    sentences = [_FAKE_SENTENCES[0].format(name=name)]
+    count = len(sentences[0].split())
+    pool = []
+    while count < words:
+        if not pool:
+            pool = rng.sample(_FAKE_SENTENCES[1:], len(_FAKE_SENTENCES) - 1)
+        sentence = pool.pop()
+        sentences.append(sentence)
+        count += len(sentence.split())
+    return " ".join(sentences)
+
+
+def fake_response_text(prompt: str) -> str:
+    """
+    Deterministic answer shaped like the output format requested in the prompt.
+
+    Fills the format lines of the prompt ("Word of the Day: [...]",
+    "[Prediction text 80-140 words ...]") in the prompt's own labels, so
+    all languages and prediction types come out in their real layout.
+    """
+    rng = random.Random(_prompt_seed(prompt))
+    name_match = _USER_NAME.search(prompt)
+    name = name_match.group(1) if name_match and name_match.group(1) else "Dear reader"
+
+    # Preview prompts ask for a single sentence
+    if "ONE SENTENCE" in prompt:
+        return rng.choice(_FAKE_SENTENCES[1:])
+
+    # The output format section starts with the "DO NOT USE ** OR *" header
+    lines = prompt.splitlines()
+    start = next((index for index, line in enumerate(lines) if "**" in line), None)
+    if start is None:
+        return _paragraph(rng, 100, name)
+
+    output = []
+    block = None
+    for line in lines[start + 1:]:
+        stripped = line.strip()
+        if stripped.startswith("==="):
+            break
+        if block is not None:
+            # Multi-line [...] placeholder (e.g. the monthly topics list)
+            block.append(stripped)
+            if stripped.endswith("]"):
+                output.append(_fill_text_placeholder(rng, " ".join(block), name))
+                block = None
+            continue
+        if stripped.startswith("["):
+            if stripped.endswith("]"):
+                output.append(_fill_text_placeholder(rng, stripped, name))
+            else:
+                block = [stripped]
+            continue
+        match = _FORMAT_LINE.match(stripped)
+        if match:
+            output.append(f"{match.group('label')}: {_fill_field(rng, match.group('hint'))}")
+        elif not stripped and output and output[-1]:
+            output.append("")
+
+    text = "\n".join(output).strip()
+    return text or _paragraph(rng, 100, name)
+
+
+def _fill_text_placeholder(rng: random.Random, placeholder: str, name: str) -> str:
+    match = _WORD_RANGE.search(placeholder)
+    low, high = (int(match.group(1)), int(match.group(2))) if match else (80, 140)
+    return _paragraph(rng, rng.randint(low, high) - 10, name)
+
+
+def _fill_field(rng: random.Random, hint: str) -> str:
+    if hint.startswith("7"):
+        return ", ".join(str(number) for number in rng.sample(range(1, 41), 7))
+    if len(hint.split()) <= 6 and ("word" in hint.lower() or "sana" in hint.lower() or "ord" in hint.lower()):
+        return rng.choice(_FAKE_PHRASES)
+    return rng.choice(_FAKE_SENTENCES[1:])
+
+
+class FakeResponse:
+    """Response shaped like genai's GenerateContentResponse."""
+
+    def __init__(self, text: str, prompt: str):
+        self.text = text
+        prompt_tokens = max(1, len(prompt) // 4)
+        output_tokens = max(1, len(text) // 4)
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens
+        )
+
+
+class FakeStreamResponse(FakeResponse):
+    """Streamed fake response: async iterator of chunks, cancellable like the SDK's stream."""
+
+    def __init__(self, text: str, prompt: str, duration: float):
+        super().__init__(text, prompt)
+        words = text.split(" ")
+        self._chunks = [
+            " ".join(words[index:index + FAKE_CHUNK_WORDS]) + (" " if index + FAKE_CHUNK_WORDS < len(words) else "")
+            for index in range(0, len(words), FAKE_CHUNK_WORDS)
+        ]
+        # Chunks after the first are spread evenly over duration (seconds)
+        self._chunk_delay = duration / (len(self._chunks) - 1) if len(self._chunks) > 1 else 0
+        self.cancelled = False
+        # Same hook GeminiClient._cancel_stream uses on the SDK's response
+        self._iterator = self
+
+    def cancel(self):
+        self.cancelled = True
+
+    async def __aiter__(self):
+        for index, chunk in enumerate(self._chunks):
+            if self.cancelled:
+                return
+            if index:
+                await asyncio.sleep(self._chunk_delay)
+            yield SimpleNamespace(text=chunk)
+
+
+class FakeProvider(LLMProvider):
+    """Offline provider for load tests (see module docstring for the settings)."""
+
+    name = "fake"
+    model_name = "fake"
+
+    def __init__(
+        self,
+        latency: str = FAKE_LLM_LATENCY,
+        latency_ms: float = FAKE_LLM_LATENCY_MS,
+        sigma: float = FAKE_LLM_LATENCY_SIGMA,
+        tail_rate: float = FAKE_LLM_TAIL_RATE,
+        tail_ms: float = FAKE_LLM_TAIL_MS,
+        error_rate_429: float = FAKE_LLM_ERROR_RATE_429,
+        error_rate_500: float = FAKE_LLM_ERROR_RATE_500,
+        seed: Optional[str] = FAKE_LLM_SEED
+    ):
+        if latency not in ("fixed", "uniform", "lognormal", "exponential"):
+            raise LLMProviderError(f"Unknown FAKE_LLM_LATENCY: {latency}")
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.tail_rate = tail_rate
+        self.tail_ms = tail_ms
+        self.error_rate_429 = error_rate_429
+        self.error_rate_500 = error_rate_500
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        print(f"🧪 Using fake LLM provider ({latency}, median {latency_ms:.0f}ms, "
+              f"429 rate {error_rate_429}, 500 rate {error_rate_500})")
+
+    def _sample_latency(self) -> float:
+        """Latency of one call in seconds."""
+        with self._lock:
+            median = self.latency_ms / 1000
+            if self.latency == "fixed":
+                seconds = median
+            elif self.latency == "uniform":
+                seconds = self._rng.uniform(median * (1 - self.sigma), median * (1 + self.sigma))
+            elif self.latency == "exponential":
+                seconds = self._rng.expovariate(math.log(2) / median) if median > 0 else 0
+            else:
+                seconds = self._rng.lognormvariate(math.log(median), self.sigma) if median > 0 else 0
+            if self.tail_rate and self._rng.random() < self.tail_rate:
+                seconds += self.tail_ms / 1000
+        return max(0.0, seconds)
+
+    def _injected_error(self) -> Optional[Exception]:
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.error_rate_429:
+            return self._error("ResourceExhausted", "429 Resource has been exhausted (fake provider)")
+        if roll < self.error_rate_429 + self.error_rate_500:
+            return self._error("InternalServerError", "500 Internal error (fake provider)")
+        return None
+
+    @staticmethod
+    def _error(name: str, message: str) -> Exception:
+        if google_exceptions is not None:
+            return getattr(google_exceptions, name)(message)
+        return RuntimeError(message)
+
+    def _deadline_error(self, timeout: float) -> Exception:
+        return self._error("DeadlineExceeded", f"504 Deadline of {timeout:.0f}s exceeded (fake provider)")
+
+    def generate_content(self, prompt: str, request_options: Optional[dict] = None):
+        timeout = (request_options or {}).get("timeout")
+        latency = self._sample_latency()
+        if timeout and latency > timeout:
+            time.sleep(timeout)
+            raise self._deadline_error(timeout)
+        time.sleep(latency)
+        error = self._injected_error()
+        if error:
+            raise error
+        return FakeResponse(fake_response_text(prompt), prompt)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, request_options: Optional[dict] = None):
+        timeout = (request_options or {}).get("timeout")
+        latency = self._sample_latency()
+        if timeout and latency > timeout:
+            await asyncio.sleep(timeout)
+            raise self._deadline_error(timeout)
+
+        if not stream:
+            await asyncio.sleep(latency)
+            error = self._injected_error()
+            if error:
+                raise error
+            return FakeResponse(fake_response_text(prompt), prompt)
+
+        # Streams return at the first chunk; the rest arrives over the remaining latency
+        await asyncio.sleep(latency * FAKE_FIRST_CHUNK_SHARE)
+        error = self._injected_error()
+        if error:
+            raise error
+        return FakeStreamResponse(fake_response_text(prompt), prompt, latency * (1 - FAKE_FIRST_CHUNK_SHARE))
+
+
+def create_provider(name: str = LLM_PROVIDER) -> LLMProvider:
+    """
+    Create the provider selected with LLM_PROVIDER.
+
+    Raises:
+        LLMProviderError: If the provider cannot be set up
+    """
+    if name == "gemini":
+        return GeminiProvider()
+    if name == "fake":
+        return FakeProvider()
+    raise LLMProviderError(f"Unknown LLM_PROVIDER: {name}")
@@ -5,10 +5,11 @@ from fastapi import FastAPI, Depends, HTTPException, status, Request, Form, Body
 from pydantic import BaseModel
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.exceptions import HTTPException as StarletteHTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 import os
@@ -18,7 +19,7 @@ from collections import defaultdict
 from typing import Optional as OptionalType
 from starlette.middleware.base import BaseHTTPMiddleware
 
-from database import get_db, init_db, init_test_data_if_needed
+from database import get_db, init_db, init_test_data_if_needed, SessionLocal
 from models import User, Horoscope, Subscription, MagicLinkToken
 from schemas import (
     UserCreate, UserResponse, UserProfileUpdate, Token,
@@ -28,15 +29,26 @@ from schemas import (
 from zodiac_utils import calculate_zodiac_sign
 from auth import (
     create_access_token,
-    get_current_active_user, get_current_subscriber, get_user_by_email
+    get_current_active_user, get_current_subscriber, get_user_by_email, require_admin
 )
-from gemini_client import gemini_client, GeminiAPIError
+from gemini_client import gemini_client, GeminiAPIError, profile_language
+from gemini_rate_limiter import gemini_rate_limiter
+from gemini_resilience import gemini_breaker, gemini_latency
+from prompt_builder import prompt_builder
+from llm_cache import llm_cache
+from llm_call_log import llm_call_log
+from preview_horoscopes import preview_store, normalize_preview_sign, PREVIEW_SIGNS
 from email_service import email_service
 from stripe_webhooks import (
     StripeWebhookHandler, create_checkout_session, create_customer_portal_session
 )
 from checkout_routes import router as checkout_router
-from prediction_scheduler import prediction_scheduler
+from prediction_scheduler import prediction_scheduler, release_horoscope
+from prediction_runs import user_period_key
+from natal_charts import assign_user_natal_chart_async, get_user_natal_chart_async
+from astrology_compute import astrology_compute
+from user_timezones import resolve_timezone, is_valid_timezone
+from gazetteer import gazetteer
 
 # Create FastAPI app
 app = FastAPI(
@@ -130,7 +142,7 @@ def is_bot_request(request: Request) -> bool:
     user_agent = request.headers.get("User-Agent", "").lower()
     return any(bot in user_agent for bot in BOT_USER_AGENTS)
 
-def check_rate_limit(ip: str, request: Request = None) -> tuple[bool, OptionalType[dict]]:
+def check_preview_rate_limit(ip: str, request: Request = None) -> tuple[bool, OptionalType[dict]]:
     """Check if IP is rate limited. Returns (allowed, cached_result)"""
     # Check for bots
     if request and is_bot_request(request):
@@ -261,8 +273,13 @@ async def startup_event():
     # Create test user if CREATE_TEST_USER env var is set
     init_test_data_if_needed()
     
+    # Chart calculations run in worker processes, started now so the first
+    # registration does not wait for them
+    astrology_compute.start()
+    
     # Start the automatic prediction scheduler
-    # Schedule: daily at 7:00 AM, weekly on Sundays, monthly on 30th
+    # Schedule: per subscriber time zone bucket at PREDICTION_SEND_TIME local
+    # time - daily every day, weekly on Sundays, monthly on the 28th
     try:
         prediction_scheduler.start()
     except Exception as e:
@@ -276,6 +293,7 @@ async def shutdown_event():
         prediction_scheduler.stop()
     except Exception as e:
         print(f"⚠️ Error stopping prediction scheduler: {e}")
+    astrology_compute.shutdown()
 
 # ============================================================================
 # 404 ERROR HANDLER
@@ -455,20 +473,23 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         birth_time=user_data.birth_time,
         birth_city=user_data.birth_city,
         zodiac_sign=zodiac_sign,  # Auto-calculated, NEVER editable
-        prediction_language=getattr(user_data, 'prediction_language', 'en') or 'en'
+        prediction_language=getattr(user_data, 'prediction_language', 'en') or 'en',
+        timezone=resolve_timezone(birth_city=user_data.birth_city)
     )
     
+    # Compute and store the natal chart once, at registration
+    await assign_user_natal_chart_async(db, new_user)
+    
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
     
     return new_user
 
-@app.get("/api/admin/check-user/{email}")
+@app.get("/api/admin/check-user/{email}", dependencies=[Depends(require_admin)])
 async def admin_check_user(email: str, db: Session = Depends(get_db)):
     """
     Admin endpoint to check if a user exists (for debugging).
-    In production, protect this with authentication.
     """
     user = get_user_by_email(db, email)
     if user:
@@ -484,6 +505,30 @@ async def admin_check_user(email: str, db: Session = Depends(get_db)):
 class PreviewRequest(BaseModel):
     zodiac_sign: str
 
+@app.get("/api/preview-horoscope/{zodiac_sign}")
+async def get_preview_horoscope(zodiac_sign: str, response: Response):
+    """
+    Get today's free preview horoscope for a sign.
+    
+    The same for every visitor, so it is not rate limited and may be cached
+    by browsers and proxies until the end of the day.
+    """
+    sign = normalize_preview_sign(zodiac_sign)
+    if not sign:
+        raise HTTPException(status_code=400, detail=f"Virheellinen horoskooppimerkki: {zodiac_sign}")
+    
+    try:
+        result = await preview_store.get_preview(sign)
+    except GeminiAPIError as e:
+        print(f"Gemini API error in preview: {e}")
+        raise HTTPException(status_code=500, detail="Ennusteen generointi epäonnistui. Yritä myöhemmin uudelleen.")
+    
+    now = datetime.now()
+    seconds_to_midnight = int((datetime.combine(now.date() + timedelta(days=1), datetime.min.time()) - now).total_seconds())
+    response.headers["Cache-Control"] = f"public, max-age={max(60, min(3600, seconds_to_midnight))}"
+    return result
+
+
 @app.post("/api/preview-horoscope")
 async def preview_horoscope(request: Request, data: PreviewRequest = Body(...)):
     """
@@ -503,7 +548,7 @@ async def preview_horoscope(request: Request, data: PreviewRequest = Body(...)):
         )
     
     # Check rate limit
-    allowed, cached_result = check_rate_limit(client_ip, request)
+    allowed, cached_result = check_preview_rate_limit(client_ip, request)
     
     if not allowed:
         raise HTTPException(
@@ -519,11 +564,8 @@ async def preview_horoscope(request: Request, data: PreviewRequest = Body(...)):
     # Get zodiac sign from request body (data is a Pydantic model)
     zodiac_sign = data.zodiac_sign.strip()
     
-    # Validate zodiac sign (normalize to handle case issues)
-    valid_signs = ["Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo", 
-                   "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"]
-    
-    if zodiac_sign not in valid_signs:
+    # Validate zodiac sign
+    if zodiac_sign not in PREVIEW_SIGNS:
         raise HTTPException(
             status_code=400, 
             detail=f"Virheellinen horoskooppimerkki: {zodiac_sign}",
@@ -531,15 +573,8 @@ async def preview_horoscope(request: Request, data: PreviewRequest = Body(...)):
         )
     
     try:
-        # Generate preview horoscope
-        horoscope_text, lucky_number = gemini_client.generate_preview_horoscope(zodiac_sign)
-        
-        result = {
-            "horoscope": horoscope_text,
-            "lucky_number": lucky_number,
-            "zodiac_sign": zodiac_sign,
-            "generated_at": datetime.utcnow().isoformat()
-        }
+        # Today's preview for the sign (generated once per day, see preview_horoscopes.py)
+        result = await preview_store.get_preview(zodiac_sign)
         
         # Cache result for 24 hours
         set_rate_limit(client_ip, result)
@@ -725,6 +760,7 @@ async def update_profile(
     Editable fields:
     - first_name, last_name, phone, address, full_name, prediction_language
     - birth_date, birth_city, birth_time
+    - timezone (IANA name; empty string resets it to the one derived from birth city)
     
     Note: zodiac_sign is auto-calculated from birth_date and cannot be set directly.
     When birth_date is changed, the zodiac_sign is automatically recalculated.
@@ -742,6 +778,8 @@ async def update_profile(
         current_user.full_name = profile_data.full_name
     
     # Birth data - now editable
+    old_birth_data = (current_user.birth_date, current_user.birth_time, current_user.birth_city)
+    
     if profile_data.birth_date is not None:
         current_user.birth_date = profile_data.birth_date
         # Recalculate zodiac sign when birth date changes
@@ -767,6 +805,18 @@ async def update_profile(
             # Default to 'fi' if invalid
             current_user.prediction_language = 'fi'
     
+    # Delivery time zone - an explicit choice wins, otherwise follow the birth city
+    if profile_data.timezone is not None:
+        if profile_data.timezone and not is_valid_timezone(profile_data.timezone):
+            raise HTTPException(status_code=400, detail=f"Unknown time zone: {profile_data.timezone}")
+        current_user.timezone = resolve_timezone(profile_data.timezone, birth_city=current_user.birth_city)
+    elif current_user.birth_city != old_birth_data[2] and not current_user.timezone:
+        current_user.timezone = resolve_timezone(birth_city=current_user.birth_city)
+    
+    # Recompute the stored natal chart only when birth data actually changed
+    if (current_user.birth_date, current_user.birth_time, current_user.birth_city) != old_birth_data:
+        await assign_user_natal_chart_async(db, current_user)
+    
     db.commit()
     db.refresh(current_user)
     
@@ -876,7 +926,8 @@ def check_rate_limit(db: Session, user_id: int, prediction_type: str) -> dict:
     # Get the latest horoscope of this type for this user
     latest = db.query(Horoscope).filter(
         Horoscope.user_id == user_id,
-        Horoscope.prediction_type == prediction_type
+        Horoscope.prediction_type == prediction_type,
+        Horoscope.released_at.isnot(None)
     ).order_by(Horoscope.created_at.desc()).first()
     
     now = datetime.utcnow()
@@ -1002,6 +1053,153 @@ async def generate_horoscope(
             detail="No zodiac sign available. Please add your birth date in your profile."
         )
     
+    # One prediction per type and period - reuse one that already exists
+    # (e.g. pre-generated by the scheduler) instead of calling Gemini again
+    period_key = user_period_key(current_user, prediction_type)
+    existing = db.query(Horoscope).filter(
+        Horoscope.user_id == current_user.id,
+        Horoscope.prediction_type == prediction_type,
+        Horoscope.period_key == period_key
+    ).first()
+    if existing:
+        release_horoscope(db, existing)
+        return _generated_horoscope_response(existing)
+    
+    user_profile = _generation_profile(current_user, zodiac_sign)
+    
+    # Generate horoscope using Gemini with user's profile data
+    # NO FALLBACKS - Gemini MUST generate the horoscope directly
+    natal_chart = await get_user_natal_chart_async(current_user)
+    try:
+        # Non-blocking - the worker keeps serving other requests during the call
+        content, raw_data = await gemini_client.generate_horoscope_async(
+            zodiac_sign=zodiac_sign,
+            prediction_type=prediction_type,
+            user_profile=user_profile,
+            natal_chart=natal_chart
+        )
+    except GeminiAPIError as e:
+        print(f"❌ Gemini API Error: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "error": "horoscope_generation_failed",
+                "message": "Unable to generate horoscope at this time. Please try again later.",
+                "technical_details": str(e)
+            }
+        )
+    
+    new_horoscope = _save_generated_horoscope(
+        db, current_user.id, zodiac_sign, prediction_type, content, raw_data, period_key
+    )
+    return _generated_horoscope_response(new_horoscope)
+
+
+@app.post("/api/horoscopes/generate/stream")
+async def generate_horoscope_stream(
+    horoscope_data: HoroscopeCreate,
+    current_user: User = Depends(get_current_subscriber),
+    db: Session = Depends(get_db)
+):
+    """
+    Streaming variant of /api/horoscopes/generate (subscribers only).
+    
+    Sends server-sent events while Gemini writes the prediction:
+    - chunk: {"text": ...} - the next piece of text
+    - done: the same JSON as /api/horoscopes/generate returns
+    - error: {"error", "message"} - generation failed, nothing was saved
+    
+    The prediction is saved in one commit once the stream has completed.
+    If the client disconnects, the Gemini request is cancelled and nothing
+    is saved.
+    """
+    prediction_type = horoscope_data.prediction_type
+    
+    rate_status = check_rate_limit(db, current_user.id, prediction_type)
+    if not rate_status["can_generate"]:
+        return _sse_response(_single_event("done", {
+            "can_generate": False,
+            "next_available_at": rate_status["next_available_at"],
+            "content": None,
+            "horoscope": None,
+            "message": f"You can generate a new {prediction_type} horoscope after {rate_status['next_available_at']}"
+        }))
+    
+    zodiac_sign = current_user.zodiac_sign or horoscope_data.zodiac_sign
+    if not zodiac_sign:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No zodiac sign available. Please add your birth date in your profile."
+        )
+    
+    # One prediction per type and period - send an existing one as is
+    period_key = user_period_key(current_user, prediction_type)
+    existing = db.query(Horoscope).filter(
+        Horoscope.user_id == current_user.id,
+        Horoscope.prediction_type == prediction_type,
+        Horoscope.period_key == period_key
+    ).first()
+    if existing:
+        release_horoscope(db, existing)
+        return _sse_response(_single_event("done", _generated_horoscope_response(existing)))
+    
+    natal_chart = await get_user_natal_chart_async(current_user)
+    user_profile = _generation_profile(current_user, zodiac_sign)
+    try:
+        prompt, raw_data = await gemini_client.prepare_horoscope_async(
+            zodiac_sign=zodiac_sign,
+            prediction_type=prediction_type,
+            user_profile=user_profile,
+            natal_chart=natal_chart
+        )
+    except GeminiAPIError as e:
+        print(f"❌ Gemini API Error: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "error": "horoscope_generation_failed",
+                "message": "Unable to generate horoscope at this time. Please try again later.",
+                "technical_details": str(e)
+            }
+        )
+    
+    user_id = current_user.id
+    
+    async def events():
+        stream = gemini_client.stream_text_async(
+            prompt, prediction_type, language=profile_language(user_profile)
+        )
+        parts = []
+        try:
+            async for text in stream:
+                parts.append(text)
+                yield _sse_event("chunk", {"text": text})
+        except GeminiAPIError as e:
+            print(f"❌ Gemini API Error: {e}")
+            yield _sse_event("error", {
+                "error": "horoscope_generation_failed",
+                "message": "Unable to generate horoscope at this time. Please try again later."
+            })
+            return
+        finally:
+            # Client gone mid-stream: closing the stream cancels the Gemini request
+            await stream.aclose()
+        
+        # The request's session may already be closed - save with a fresh one
+        save_db = SessionLocal()
+        try:
+            horoscope = _save_generated_horoscope(
+                save_db, user_id, zodiac_sign, prediction_type, "".join(parts), raw_data, period_key
+            )
+            payload = _generated_horoscope_response(horoscope)
+        finally:
+            save_db.close()
+        yield _sse_event("done", payload)
+    
+    return _sse_response(events())
+
+
+def _generation_profile(current_user: User, zodiac_sign: str) -> dict:
     # Calculate user's age from birth_date
     age = None
     if current_user.birth_date:
@@ -1014,7 +1212,7 @@ async def generate_horoscope(
     
     # Build user profile data for personalized predictions
     # SECURITY: Do NOT send email, phone, or address to Gemini
-    user_profile = {
+    return {
         "birth_date": current_user.birth_date,
         "birth_time": current_user.birth_time,
         "birth_city": current_user.birth_city,
@@ -1024,48 +1222,72 @@ async def generate_horoscope(
         "prediction_language": getattr(current_user, 'prediction_language', 'fi') or 'fi',
         "age": age  # Age is required for age-specific voice in Gemini rules
     }
-    
-    # Generate horoscope using Gemini with user's profile data
-    # NO FALLBACKS - Gemini MUST generate the horoscope directly
-    try:
-        content, raw_data = gemini_client.generate_horoscope(
-            zodiac_sign=zodiac_sign,
-            prediction_type=prediction_type,
-            user_profile=user_profile
-        )
-    except GeminiAPIError as e:
-        print(f"❌ Gemini API Error: {e}")
-        raise HTTPException(
-            status_code=503,
-            detail={
-                "error": "horoscope_generation_failed",
-                "message": "Unable to generate horoscope at this time. Please try again later.",
-                "technical_details": str(e)
-            }
-        )
-    
+
+
+def _save_generated_horoscope(
+    db: Session,
+    user_id: int,
+    zodiac_sign: str,
+    prediction_type: str,
+    content: str,
+    raw_data: dict,
+    period_key: str
+) -> Horoscope:
     # Save to database - always use the user's profile zodiac_sign
     new_horoscope = Horoscope(
-        user_id=current_user.id,
+        user_id=user_id,
         zodiac_sign=zodiac_sign,
         prediction_type=prediction_type,
         content=content,
         raw_data=json.dumps(raw_data),
-        prediction_date=datetime.utcnow()
+        prediction_date=datetime.utcnow(),
+        released_at=datetime.utcnow(),
+        period_key=period_key
     )
     
     db.add(new_horoscope)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # A scheduled run saved this period's prediction in the meantime
+        db.rollback()
+        new_horoscope = db.query(Horoscope).filter(
+            Horoscope.user_id == user_id,
+            Horoscope.prediction_type == prediction_type,
+            Horoscope.period_key == period_key
+        ).first()
+        release_horoscope(db, new_horoscope)
+        return new_horoscope
     db.refresh(new_horoscope)
-    
+    return new_horoscope
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _single_event(event: str, data: dict):
+    yield _sse_event(event, data)
+
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # No caching, and no proxy buffering (nginx) so chunks reach the browser immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _generated_horoscope_response(new_horoscope: Horoscope) -> dict:
     # Calculate next available time
-    interval = RATE_LIMIT_INTERVALS[prediction_type]
+    interval = RATE_LIMIT_INTERVALS[new_horoscope.prediction_type]
     next_available = new_horoscope.created_at + interval
     
     return {
         "can_generate": True,
         "next_available_at": next_available.isoformat(),
-        "content": content,
+        "content": new_horoscope.content,
         "horoscope": {
             "id": new_horoscope.id,
             "zodiac_sign": new_horoscope.zodiac_sign,
@@ -1085,7 +1307,8 @@ async def get_my_horoscopes(
 ):
     """Get current user's horoscopes (subscribers only)"""
     horoscopes = db.query(Horoscope).filter(
-        Horoscope.user_id == current_user.id
+        Horoscope.user_id == current_user.id,
+        Horoscope.released_at.isnot(None)
     ).order_by(Horoscope.created_at.desc()).limit(limit).all()
     
     return horoscopes
@@ -1100,7 +1323,8 @@ async def get_all_horoscopes(
     This endpoint is used by the /patterns page to display all predictions.
     """
     horoscopes = db.query(Horoscope).filter(
-        Horoscope.user_id == current_user.id
+        Horoscope.user_id == current_user.id,
+        Horoscope.released_at.isnot(None)
     ).order_by(Horoscope.created_at.desc()).all()
     
     return horoscopes
@@ -1114,7 +1338,8 @@ async def get_horoscope(
     """Get a specific horoscope (subscribers only)"""
     horoscope = db.query(Horoscope).filter(
         Horoscope.id == horoscope_id,
-        Horoscope.user_id == current_user.id
+        Horoscope.user_id == current_user.id,
+        Horoscope.released_at.isnot(None)
     ).first()
     
     if not horoscope:
@@ -1167,6 +1392,37 @@ async def get_subscription(
     
     return subscription
 
+# ============================================================================
+# Geo
+# ============================================================================
+
+@app.get("/api/geo/cities")
+async def suggest_cities(response: Response, q: str = "", limit: int = 8):
+    """
+    Autocomplete birth cities for the checkout birth city field.
+    
+    Served from the offline gazetteer, most populous matches first. The
+    label ("Helsinki, FI") is what the field should submit: the country code
+    picks the right city when several share a name.
+    """
+    places = gazetteer.suggest(q, max(1, min(limit, 20))) if len(q.strip()) >= 2 else []
+    response.headers["Cache-Control"] = "public, max-age=86400"
+    return {
+        "query": q,
+        "cities": [
+            {
+                "label": f"{place.name}, {place.country}" if place.country else place.name,
+                "name": place.name,
+                "country": place.country,
+                "lat": place.lat,
+                "lon": place.lon,
+                "timezone": place.timezone
+            }
+            for place in places
+        ]
+    }
+
+
 # ============================================================================
 # Health Check
 # ============================================================================
@@ -1180,33 +1436,150 @@ async def health_check():
     }
 
 
+# ============================================================================
+# Gemini Admin Endpoints
+# ============================================================================
+
+@app.get("/api/admin/gemini/rate-limiter", dependencies=[Depends(require_admin)])
+async def get_gemini_rate_limiter_status():
+    """
+    Get the state of the process-wide Gemini rate limiter:
+    budgets, current (backed off) rate, queue delay and counters.
+    """
+    return {
+        **gemini_rate_limiter.get_stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@app.get("/api/admin/gemini/cache", dependencies=[Depends(require_admin)])
+async def get_gemini_cache_stats():
+    """
+    Get Gemini response cache stats: entries per type, TTLs and
+    hit/miss counters of this process.
+    """
+    return {
+        **llm_cache.get_stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@app.delete("/api/admin/gemini/cache", dependencies=[Depends(require_admin)])
+async def clear_gemini_cache():
+    """Delete all cached Gemini responses (e.g. after changing the prediction rules)."""
+    deleted = llm_cache.clear()
+    return {
+        "status": "cleared",
+        "deleted": deleted,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@app.get("/api/admin/gemini/prompts", dependencies=[Depends(require_admin)])
+async def get_gemini_prompt_stats():
+    """
+    Get prompt builder stats: cached prompt prefixes and prompt sizes
+    (estimated tokens before/after compact serialisation) since startup.
+    """
+    return {
+        **prompt_builder.get_stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@app.get("/api/admin/gemini/calls", dependencies=[Depends(require_admin)])
+async def get_gemini_call_stats(hours: float = 24):
+    """
+    Get Gemini call accounting for the last hours, per prediction type:
+    outcomes, p50/p95/p99 latency, prompt/output tokens and estimated cost.
+    
+    Args:
+        hours: Time window (default 24)
+    """
+    return {
+        **llm_call_log.get_stats(hours),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@app.get("/api/admin/gemini/calls/runs", dependencies=[Depends(require_admin)])
+async def get_gemini_call_run_stats(limit: int = 20):
+    """
+    Get calls, tokens, latency percentiles and estimated cost of the most
+    recent prediction runs.
+    
+    Args:
+        limit: Number of runs (default 20)
+    """
+    return {
+        "runs": llm_call_log.get_run_stats(limit),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@app.get("/api/admin/gemini/breaker", dependencies=[Depends(require_admin)])
+async def get_gemini_breaker_status():
+    """
+    Get the Gemini circuit breaker state and the call latencies used for
+    hedging (this process).
+    """
+    return {
+        "circuit_breaker": gemini_breaker.get_status(),
+        "latency": gemini_latency.get_stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@app.post("/api/admin/gemini/breaker/reset", dependencies=[Depends(require_admin)])
+async def reset_gemini_breaker():
+    """Close the Gemini circuit breaker manually (e.g. after an outage is over)."""
+    gemini_breaker.reset()
+    return {
+        "status": "closed",
+        "circuit_breaker": gemini_breaker.get_status(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@app.get("/api/admin/astrology/compute", dependencies=[Depends(require_admin)])
+async def get_astrology_compute_stats():
+    """Get the astrology process pool's size, queue depth and throughput (this process)."""
+    return {
+        **astrology_compute.get_stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
 # ============================================================================
 # Prediction Scheduler Admin Endpoints
 # ============================================================================
 
-@app.get("/api/admin/scheduler/status")
+@app.get("/api/admin/scheduler/status", dependencies=[Depends(require_admin)])
 async def get_scheduler_status():
     """
     Get the status of the prediction scheduler.
-    Returns list of scheduled jobs and their next run times.
+    Returns list of scheduled jobs and their next run times, and which
+    process currently owns the scheduler lease (only that one runs the jobs).
     """
     jobs = prediction_scheduler.get_jobs()
     return {
         "status": "running" if jobs else "stopped",
+        "is_leader": prediction_scheduler.is_leader,
+        "lease": prediction_scheduler.lease.get_status(),
         "jobs": jobs,
         "timestamp": datetime.utcnow().isoformat()
     }
 
 
-@app.post("/api/admin/scheduler/trigger/{prediction_type}")
-async def trigger_prediction_generation(
-    prediction_type: str,
-    db: Session = Depends(get_db)
-):
+@app.post("/api/admin/scheduler/trigger/{prediction_type}", dependencies=[Depends(require_admin)])
+async def trigger_prediction_generation(prediction_type: str):
     """
     Manually trigger prediction generation for all active subscribers.
     Useful for testing or catching up after downtime.
     
+    The run is processed in the background - this returns its run_id
+    immediately. Poll /api/admin/scheduler/runs/{run_id} for progress.
+    
     Args:
         prediction_type: 'daily', 'weekly', or 'monthly'
     """
@@ -1216,32 +1589,60 @@ async def trigger_prediction_generation(
             detail="Invalid prediction type. Must be 'daily', 'weekly', or 'monthly'"
         )
     
-    from prediction_scheduler import (
-        run_daily_predictions, 
-        run_weekly_predictions, 
-        run_monthly_predictions
-    )
+    from prediction_scheduler import start_prediction_run
     
     try:
-        if prediction_type == "daily":
-            await run_daily_predictions()
-        elif prediction_type == "weekly":
-            await run_weekly_predictions()
-        else:
-            await run_monthly_predictions()
+        run_id = await start_prediction_run(prediction_type, trigger="manual")
         
         return {
-            "status": "success",
+            "status": "started",
+            "run_id": run_id,
             "prediction_type": prediction_type,
-            "message": f"Successfully triggered {prediction_type} prediction generation",
+            "progress_url": f"/api/admin/scheduler/runs/{run_id}",
+            "message": f"Started {prediction_type} prediction generation",
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to generate predictions: {str(e)}"
+            detail=f"Failed to start prediction run: {str(e)}"
         )
 
+
+@app.get("/api/admin/scheduler/runs", dependencies=[Depends(require_admin)])
+async def get_prediction_runs(limit: int = 20, db: Session = Depends(get_db)):
+    """List the most recent prediction runs."""
+    from prediction_runs import list_runs
+    return {"runs": list_runs(db, limit)}
+
+
+@app.get("/api/admin/scheduler/runs/{run_id}", dependencies=[Depends(require_admin)])
+async def get_prediction_run_progress(run_id: int, db: Session = Depends(get_db)):
+    """
+    Get progress of a prediction run: per-status counts
+    (pending/generated/emailed/failed) and an ETA.
+    """
+    from prediction_runs import get_run_progress
+    
+    progress = get_run_progress(db, run_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return progress
+
+
+@app.post("/api/admin/scheduler/runs/{run_id}/resume", dependencies=[Depends(require_admin)])
+async def resume_prediction_run_endpoint(run_id: int):
+    """Resume an interrupted run from its last checkpoint (in the background)."""
+    from prediction_scheduler import resume_prediction_run
+    
+    if not await resume_prediction_run(run_id):
+        raise HTTPException(status_code=404, detail="Run not found")
+    return {
+        "status": "resumed",
+        "run_id": run_id,
+        "progress_url": f"/api/admin/scheduler/runs/{run_id}"
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
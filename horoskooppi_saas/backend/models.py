@@ -1,7 +1,7 @@
 """
 Database models for the application
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -26,10 +26,14 @@ class User(Base):
     birth_time = Column(String, nullable=True)  # HH:MM - CANNOT BE CHANGED
     birth_city = Column(String, nullable=True)  # CANNOT BE CHANGED
     zodiac_sign = Column(String, nullable=True)  # Auto-calculated from birth_date - NEVER EDITABLE
+    natal_chart_key = Column(String, nullable=True, index=True)  # Key of the stored NatalChart for the birth data
     
     # Prediction language (derived from country at checkout)
     prediction_language = Column(String, default="en")  # fi, en, sv, etc.
     
+    # Delivery time zone for scheduled predictions (IANA name - see user_timezones.py)
+    timezone = Column(String, nullable=True, index=True)
+    
     is_active = Column(Boolean, default=True)
     is_subscriber = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -67,9 +71,33 @@ class Horoscope(Base):
     raw_data = Column(Text, nullable=True) # JSON string of calculation data
     created_at = Column(DateTime, default=datetime.utcnow)
     prediction_date = Column(DateTime, nullable=False)
+    # Pre-generated scheduled predictions stay hidden (NULL) until delivered
+    released_at = Column(DateTime, nullable=True, index=True)
+    # Period the prediction covers (2026-10-16, 2026-W42, 2026-10) - one per user, type and period
+    period_key = Column(String, nullable=True)
     
     # Relationships
     user = relationship("User", back_populates="horoscopes")
+    
+    __table_args__ = (
+        UniqueConstraint("user_id", "prediction_type", "period_key", name="uq_horoscope_period"),
+    )
+
+
+class NatalChart(Base):
+    """
+    Natal chart computed once per distinct birth data.
+    Users with identical birth date, time and city share one row (by chart_key).
+    """
+    __tablename__ = "natal_charts"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    chart_key = Column(String, unique=True, index=True, nullable=False)
+    birth_date = Column(String, nullable=False)
+    birth_time = Column(String, nullable=False)
+    birth_city = Column(String, nullable=True)
+    chart_data = Column(Text, nullable=False)  # JSON string of calculate_natal_chart output
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 
 class MagicLinkToken(Base):
@@ -91,3 +119,110 @@ class MagicLinkToken(Base):
     
     # Relationships
     user = relationship("User")
+
+
+class PredictionRun(Base):
+    """
+    One execution of a prediction job (scheduled or manually triggered).
+    Progress is tracked per user in PredictionRunItem so an interrupted
+    run can be resumed without regenerating predictions already made.
+    """
+    __tablename__ = "prediction_runs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    prediction_type = Column(String, nullable=False)  # daily, weekly, monthly
+    trigger = Column(String, default="schedule")  # schedule, manual
+    status = Column(String, default="running", index=True)  # seeding, running, generated, completed, failed
+    total = Column(Integer, default=0)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    last_started_at = Column(DateTime, default=datetime.utcnow)  # Updated when the run is resumed
+    finished_at = Column(DateTime, nullable=True)
+    
+    # Scheduled runs cover one time zone bucket for one local date;
+    # manual runs leave both empty and cover all subscribers
+    timezone = Column(String, nullable=True)
+    period_date = Column(String, nullable=True)  # YYYY-MM-DD in the bucket's time zone
+    
+    # Pre-generated runs are emailed by the delivery stage at send_at (UTC);
+    # runs without send_at email each prediction right after generating it
+    send_at = Column(DateTime, nullable=True)
+    
+    # Relationships
+    items = relationship("PredictionRunItem", back_populates="run")
+    
+    __table_args__ = (
+        UniqueConstraint("prediction_type", "timezone", "period_date", name="uq_prediction_run_bucket"),
+    )
+
+
+class PredictionRunItem(Base):
+    """Per-user checkpoint of a prediction run"""
+    __tablename__ = "prediction_run_items"
+    __table_args__ = (
+        UniqueConstraint("run_id", "user_id", name="uq_prediction_run_items_run_user"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(Integer, ForeignKey("prediction_runs.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(String, default="pending", index=True)  # pending, generated, emailed, failed
+    horoscope_id = Column(Integer, ForeignKey("horoscopes.id"), nullable=True)
+    error = Column(Text, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    run = relationship("PredictionRun", back_populates="items")
+
+
+class SchedulerLease(Base):
+    """
+    Database-backed lease that decides which process owns the cron jobs.
+    The owner renews expires_at by heartbeat; once it stops, another
+    process takes the lease over after expiry.
+    """
+    __tablename__ = "scheduler_leases"
+    
+    name = Column(String, primary_key=True)  # e.g. "prediction_scheduler"
+    owner_id = Column(String, nullable=False)  # hostname:pid:random
+    acquired_at = Column(DateTime, default=datetime.utcnow)
+    heartbeat_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class LLMCacheEntry(Base):
+    """
+    Cached Gemini response, keyed by a hash of the model name and the full prompt.
+    Shared by all workers through the database; see llm_cache.py.
+    """
+    __tablename__ = "llm_cache"
+    
+    cache_key = Column(String, primary_key=True)  # sha256(model + prompt)
+    model = Column(String, nullable=False)
+    prediction_type = Column(String, nullable=False)  # daily, weekly, monthly, preview
+    response_text = Column(Text, nullable=False)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class LLMCallLog(Base):
+    """
+    One horoscope generation through GeminiClient: sizes, tokens, latency
+    and outcome, for latency percentiles and cost reports (see llm_call_log.py).
+    """
+    __tablename__ = "llm_call_log"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    run_id = Column(Integer, nullable=True, index=True)  # PredictionRun, empty outside scheduled runs
+    model = Column(String, nullable=False)
+    prediction_type = Column(String, nullable=False)  # daily, weekly, monthly, preview
+    language = Column(String, nullable=True)
+    streamed = Column(Boolean, default=False)
+    prompt_chars = Column(Integer, default=0)
+    prompt_tokens = Column(Integer, default=0)
+    output_tokens = Column(Integer, default=0)
+    latency_ms = Column(Integer, default=0)  # Including rate limiter waits and retries
+    outcome = Column(String, nullable=False)  # success, cached, rate_limited, timeout, circuit_open, error, cancelled
+    error = Column(String, nullable=True)
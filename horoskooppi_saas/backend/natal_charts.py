@@ -0,0 +1,311 @@
+"""
+Persisted Natal Charts
+
+A natal chart only depends on birth date, birth time and birth city, which
+almost never change. Instead of rerunning the Swiss ephemeris on every
+prediction, the chart is computed once and stored in the natal_charts table:
+- When birth data is entered at checkout (save_birthdate_step)
+- When a user is created or changes birth data (register, update_profile)
+- Lazily, the first time a prediction needs it
+
+Users with identical birth data share one row, keyed by chart_key. The
+key includes NATAL_CHART_VERSION: bump it whenever the calculation changes
+(coordinates, UTC offset, objects) so stored charts are recalculated - the
+backfill below moves every user to the new key and deletes the old rows.
+Async code (request handlers, the scheduler) uses the *_async variants,
+which calculate missing charts in the astrology process pool
+(astrology_compute.py) and keep database work off the event loop.
+
+Backfill existing users with:
+    python natal_charts.py
+"""
+import os
+import sys
+import json
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import Optional, Dict, Iterable
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+# Allow running as a script from the backend directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import SessionLocal
+from models import User, NatalChart
+from astrology_service import astrology_service
+from astrology_compute import astrology_compute
+
+
+# Version of the chart calculation (2: gazetteer coordinates, UTC offset at the birth place and time)
+NATAL_CHART_VERSION = 2
+
+
+def natal_chart_key(birth_date: Optional[str], birth_time: Optional[str], birth_city: Optional[str]) -> Optional[str]:
+    """
+    Get the shared cache key for a set of birth data.
+
+    Returns None when there is not enough data for a natal chart
+    (birth date and birth time are both required).
+    """
+    if not birth_date or not birth_time:
+        return None
+    city = (birth_city or "").lower().strip()
+    raw = f"v{NATAL_CHART_VERSION}|{birth_date.strip()}|{birth_time.strip()}|{city}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def get_or_create_natal_chart(
+    db: Session,
+    birth_date: Optional[str],
+    birth_time: Optional[str],
+    birth_city: Optional[str]
+) -> Optional[dict]:
+    """
+    Get the stored natal chart for birth data, computing and storing it on first use.
+
+    Returns:
+        Natal chart dict (calculate_natal_chart format), or None without birth date/time
+    """
+    key = natal_chart_key(birth_date, birth_time, birth_city)
+    if not key:
+        return None
+
+    stored = db.query(NatalChart.chart_data).filter(NatalChart.chart_key == key).first()
+    if stored:
+        return json.loads(stored.chart_data)
+
+    chart = astrology_service.calculate_natal_chart(birth_date, birth_time, birth_city)
+    store_natal_chart(db, key, birth_date, birth_time, birth_city, chart)
+    return chart
+
+
+def store_natal_chart(
+    db: Session,
+    key: str,
+    birth_date: str,
+    birth_time: str,
+    birth_city: Optional[str],
+    chart: dict
+):
+    """Store a calculated natal chart under its key (mock data is skipped)."""
+    # Mock data (flatlib missing or calculation error) is never persisted,
+    # so the real chart is computed once the problem is fixed
+    if "note" in chart:
+        return
+
+    try:
+        db.add(NatalChart(
+            chart_key=key,
+            birth_date=birth_date,
+            birth_time=birth_time,
+            birth_city=birth_city,
+            chart_data=json.dumps(chart)
+        ))
+        db.commit()
+    except IntegrityError:
+        # Another worker stored the same chart concurrently
+        db.rollback()
+
+
+def _load_natal_chart(key: str) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        return load_natal_charts(db, [key]).get(key)
+    finally:
+        db.close()
+
+
+def _store_natal_chart(key: str, birth_date: str, birth_time: str, birth_city: Optional[str], chart: dict):
+    db = SessionLocal()
+    try:
+        store_natal_chart(db, key, birth_date, birth_time, birth_city, chart)
+    finally:
+        db.close()
+
+
+async def get_or_create_natal_chart_async(
+    birth_date: Optional[str],
+    birth_time: Optional[str],
+    birth_city: Optional[str],
+    db: Optional[Session] = None
+) -> Optional[dict]:
+    """
+    Async get_or_create_natal_chart: a missing chart is calculated in the
+    astrology process pool.
+
+    Args:
+        db: Session for the lookup and the insert (committed, like
+            get_or_create_natal_chart). Without one they run in a thread
+            with their own session.
+    """
+    key = natal_chart_key(birth_date, birth_time, birth_city)
+    if not key:
+        return None
+
+    if db is not None:
+        stored = load_natal_charts(db, [key]).get(key)
+    else:
+        stored = await asyncio.to_thread(_load_natal_chart, key)
+    if stored:
+        return stored
+
+    chart = await astrology_compute.natal_chart(birth_date, birth_time, birth_city)
+    if db is not None:
+        store_natal_chart(db, key, birth_date, birth_time, birth_city, chart)
+    else:
+        await asyncio.to_thread(_store_natal_chart, key, birth_date, birth_time, birth_city, chart)
+    return chart
+
+
+def load_natal_charts(db: Session, keys: Iterable[str]) -> Dict[str, dict]:
+    """Bulk-load stored natal charts by key (missing keys are left out)."""
+    keys = {key for key in keys if key}
+    if not keys:
+        return {}
+    rows = db.query(NatalChart.chart_key, NatalChart.chart_data).filter(
+        NatalChart.chart_key.in_(keys)
+    ).all()
+    return {row.chart_key: json.loads(row.chart_data) for row in rows}
+
+
+def _current_chart_data(user) -> Optional[str]:
+    """Chart data loaded with the row, unless it belongs to an older key (birth data or version changed)."""
+    chart_data = getattr(user, "natal_chart_data", None)
+    if chart_data and getattr(user, "natal_chart_key", None) == natal_chart_key(
+        user.birth_date, user.birth_time, user.birth_city
+    ):
+        return chart_data
+    return None
+
+
+def get_user_natal_chart(db: Session, user) -> Optional[dict]:
+    """
+    Get the natal chart for a user (or a lightweight subscriber row).
+
+    Uses chart data already loaded with the row when present, otherwise the
+    stored chart, computing it only if it has never been stored.
+    """
+    chart_data = _current_chart_data(user)
+    if chart_data:
+        return json.loads(chart_data)
+    return get_or_create_natal_chart(db, user.birth_date, user.birth_time, user.birth_city)
+
+
+async def get_user_natal_chart_async(user) -> Optional[dict]:
+    """Async get_user_natal_chart; database work runs in a thread with its own session."""
+    chart_data = _current_chart_data(user)
+    if chart_data:
+        return json.loads(chart_data)
+    return await get_or_create_natal_chart_async(user.birth_date, user.birth_time, user.birth_city)
+
+
+def assign_user_natal_chart(db: Session, user: User) -> Optional[dict]:
+    """
+    Point a user at the natal chart for their current birth data, storing it if needed.
+    Call after birth data is set or changed; the caller commits the user.
+    """
+    user.natal_chart_key = natal_chart_key(user.birth_date, user.birth_time, user.birth_city)
+    if not user.natal_chart_key:
+        return None
+    return get_or_create_natal_chart(db, user.birth_date, user.birth_time, user.birth_city)
+
+
+async def assign_user_natal_chart_async(db: Session, user: User) -> Optional[dict]:
+    """Async assign_user_natal_chart (the chart is calculated in the astrology process pool)."""
+    user.natal_chart_key = natal_chart_key(user.birth_date, user.birth_time, user.birth_city)
+    if not user.natal_chart_key:
+        return None
+    return await get_or_create_natal_chart_async(user.birth_date, user.birth_time, user.birth_city, db)
+
+
+def backfill_natal_charts(batch_size: int = 500) -> int:
+    """
+    Store natal charts for all existing users with birth date and time.
+
+    Walks users in keyset-paginated chunks; identical birth data is only
+    computed once, and each chunk's missing charts are calculated in
+    parallel in the astrology process pool. Users whose key is out of date
+    (birth data changed, or a new NATAL_CHART_VERSION) are moved to a
+    freshly calculated chart, and charts no user refers to any more are
+    deleted. Safe to run repeatedly.
+
+    Returns:
+        Number of users updated
+    """
+    updated = 0
+    last_id = 0
+    started_at = datetime.utcnow()
+
+    while True:
+        db = SessionLocal()
+        try:
+            users = db.query(User).filter(
+                User.id > last_id,
+                User.birth_date.isnot(None),
+                User.birth_time.isnot(None)
+            ).order_by(User.id).limit(batch_size).all()
+
+            if not users:
+                break
+
+            # Calculate the batch's missing charts in one submission to the process pool
+            missing = {}
+            for user in users:
+                key = natal_chart_key(user.birth_date, user.birth_time, user.birth_city)
+                missing.setdefault(key, (user.birth_date, user.birth_time, user.birth_city))
+            for key in load_natal_charts(db, missing):
+                del missing[key]
+            if missing:
+                charts = asyncio.run(astrology_compute.natal_charts(list(missing.values())))
+                for (key, birth_data), chart in zip(missing.items(), charts):
+                    store_natal_chart(db, key, *birth_data, chart)
+
+            for user in users:
+                key = natal_chart_key(user.birth_date, user.birth_time, user.birth_city)
+                if user.natal_chart_key != key:
+                    user.natal_chart_key = key
+                    updated += 1
+
+            db.commit()
+            last_id = users[-1].id
+            print(f"🪐 Natal chart backfill: processed users up to #{last_id}")
+        finally:
+            db.close()
+
+    deleted = prune_natal_charts(started_at)
+    if deleted:
+        print(f"🧹 Deleted {deleted} outdated natal charts")
+    return updated
+
+
+def prune_natal_charts(created_before: datetime) -> int:
+    """
+    Delete stored charts no user refers to (old keys after a version bump or
+    changed birth data). Charts created after created_before are kept, so
+    charts stored at checkout before the account exists survive.
+
+    Returns:
+        Number of charts deleted
+    """
+    db = SessionLocal()
+    try:
+        referenced = db.query(User.natal_chart_key).filter(User.natal_chart_key.isnot(None))
+        deleted = db.query(NatalChart).filter(
+            NatalChart.created_at < created_before,
+            NatalChart.chart_key.notin_(referenced)
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    from database import init_db
+
+    init_db()
+    count = backfill_natal_charts()
+    astrology_compute.shutdown()
+    print(f"✅ Natal chart backfill completed: {count} users updated")
@@ -0,0 +1,546 @@
+"""
+Persisted prediction runs
+
+Every scheduled or manually triggered prediction job is recorded as a
+PredictionRun with one PredictionRunItem per subscriber. Item status moves
+pending -> generated -> emailed (or failed, or skipped), so:
+- An interrupted run (process restart, deploy) resumes where it stopped
+- Users that already got a prediction are never sent to Gemini twice,
+  also across runs: horoscopes are unique per user, type and period_key
+- The admin API can report progress and an ETA while a run is in flight
+"""
+import os
+from datetime import datetime, date, timedelta
+from typing import Optional, List, Iterator, Any, Tuple
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import User, Subscription, Horoscope, NatalChart, PredictionRun, PredictionRunItem
+from user_timezones import DEFAULT_TIMEZONE, local_now
+
+
+# Item statuses
+ITEM_PENDING = "pending"
+ITEM_GENERATED = "generated"
+ITEM_EMAILED = "emailed"
+ITEM_FAILED = "failed"
+ITEM_SKIPPED = "skipped"  # User already had a prediction for the period
+
+# Run statuses
+RUN_SEEDING = "seeding"
+RUN_RUNNING = "running"
+RUN_GENERATED = "generated"  # Pre-generation done, waiting for delivery at send_at
+RUN_COMPLETED = "completed"
+RUN_FAILED = "failed"
+
+# Rows per keyset page when streaming subscribers and run items
+PREDICTION_BATCH_SIZE = int(os.getenv("PREDICTION_BATCH_SIZE", "500"))
+
+# The only user columns batch jobs need: prompt data and email delivery
+SUBSCRIBER_COLUMNS = (
+    User.id,
+    User.email,
+    User.zodiac_sign,
+    User.birth_date,
+    User.birth_time,
+    User.birth_city,
+    User.first_name,
+    User.last_name,
+    User.full_name,
+    User.prediction_language,
+    User.natal_chart_key,
+    User.timezone,
+)
+
+# Delivery time zone of a user (users without one belong to the default bucket)
+SUBSCRIBER_TIMEZONE = func.coalesce(User.timezone, DEFAULT_TIMEZONE)
+
+
+def prediction_period_key(prediction_type: str, for_date: date) -> str:
+    """
+    Get the period a prediction made for a (local) date covers.
+
+    - daily: the date (2026-10-16)
+    - weekly: the ISO week; the Sunday run is for the week starting Monday (2026-W43)
+    - monthly: the month; the run on the 28th is for the coming month (2026-11)
+    """
+    if prediction_type == "weekly":
+        year, week, _ = (for_date + timedelta(days=1)).isocalendar()
+        return f"{year}-W{week:02d}"
+    if prediction_type == "monthly":
+        return (for_date + timedelta(days=4)).strftime("%Y-%m")
+    return for_date.isoformat()
+
+
+def prediction_period_range(prediction_type: str, for_date: date) -> Tuple[date, int]:
+    """
+    Get the first day and length (days) of the period a prediction covers.
+
+    Same periods as prediction_period_key: the Monday-Sunday week, the
+    calendar month, or the date itself for daily predictions.
+    """
+    if prediction_type == "weekly":
+        start = for_date + timedelta(days=1)
+        return start - timedelta(days=start.weekday()), 7
+    if prediction_type == "monthly":
+        start = (for_date + timedelta(days=4)).replace(day=1)
+        next_month = (start + timedelta(days=32)).replace(day=1)
+        return start, (next_month - start).days
+    return for_date, 1
+
+
+def user_period_key(user, prediction_type: str, target_date: Optional[str] = None) -> str:
+    """
+    Get the period key for a user's prediction.
+
+    Args:
+        user: User object or subscriber row (uses its delivery time zone)
+        prediction_type: 'daily', 'weekly', or 'monthly'
+        target_date: Local date (YYYY-MM-DD) of a scheduled run, defaults to the user's today
+    """
+    if target_date:
+        for_date = date.fromisoformat(target_date)
+    else:
+        for_date = local_now(getattr(user, "timezone", None) or DEFAULT_TIMEZONE).date()
+    return prediction_period_key(prediction_type, for_date)
+
+
+def create_run(prediction_type: str, trigger: str = "schedule") -> int:
+    """
+    Create a run record. Subscribers are added to it by seed_run().
+
+    Args:
+        prediction_type: 'daily', 'weekly', or 'monthly'
+        trigger: 'schedule' or 'manual'
+
+    Returns:
+        ID of the new run
+    """
+    db = SessionLocal()
+    try:
+        run = PredictionRun(prediction_type=prediction_type, trigger=trigger, status=RUN_SEEDING)
+        db.add(run)
+        db.commit()
+        return run.id
+    finally:
+        db.close()
+
+
+def create_bucket_run(
+    prediction_type: str,
+    timezone: str,
+    period_date: str,
+    send_at: Optional[datetime] = None
+) -> Optional[int]:
+    """
+    Create the scheduled run for one time zone bucket and local date.
+
+    With send_at (naive UTC) the run is pre-generated: predictions are stored
+    unreleased and emailed by the delivery stage once send_at has passed.
+
+    Returns:
+        ID of the new run, or None if the bucket already has a run for that date
+    """
+    db = SessionLocal()
+    try:
+        exists = db.query(PredictionRun.id).filter(
+            PredictionRun.prediction_type == prediction_type,
+            PredictionRun.timezone == timezone,
+            PredictionRun.period_date == period_date
+        ).first()
+        if exists:
+            return None
+
+        run = PredictionRun(
+            prediction_type=prediction_type,
+            trigger="schedule",
+            status=RUN_SEEDING,
+            timezone=timezone,
+            period_date=period_date,
+            send_at=send_at
+        )
+        db.add(run)
+        db.commit()
+        return run.id
+    except IntegrityError:
+        db.rollback()
+        return None
+    finally:
+        db.close()
+
+
+def get_subscriber_timezones() -> List[str]:
+    """Get the distinct delivery time zones of active subscribers."""
+    db = SessionLocal()
+    try:
+        rows = db.query(SUBSCRIBER_TIMEZONE).join(Subscription).filter(
+            User.is_subscriber == True,
+            Subscription.status == "active"
+        ).distinct().all()
+        return sorted(tz_name for (tz_name,) in rows)
+    finally:
+        db.close()
+
+
+def iter_active_subscriber_ids(
+    batch_size: int = None,
+    after_id: int = 0,
+    timezone: Optional[str] = None
+) -> Iterator[List[int]]:
+    """
+    Stream IDs of active subscribers in keyset-paginated chunks.
+
+    Each chunk is read in its own short-lived session, so memory stays flat
+    no matter how many subscribers there are. A user with several active
+    subscriptions is returned once. With a timezone, only subscribers in
+    that delivery time zone are returned.
+    """
+    batch_size = batch_size or PREDICTION_BATCH_SIZE
+    last_id = after_id
+    while True:
+        db = SessionLocal()
+        try:
+            query = db.query(User.id).join(Subscription).filter(
+                User.is_subscriber == True,
+                Subscription.status == "active",
+                User.id > last_id
+            )
+            if timezone:
+                query = query.filter(SUBSCRIBER_TIMEZONE == timezone)
+            rows = query.distinct().order_by(User.id).limit(batch_size).all()
+        finally:
+            db.close()
+
+        if not rows:
+            return
+        user_ids = [user_id for (user_id,) in rows]
+        yield user_ids
+        last_id = user_ids[-1]
+
+
+def seed_run(run_id: int):
+    """
+    Add one pending item per active subscriber to a run that is still seeding.
+
+    Seeding is itself resumable: it continues after the highest user ID
+    already present, so a restart during seeding neither loses nor
+    duplicates users.
+    """
+    db = SessionLocal()
+    try:
+        run = db.query(PredictionRun).filter(PredictionRun.id == run_id).first()
+        if not run or run.status != RUN_SEEDING:
+            return
+        prediction_type = run.prediction_type
+        trigger = run.trigger
+        timezone = run.timezone
+        after_id = db.query(func.max(PredictionRunItem.user_id)).filter(
+            PredictionRunItem.run_id == run_id
+        ).scalar() or 0
+    finally:
+        db.close()
+
+    for user_ids in iter_active_subscriber_ids(after_id=after_id, timezone=timezone):
+        db = SessionLocal()
+        try:
+            db.bulk_insert_mappings(PredictionRunItem, [
+                {"run_id": run_id, "user_id": user_id, "status": ITEM_PENDING, "updated_at": datetime.utcnow()}
+                for user_id in user_ids
+            ])
+            db.commit()
+        finally:
+            db.close()
+
+    db = SessionLocal()
+    try:
+        run = db.query(PredictionRun).filter(PredictionRun.id == run_id).first()
+        run.total = db.query(func.count(PredictionRunItem.id)).filter(
+            PredictionRunItem.run_id == run_id
+        ).scalar() or 0
+        run.status = RUN_RUNNING
+        db.commit()
+        bucket = f", {timezone} {run.period_date}" if timezone else ""
+        print(f"📝 Seeded {prediction_type} run #{run_id} ({run.total} users, trigger: {trigger}{bucket})")
+    finally:
+        db.close()
+
+
+def iter_open_items(
+    run_id: int,
+    batch_size: int = None,
+    statuses: tuple = (ITEM_PENDING, ITEM_GENERATED)
+) -> Iterator[List[Any]]:
+    """
+    Stream the run items that still need generation or email delivery
+    (or only those in the given statuses).
+
+    Keyset-paginated on item ID. Each chunk is one short-lived query that
+    selects only the user columns the prompt and the email need, plus the
+    stored natal chart, returned as lightweight rows (item_id, item_status,
+    horoscope_id, id, email, ..., natal_chart_data) instead of full ORM objects.
+
+    Pending items of users that already have a prediction for the period
+    (another run, an on-demand or a welcome prediction) are marked skipped
+    in bulk, one query per chunk, and left out.
+    """
+    batch_size = batch_size or PREDICTION_BATCH_SIZE
+    last_item_id = 0
+
+    db = SessionLocal()
+    try:
+        run = db.query(PredictionRun.prediction_type, PredictionRun.period_date).filter(
+            PredictionRun.id == run_id
+        ).first()
+    finally:
+        db.close()
+    if not run:
+        return
+
+    while True:
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                PredictionRunItem.id.label("item_id"),
+                PredictionRunItem.status.label("item_status"),
+                PredictionRunItem.horoscope_id,
+                *SUBSCRIBER_COLUMNS,
+                NatalChart.chart_data.label("natal_chart_data")
+            ).join(User, User.id == PredictionRunItem.user_id).outerjoin(
+                NatalChart, NatalChart.chart_key == User.natal_chart_key
+            ).filter(
+                PredictionRunItem.run_id == run_id,
+                PredictionRunItem.status.in_(statuses),
+                PredictionRunItem.id > last_item_id
+            ).order_by(PredictionRunItem.id).limit(batch_size).all()
+            if not rows:
+                return
+
+            last_item_id = rows[-1].item_id
+            rows = _skip_served_items(db, rows, run.prediction_type, run.period_date)
+        finally:
+            db.close()
+
+        if rows:
+            yield rows
+
+
+def _skip_served_items(db: Session, rows: List[Any], prediction_type: str, period_date: Optional[str]) -> List[Any]:
+    """Mark pending items of users already served for the period as skipped; return the others."""
+    keys = {
+        row.item_id: user_period_key(row, prediction_type, period_date)
+        for row in rows if row.item_status == ITEM_PENDING
+    }
+    if not keys:
+        return rows
+
+    served = set(db.query(Horoscope.user_id, Horoscope.period_key).filter(
+        Horoscope.user_id.in_({row.id for row in rows if row.item_id in keys}),
+        Horoscope.prediction_type == prediction_type,
+        Horoscope.period_key.in_(set(keys.values()))
+    ).all())
+    skipped = [row.item_id for row in rows if row.item_id in keys and (row.id, keys[row.item_id]) in served]
+    if not skipped:
+        return rows
+
+    db.query(PredictionRunItem).filter(PredictionRunItem.id.in_(skipped)).update({
+        PredictionRunItem.status: ITEM_SKIPPED,
+        PredictionRunItem.error: "Already has a prediction for the period",
+        PredictionRunItem.updated_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.commit()
+    print(f"⏭️ Skipped {len(skipped)} users that already have a {prediction_type} prediction")
+
+    skipped = set(skipped)
+    return [row for row in rows if row.item_id not in skipped]
+
+
+def update_item(db: Session, item_id: int, **values):
+    """Checkpoint an item without loading it into the session."""
+    values["updated_at"] = datetime.utcnow()
+    db.query(PredictionRunItem).filter(PredictionRunItem.id == item_id).update(
+        values, synchronize_session=False
+    )
+    db.commit()
+
+
+def mark_run_started(run_id: int) -> dict:
+    """
+    Record that a run is (re)starting in this process.
+
+    Returns:
+        Dict with the run's period_date (local YYYY-MM-DD of a time zone
+        bucket) and send_at (pre-generated runs); both None for manual runs
+    """
+    db = SessionLocal()
+    try:
+        run = db.query(PredictionRun).filter(PredictionRun.id == run_id).first()
+        if not run:
+            return {"period_date": None, "send_at": None}
+        if run.status != RUN_SEEDING:
+            run.status = RUN_RUNNING
+        run.last_started_at = datetime.utcnow()
+        run.finished_at = None
+        db.commit()
+        return {"period_date": run.period_date, "send_at": run.send_at}
+    finally:
+        db.close()
+
+
+def finish_run(run_id: int, status: str = RUN_COMPLETED):
+    """Mark a run as completed (or failed)."""
+    db = SessionLocal()
+    try:
+        run = db.query(PredictionRun).filter(PredictionRun.id == run_id).first()
+        if run:
+            run.status = status
+            run.finished_at = datetime.utcnow()
+            db.commit()
+    finally:
+        db.close()
+
+
+def reopen_run(run_id: int) -> bool:
+    """
+    Put a finished run back into running state so the scheduler owner picks it up.
+
+    Returns:
+        True if the run exists
+    """
+    db = SessionLocal()
+    try:
+        run = db.query(PredictionRun).filter(PredictionRun.id == run_id).first()
+        if not run:
+            return False
+        if run.status not in (RUN_SEEDING, RUN_RUNNING):
+            run.status = RUN_RUNNING
+            run.finished_at = None
+            db.commit()
+        return True
+    finally:
+        db.close()
+
+
+def get_due_delivery_runs() -> List[Any]:
+    """
+    Get pre-generated runs whose send time has passed and that are not completed.
+
+    Returns:
+        Rows of (id, prediction_type, period_date, status)
+    """
+    db = SessionLocal()
+    try:
+        return db.query(
+            PredictionRun.id, PredictionRun.prediction_type, PredictionRun.period_date, PredictionRun.status
+        ).filter(
+            PredictionRun.send_at.isnot(None),
+            PredictionRun.send_at <= datetime.utcnow(),
+            PredictionRun.status.in_([RUN_SEEDING, RUN_RUNNING, RUN_GENERATED])
+        ).order_by(PredictionRun.send_at, PredictionRun.id).all()
+    finally:
+        db.close()
+
+
+def count_open_items(run_id: int) -> int:
+    """Count the items of a run that are not emailed or failed yet."""
+    db = SessionLocal()
+    try:
+        return db.query(func.count(PredictionRunItem.id)).filter(
+            PredictionRunItem.run_id == run_id,
+            PredictionRunItem.status.in_([ITEM_PENDING, ITEM_GENERATED])
+        ).scalar() or 0
+    finally:
+        db.close()
+
+
+def get_interrupted_runs() -> List[int]:
+    """Get IDs of runs left seeding or running, e.g. by a process restart."""
+    db = SessionLocal()
+    try:
+        rows = db.query(PredictionRun.id).filter(
+            PredictionRun.status.in_([RUN_SEEDING, RUN_RUNNING])
+        ).order_by(PredictionRun.id).all()
+        return [run_id for (run_id,) in rows]
+    finally:
+        db.close()
+
+
+def get_run_progress(db: Session, run_id: int) -> Optional[dict]:
+    """
+    Get progress of a run: item counts per status and an ETA.
+
+    The ETA is based on the throughput since the run was last (re)started,
+    so downtime before a resume does not skew it.
+
+    Returns:
+        Progress dict, or None if the run does not exist
+    """
+    run = db.query(PredictionRun).filter(PredictionRun.id == run_id).first()
+    if not run:
+        return None
+
+    counts = {ITEM_PENDING: 0, ITEM_GENERATED: 0, ITEM_EMAILED: 0, ITEM_FAILED: 0, ITEM_SKIPPED: 0}
+    rows = db.query(PredictionRunItem.status, func.count(PredictionRunItem.id)).filter(
+        PredictionRunItem.run_id == run_id
+    ).group_by(PredictionRunItem.status).all()
+    for item_status, count in rows:
+        counts[item_status] = count
+
+    # While seeding, run.total is not known yet - use the items added so far
+    total = run.total or sum(counts.values())
+    remaining = counts[ITEM_PENDING]
+    eta_seconds = None
+    eta = None
+
+    if run.status in (RUN_SEEDING, RUN_RUNNING, RUN_GENERATED) and run.last_started_at:
+        processed_since_start = db.query(func.count(PredictionRunItem.id)).filter(
+            PredictionRunItem.run_id == run_id,
+            PredictionRunItem.status != ITEM_PENDING,
+            PredictionRunItem.updated_at >= run.last_started_at
+        ).scalar() or 0
+        elapsed = (datetime.utcnow() - run.last_started_at).total_seconds()
+
+        if processed_since_start > 0 and elapsed > 0:
+            eta_seconds = round(remaining * elapsed / processed_since_start, 1)
+            eta = (datetime.utcnow() + timedelta(seconds=eta_seconds)).isoformat()
+
+    end = run.finished_at or datetime.utcnow()
+
+    return {
+        "run_id": run.id,
+        "prediction_type": run.prediction_type,
+        "trigger": run.trigger,
+        "timezone": run.timezone,
+        "period_date": run.period_date,
+        "send_at": run.send_at.isoformat() if run.send_at else None,
+        "status": run.status,
+        "total": total,
+        "counts": counts,
+        "processed": total - remaining,
+        "percent_complete": round((total - remaining) / total * 100, 1) if total else 0.0,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+        "elapsed_seconds": round((end - run.started_at).total_seconds(), 1) if run.started_at else None,
+        "eta_seconds": eta_seconds,
+        "eta": eta
+    }
+
+
+def list_runs(db: Session, limit: int = 20) -> List[dict]:
+    """Get the most recent runs, newest first."""
+    runs = db.query(PredictionRun).order_by(PredictionRun.id.desc()).limit(limit).all()
+    return [
+        {
+            "run_id": run.id,
+            "prediction_type": run.prediction_type,
+            "trigger": run.trigger,
+            "timezone": run.timezone,
+            "period_date": run.period_date,
+            "status": run.status,
+            "total": run.total,
+            "started_at": run.started_at.isoformat() if run.started_at else None,
+            "finished_at": run.finished_at.isoformat() if run.finished_at else None
+        }
+        for run in runs
+    ]
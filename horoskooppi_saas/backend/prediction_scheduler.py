@@ -4,49 +4,55 @@ Automatic Prediction Scheduler Service
 This service handles:
 1. Generating predictions automatically for all active subscribers
 2. Sending predictions via email
-3. Scheduling:
-   - Daily predictions: Every day at 7:00 AM (except first one after purchase)
-   - Weekly predictions: Every Sunday at 7:00 AM
-   - Monthly predictions: Every 30th of the month at 7:00 AM
+3. Scheduling, per time zone bucket (subscribers grouped by their local time zone):
+   - Daily predictions: Every day at PREDICTION_SEND_TIME (07:00) local time
+   - Weekly predictions: Also every Sunday
+   - Monthly predictions: Also every 28th of the month
+   A bucket's run is pre-generated starting PREDICTION_LEAD_MINUTES before its
+   send time; buckets missed entirely are still run up to PREDICTION_CATCHUP_HOURS
+   after it. A separate delivery job emails the pre-generated runs once their
+   send time has passed. The first predictions after purchase are sent with
+   the welcome email instead.
 """
 import os
 import json
-from datetime import datetime, timedelta
-from typing import Optional, List
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
 from database import SessionLocal
-from models import User, Horoscope, Subscription
-from gemini_client import gemini_client, GeminiAPIError
+from models import User, Horoscope, PredictionRun
+from gemini_client import gemini_client, GeminiAPIError, anonymous_profile, personalize_horoscope, NAME_PLACEHOLDER
+from prompt_builder import prompt_builder
+from llm_call_log import llm_call_log
+from preview_horoscopes import preview_store, PREVIEW_SIGNS, PREVIEW_REFRESH_MINUTES
 from email_service import email_service
+from astrology_service import astrology_service
+from natal_charts import get_user_natal_chart, get_user_natal_chart_async
+from scheduler_lease import LeaderLease, SCHEDULER_HEARTBEAT_SECONDS
+from prediction_runs import (
+    create_run, create_bucket_run, get_subscriber_timezones, seed_run, iter_open_items, update_item,
+    mark_run_started, reopen_run, finish_run, get_interrupted_runs, get_due_delivery_runs, user_period_key,
+    ITEM_PENDING, ITEM_GENERATED, ITEM_EMAILED, ITEM_FAILED, RUN_GENERATED, RUN_COMPLETED, RUN_FAILED
+)
 
 
 # =============================================================================
 # PREDICTION GENERATION FUNCTIONS
 # =============================================================================
 
-def generate_prediction_for_user(
-    db: Session, 
-    user: User, 
-    prediction_type: str
-) -> Optional[Horoscope]:
+def build_user_profile(user) -> dict:
     """
-    Generate a prediction for a specific user.
-    
-    Args:
-        db: Database session
-        user: User object
-        prediction_type: 'daily', 'weekly', or 'monthly'
-    
-    Returns:
-        Horoscope object if successful, None otherwise
+    Build the profile sent to Gemini for a user or subscriber row
+    (NO personal contact data - email/phone/address excluded).
     """
-    if not user.zodiac_sign:
-        print(f"⚠️ User {user.email} has no zodiac sign - skipping prediction")
-        return None
-    
     # Calculate user age
     age = None
     if user.birth_date:
@@ -57,8 +63,7 @@ def generate_prediction_for_user(
         except (ValueError, TypeError):
             age = None
     
-    # Build user profile for Gemini (NO personal contact data - email/phone/address excluded)
-    user_profile = {
+    return {
         "birth_date": user.birth_date,
         "birth_time": user.birth_time,
         "birth_city": user.birth_city,
@@ -68,132 +73,768 @@ def generate_prediction_for_user(
         "prediction_language": getattr(user, 'prediction_language', 'fi') or 'fi',
         "age": age
     }
+
+
+def generate_prediction_for_user(
+    db: Session, 
+    user: User, 
+    prediction_type: str,
+    target_date: Optional[str] = None,
+    release: bool = True,
+    check_existing: bool = True
+) -> Optional[Horoscope]:
+    """
+    Generate a prediction for a specific user.
+    
+    A user gets at most one prediction per type and period (see
+    prediction_period_key). If one already exists it is returned instead
+    of calling Gemini again.
+    
+    Blocking - for async code use generate_prediction_for_user_async.
+    
+    Args:
+        db: Database session
+        user: User object, or a lightweight subscriber row with the same attributes
+        prediction_type: 'daily', 'weekly', or 'monthly'
+        target_date: Local date the prediction is for (YYYY-MM-DD), defaults to today
+        release: False to store the prediction hidden until release_horoscope()
+        check_existing: False when the caller already filtered out users served
+                        for the period (batch runs do this in bulk)
+    
+    Returns:
+        Horoscope object if successful, None otherwise
+    """
+    if not user.zodiac_sign:
+        print(f"⚠️ User {user.email} has no zodiac sign - skipping prediction")
+        return None
+    
+    period_key = user_period_key(user, prediction_type, target_date)
+    
+    if check_existing:
+        existing = _get_period_horoscope(db, user.id, prediction_type, period_key)
+        if existing:
+            print(f"⏭️ {user.email} already has a {prediction_type} prediction for {period_key}")
+            if release:
+                release_horoscope(db, existing)
+            return existing
     
     try:
+        # Stored natal chart (computed once per distinct birth data)
+        natal_chart = get_user_natal_chart(db, user)
+        
         content, raw_data = gemini_client.generate_horoscope(
             zodiac_sign=user.zodiac_sign,
             prediction_type=prediction_type,
-            user_profile=user_profile
+            user_profile=build_user_profile(user),
+            natal_chart=natal_chart,
+            target_date=target_date
         )
+        return _save_prediction(db, user, prediction_type, content, raw_data, release, period_key)
         
-        # Save to database
-        new_horoscope = Horoscope(
-            user_id=user.id,
-            zodiac_sign=user.zodiac_sign,
-            prediction_type=prediction_type,
-            content=content,
-            raw_data=json.dumps(raw_data),
-            prediction_date=datetime.utcnow()
-        )
+    except GeminiAPIError as e:
+        print(f"❌ Failed to generate {prediction_type} prediction for {user.email}: {e}")
+        return None
+    except Exception as e:
+        print(f"❌ Unexpected error generating prediction for {user.email}: {e}")
+        db.rollback()
+        return None
+
+
+class PredictionClasses:
+    """
+    Per-run sharing of predictions between users with identical input.
+    
+    Without a natal chart (no birth time) the prompt only depends on sign,
+    type, language, age bracket and date. Such users form one class: the
+    prediction is generated once, for an anonymous profile, and only the
+    name is filled in per user. Members arriving while the class is being
+    generated wait for that call (single-flight). A prediction without the
+    name placeholder is not shared: each member is generated separately.
+    """
+    
+    def __init__(self):
+        self._tasks = {}
+        self.generated = 0
+        self.shared = 0
+        self.fallbacks = 0
+    
+    async def generate(self, key: tuple, factory):
+        """
+        Get the class result, calling factory() only for the first member.
         
-        db.add(new_horoscope)
-        db.commit()
-        db.refresh(new_horoscope)
+        A failed generation is forgotten, so the next member retries it.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.create_task(factory())
+            self._tasks[key] = task
+            self.generated += 1
+        else:
+            self.shared += 1
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+            raise
+    
+    def get_stats(self) -> dict:
+        return {"class_generations": self.generated, "class_shared": self.shared, "class_fallbacks": self.fallbacks}
+
+
+def prediction_class_key(user_profile: dict, prediction_type: str, target_date: Optional[str]) -> tuple:
+    """Key of the equivalence class of a user without natal chart."""
+    profile = anonymous_profile(user_profile)
+    return (
+        profile["zodiac_sign"],
+        prediction_type,
+        profile["prediction_language"],
+        profile["age_bracket"],
+        target_date or datetime.now().strftime("%Y-%m-%d")
+    )
+
+
+async def generate_prediction_for_user_async(
+    user,
+    prediction_type: str,
+    target_date: Optional[str] = None,
+    release: bool = True,
+    classes: Optional[PredictionClasses] = None
+) -> Optional[Horoscope]:
+    """
+    Non-blocking variant of generate_prediction_for_user for the scheduler.
+    
+    The Gemini call is awaited on the event loop; database work runs in
+    threads with their own short-lived sessions. Expects users already
+    served for the period to be filtered out (the unique period key still
+    catches races).
+    
+    Args:
+        classes: Share predictions between users without natal chart
+                 (see PredictionClasses); None generates every user separately
+    
+    Returns:
+        Saved (detached) Horoscope if successful, None otherwise
+    """
+    if not user.zodiac_sign:
+        print(f"⚠️ User {user.email} has no zodiac sign - skipping prediction")
+        return None
+    
+    period_key = user_period_key(user, prediction_type, target_date)
+    
+    try:
+        # Stored natal chart (computed once per distinct birth data)
+        natal_chart = await get_user_natal_chart_async(user)
+        user_profile = build_user_profile(user)
+        content = None
+        
+        if classes is not None and not natal_chart and not (user.birth_date and user.birth_time):
+            key = prediction_class_key(user_profile, prediction_type, target_date)
+            template, class_data = await classes.generate(
+                key,
+                lambda: gemini_client.generate_horoscope_async(
+                    zodiac_sign=user.zodiac_sign,
+                    prediction_type=prediction_type,
+                    user_profile=anonymous_profile(user_profile),
+                    target_date=target_date
+                )
+            )
+            if NAME_PLACEHOLDER in template:
+                content = personalize_horoscope(template, user_profile)
+                raw_data = {**class_data, "user_profile": user_profile, "equivalence_class": "|".join(str(part) for part in key)}
+            else:
+                # The model did not keep the placeholder: the text cannot be personalized
+                classes.fallbacks += 1
+                print(f"⚠️ Shared {prediction_type} prediction has no {NAME_PLACEHOLDER} - generating {user.email} separately")
         
-        print(f"✅ Generated {prediction_type} prediction for {user.email}")
-        return new_horoscope
+        if content is None:
+            content, raw_data = await gemini_client.generate_horoscope_async(
+                zodiac_sign=user.zodiac_sign,
+                prediction_type=prediction_type,
+                user_profile=user_profile,
+                natal_chart=natal_chart,
+                target_date=target_date
+            )
+        return await asyncio.to_thread(
+            _with_session, _save_prediction, user, prediction_type, content, raw_data, release, period_key
+        )
         
     except GeminiAPIError as e:
         print(f"❌ Failed to generate {prediction_type} prediction for {user.email}: {e}")
         return None
     except Exception as e:
         print(f"❌ Unexpected error generating prediction for {user.email}: {e}")
-        db.rollback()
         return None
 
 
-def get_active_subscribers(db: Session) -> List[User]:
-    """Get all users with active subscriptions."""
-    return db.query(User).join(Subscription).filter(
-        User.is_subscriber == True,
-        Subscription.status == "active"
-    ).all()
+def _save_prediction(
+    db: Session,
+    user,
+    prediction_type: str,
+    content: str,
+    raw_data: dict,
+    release: bool,
+    period_key: str
+) -> Optional[Horoscope]:
+    new_horoscope = Horoscope(
+        user_id=user.id,
+        zodiac_sign=user.zodiac_sign,
+        prediction_type=prediction_type,
+        content=content,
+        raw_data=json.dumps(raw_data),
+        prediction_date=datetime.utcnow(),
+        released_at=datetime.utcnow() if release else None,
+        period_key=period_key
+    )
+    
+    db.add(new_horoscope)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another job generated this period's prediction concurrently
+        db.rollback()
+        print(f"⏭️ {user.email} already has a {prediction_type} prediction for {period_key}")
+        return _get_period_horoscope(db, user.id, prediction_type, period_key)
+    db.refresh(new_horoscope)
+    
+    print(f"✅ Generated {prediction_type} prediction for {user.email}")
+    return new_horoscope
+
+
+def _get_period_horoscope(db: Session, user_id: int, prediction_type: str, period_key: str) -> Optional[Horoscope]:
+    return db.query(Horoscope).filter(
+        Horoscope.user_id == user_id,
+        Horoscope.prediction_type == prediction_type,
+        Horoscope.period_key == period_key
+    ).first()
+
+
+def _with_session(func, *args):
+    """Call func(db, *args) with a short-lived session (for worker threads)."""
+    db = SessionLocal()
+    try:
+        return func(db, *args)
+    finally:
+        db.close()
+
+
+def release_horoscope(db: Session, horoscope: Horoscope):
+    """Make a pre-generated prediction visible to the user (at delivery time)."""
+    if horoscope.released_at is None:
+        now = datetime.utcnow()
+        horoscope.released_at = now
+        horoscope.prediction_date = now
+        db.commit()
 
 
 # =============================================================================
-# SCHEDULED JOB FUNCTIONS
+# CONCURRENT EXECUTION ENGINE
 # =============================================================================
 
-async def run_daily_predictions():
+# Number of users processed concurrently by the scheduled jobs.
+# Gemini calls are awaited on the event loop (no thread per call); database
+# and Resend work is blocking and runs on a small thread pool per run.
+PREDICTION_WORKERS = int(os.getenv("PREDICTION_WORKERS", "8"))
+
+# Number of users emailed in parallel by the delivery stage of pre-generated runs
+PREDICTION_DELIVERY_WORKERS = int(os.getenv("PREDICTION_DELIVERY_WORKERS", "16"))
+
+
+async def process_run_item(
+    row,
+    prediction_type: str,
+    executor: ThreadPoolExecutor,
+    target_date: Optional[str] = None,
+    deliver: bool = True,
+    classes: Optional[PredictionClasses] = None
+) -> bool:
     """
-    Generate daily predictions for all active subscribers.
-    Runs every day at 7:00 AM.
+    Bring one run item to completion: generate and save the prediction if it
+    is still pending, then release and email it. Each step is checkpointed on
+    the item, so a resumed run skips what was already done.
+    
+    Blocking steps run on the given thread pool with their own short-lived
+    database sessions (sessions are not thread-safe, so they are never
+    shared between workers).
+    
+    Args:
+        row: Lightweight run item row from iter_open_items (user columns + item state)
+        prediction_type: 'daily', 'weekly', or 'monthly'
+        executor: Thread pool for database and email work
+        target_date: Local date of the run's time zone bucket (None for today)
+        deliver: False to only pre-generate (stored unreleased, emailed later
+                 by the delivery stage)
+        classes: The run's PredictionClasses (shared predictions for users
+                 without natal chart)
+    
+    Returns:
+        True if the user has a generated prediction, False otherwise
     """
-    print(f"🌅 Starting daily prediction generation at {datetime.now()}")
+    loop = asyncio.get_running_loop()
+    horoscope_id = row.horoscope_id
+    
+    if row.item_status == ITEM_PENDING:
+        # Users already served for the period were skipped in bulk by iter_open_items
+        horoscope = await generate_prediction_for_user_async(
+            row, prediction_type, target_date, release=deliver, classes=classes
+        )
+        if not horoscope:
+            await loop.run_in_executor(
+                executor, _checkpoint_item, row.item_id, {"status": ITEM_FAILED, "error": "Prediction generation failed"}
+            )
+            return False
+        horoscope_id = horoscope.id
+        await loop.run_in_executor(
+            executor, _checkpoint_item, row.item_id, {"status": ITEM_GENERATED, "horoscope_id": horoscope_id}
+        )
     
+    if not deliver:
+        return True
+    
+    return await loop.run_in_executor(executor, _deliver_run_item, row, prediction_type, horoscope_id)
+
+
+def _checkpoint_item(item_id: int, values: dict):
     db = SessionLocal()
     try:
-        subscribers = get_active_subscribers(db)
-        print(f"📊 Found {len(subscribers)} active subscribers")
-        
-        success_count = 0
-        for user in subscribers:
-            horoscope = generate_prediction_for_user(db, user, "daily")
-            if horoscope:
-                # Send email with prediction
-                send_prediction_email(user, horoscope, "daily")
-                success_count += 1
+        update_item(db, item_id, **values)
+    finally:
+        db.close()
+
+
+def _deliver_run_item(row, prediction_type: str, horoscope_id: int) -> bool:
+    """Release a generated prediction and email it (blocking, runs in a worker thread)."""
+    db = SessionLocal()
+    try:
+        horoscope = db.query(Horoscope).filter(Horoscope.id == horoscope_id).first()
+        if not horoscope:
+            update_item(db, row.item_id, status=ITEM_FAILED, error="Generated horoscope not found")
+            return False
         
-        print(f"✅ Daily predictions completed: {success_count}/{len(subscribers)} successful")
+        release_horoscope(db, horoscope)
         
-    except Exception as e:
-        print(f"❌ Error in daily prediction job: {e}")
+        # Send email with prediction
+        if send_prediction_email(row, horoscope, prediction_type):
+            update_item(db, row.item_id, status=ITEM_EMAILED, error=None)
+        else:
+            update_item(db, row.item_id, error="Email not sent")
+        return True
     finally:
         db.close()
 
 
-async def run_weekly_predictions():
+async def _process_items(batches, handler, workers: int, thread_name_prefix: str) -> dict:
+    """
+    Run `await handler(row, executor)` for every row of a batch iterator,
+    with `workers` rows in flight at a time.
+    
+    Rows are streamed into a bounded queue, so memory stays flat regardless of
+    the number of items. The handlers share one thread pool of the same size
+    for their blocking work.
+    
+    Returns:
+        Dict with total and successful counts
+    """
+    queue = asyncio.Queue(maxsize=workers * 2)
+    counts = {"total": 0, "successful": 0}
+    
+    async def produce():
+        while True:
+            rows = await asyncio.to_thread(next, batches, None)
+            if rows is None:
+                break
+            for row in rows:
+                await queue.put(row)
+        for _ in range(workers):
+            await queue.put(None)
+    
+    async def consume(executor):
+        while True:
+            row = await queue.get()
+            if row is None:
+                return
+            counts["total"] += 1
+            try:
+                if await handler(row, executor):
+                    counts["successful"] += 1
+            except Exception as e:
+                print(f"❌ Worker error in {thread_name_prefix}: {e}")
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix) as executor:
+        await asyncio.gather(produce(), *(consume(executor) for _ in range(workers)))
+    
+    return counts
+
+
+# Runs currently being processed by this process
+_active_runs = set()
+
+
+async def execute_run(run_id: int, prediction_type: str, workers: Optional[int] = None) -> dict:
+    """
+    Process all open items of a run.
+    
+    Open items are streamed in keyset-paginated chunks into a bounded queue
+    and handled by a fixed pool of worker threads. Each user gets the same
+    generate -> save -> email sequence as a serial loop would, only several
+    users are in flight at the same time. Memory stays flat regardless of
+    the number of subscribers.
+    
+    Pre-generated runs (with a send time) stop after saving the unreleased
+    prediction; deliver_run() releases and emails them at the send time.
+    
+    Args:
+        run_id: ID of the PredictionRun
+        prediction_type: 'daily', 'weekly', or 'monthly'
+        workers: Number of concurrent workers (defaults to PREDICTION_WORKERS)
+    
+    Returns:
+        Dict with run statistics (total, successful, failed, duration, throughput)
+    """
+    workers = max(1, workers or PREDICTION_WORKERS)
+    
+    if run_id in _active_runs:
+        print(f"⚠️ Run #{run_id} is already being processed - skipping")
+        return {"run_id": run_id, "prediction_type": prediction_type, "total": 0, "successful": 0, "skipped": True}
+    
+    _active_runs.add(run_id)
+    try:
+        return await _execute_run(run_id, prediction_type, workers)
+    finally:
+        _active_runs.discard(run_id)
+
+
+async def _execute_run(run_id: int, prediction_type: str, workers: int) -> dict:
+    run_info = await asyncio.to_thread(mark_run_started, run_id)
+    target_date = run_info["period_date"]
+    # Runs with a send time only pre-generate; the delivery stage emails them
+    pregenerate = run_info["send_at"] is not None
+    await asyncio.to_thread(seed_run, run_id)
+    
+    # Compute the run's transits once up front - all workers share the snapshot
+    await asyncio.to_thread(
+        astrology_service.get_transit_snapshot, target_date or datetime.now().strftime("%Y-%m-%d")
+    )
+    
+    mode = "pre-generating" if pregenerate else "processing"
+    print(f"📊 {mode.capitalize()} {prediction_type} run #{run_id} ({workers} workers)")
+    
+    started = time.monotonic()
+    try:
+        classes = PredictionClasses()
+        with prompt_builder.track_run() as prompt_stats, llm_call_log.track_run(run_id):
+            counts = await _process_items(
+                iter_open_items(run_id, statuses=(ITEM_PENDING,) if pregenerate else (ITEM_PENDING, ITEM_GENERATED)),
+                lambda row, executor: process_run_item(
+                    row, prediction_type, executor, target_date=target_date, deliver=not pregenerate, classes=classes
+                ),
+                workers,
+                f"{prediction_type}-predictions"
+            )
+    except Exception:
+        await asyncio.to_thread(finish_run, run_id, RUN_FAILED)
+        raise
+    
+    await asyncio.to_thread(finish_run, run_id, RUN_GENERATED if pregenerate else RUN_COMPLETED)
+    
+    duration = time.monotonic() - started
+    stats = {
+        "run_id": run_id,
+        "prediction_type": prediction_type,
+        "total": counts["total"],
+        "successful": counts["successful"],
+        "failed": counts["total"] - counts["successful"],
+        "workers": workers,
+        "duration_seconds": round(duration, 2),
+        "users_per_minute": round(counts["total"] / duration * 60, 1) if duration > 0 else 0.0,
+        "prompts": prompt_stats.to_dict(),
+        **classes.get_stats(),
+        "llm_calls": await asyncio.to_thread(llm_call_log.get_run_summary, run_id)
+    }
+    
+    print(
+        f"⏱️ {prediction_type.capitalize()} run #{run_id}: {stats['total']} users in {stats['duration_seconds']}s "
+        f"({stats['users_per_minute']} users/min, {workers} workers)"
+    )
+    if classes.shared:
+        print(
+            f"👥 Run #{run_id}: {classes.shared} predictions shared from "
+            f"{classes.generated} generations for users without birth time"
+        )
+    if stats["prompts"]["prompts"]:
+        print(
+            f"📝 Run #{run_id} prompts: ~{stats['prompts']['est_prompt_tokens']} tokens "
+            f"(was ~{stats['prompts']['est_prompt_tokens_before']}, {stats['prompts']['saved_percent']}% saved)"
+        )
+    if stats["llm_calls"]["calls"]:
+        print(
+            f"💰 Run #{run_id} Gemini: {stats['llm_calls']['calls']} calls, "
+            f"{stats['llm_calls']['prompt_tokens']}+{stats['llm_calls']['output_tokens']} tokens, "
+            f"~${stats['llm_calls']['cost_usd']}, p95 {stats['llm_calls']['latency_ms']['p95']}ms"
+        )
+    return stats
+
+
+async def run_prediction_job(
+    prediction_type: str,
+    workers: Optional[int] = None,
+    trigger: str = "schedule"
+) -> dict:
+    """
+    Create a new run for all active subscribers and process it.
+    
+    Args:
+        prediction_type: 'daily', 'weekly', or 'monthly'
+        workers: Number of concurrent workers (defaults to PREDICTION_WORKERS)
+        trigger: 'schedule' or 'manual'
+    
+    Returns:
+        Dict with run statistics
+    """
+    run_id = await asyncio.to_thread(create_run, prediction_type, trigger)
+    return await execute_run(run_id, prediction_type, workers)
+
+
+# Background runs started from the admin API (kept referenced until done)
+_background_runs = set()
+
+
+def _track_background_run(task: asyncio.Task):
+    _background_runs.add(task)
+    task.add_done_callback(_background_runs.discard)
+
+
+async def start_prediction_run(prediction_type: str, trigger: str = "manual") -> int:
     """
-    Generate weekly predictions for all active subscribers.
-    Runs every Sunday at 7:00 AM.
+    Create a run and process it in the background.
+    
+    Only the process owning the scheduler lease processes runs. In any other
+    process the run is just created; the owner picks it up on its next
+    lease heartbeat.
+    
+    Returns:
+        ID of the new run (progress is available via get_run_progress)
+    """
+    run_id = await asyncio.to_thread(create_run, prediction_type, trigger)
+    if prediction_scheduler.is_leader:
+        _track_background_run(asyncio.create_task(execute_run(run_id, prediction_type)))
+    else:
+        print(f"📨 {prediction_type.capitalize()} run #{run_id} queued for the scheduler owner")
+    return run_id
+
+
+async def resume_prediction_run(run_id: int) -> bool:
     """
-    print(f"📅 Starting weekly prediction generation at {datetime.now()}")
+    Continue an existing run in the background from its last checkpoint.
+    
+    Outside the scheduler owner the run is only reopened; the owner
+    resumes it on its next lease heartbeat.
+    
+    Returns:
+        True if the run exists and was resumed, False otherwise
+    """
+    if not prediction_scheduler.is_leader:
+        return await asyncio.to_thread(reopen_run, run_id)
     
     db = SessionLocal()
     try:
-        subscribers = get_active_subscribers(db)
-        print(f"📊 Found {len(subscribers)} active subscribers")
+        run = db.query(PredictionRun).filter(PredictionRun.id == run_id).first()
+        prediction_type = run.prediction_type if run else None
+    finally:
+        db.close()
+    
+    if not prediction_type:
+        return False
+    
+    print(f"🔁 Resuming {prediction_type} run #{run_id}")
+    _track_background_run(asyncio.create_task(execute_run(run_id, prediction_type)))
+    return True
+
+
+async def resume_interrupted_runs():
+    """
+    Resume runs that are in progress but not processed by this process:
+    runs interrupted by a restart, left behind by a previous scheduler
+    owner, or created by other processes.
+    """
+    run_ids = await asyncio.to_thread(get_interrupted_runs)
+    for run_id in run_ids:
+        if run_id not in _active_runs:
+            await resume_prediction_run(run_id)
+
+
+# =============================================================================
+# SCHEDULED JOB FUNCTIONS
+# =============================================================================
+
+# Scheduled predictions are delivered at this local time in every subscriber's time zone
+PREDICTION_SEND_TIME = os.getenv("PREDICTION_SEND_TIME", "07:00")
+# Pre-generation of a time zone bucket starts this many minutes before its send time
+# (default 01:00 local, off-peak), the delivery stage emails it at the send time
+PREDICTION_LEAD_MINUTES = int(os.getenv("PREDICTION_LEAD_MINUTES", "360"))
+# Buckets missed entirely (e.g. downtime) are still generated and sent this many
+# hours after their send time, later ones are skipped until the next period
+PREDICTION_CATCHUP_HOURS = int(os.getenv("PREDICTION_CATCHUP_HOURS", "5"))
+# How often the scheduler checks for time zone buckets that are due
+PREDICTION_TICK_MINUTES = int(os.getenv("PREDICTION_TICK_MINUTES", "15"))
+# How often the delivery stage checks for pre-generated runs whose send time has passed
+PREDICTION_DELIVERY_TICK_SECONDS = int(os.getenv("PREDICTION_DELIVERY_TICK_SECONDS", "60"))
+
+
+def due_prediction_types(period_date: date) -> list:
+    """
+    Get the prediction types scheduled for a local date.
+    
+    - Daily: every day
+    - Weekly: every Sunday
+    - Monthly: every 28th of the month
+    """
+    types = ["daily"]
+    if period_date.weekday() == 6:
+        types.append("weekly")
+    if period_date.day == 28:
+        types.append("monthly")
+    return types
+
+
+def get_due_buckets(timezones: list, now_utc: Optional[datetime] = None) -> list:
+    """
+    Get the time zone buckets whose generation window is open.
+    
+    A bucket's window opens PREDICTION_LEAD_MINUTES before PREDICTION_SEND_TIME
+    local time and closes PREDICTION_CATCHUP_HOURS after it.
+    
+    Args:
+        timezones: IANA time zone names of active subscribers
+        now_utc: Current time (aware), defaults to now
+    
+    Returns:
+        List of (send_at_utc, prediction_type, timezone, period_date) tuples,
+        earliest send time first
+    """
+    now_utc = now_utc or datetime.now(ZoneInfo("UTC"))
+    send_hour, send_minute = (int(part) for part in PREDICTION_SEND_TIME.split(":"))
+    lead = timedelta(minutes=PREDICTION_LEAD_MINUTES)
+    window = timedelta(hours=PREDICTION_CATCHUP_HOURS)
+    
+    due = []
+    for tz_name in timezones:
+        try:
+            tz = ZoneInfo(tz_name)
+        except Exception:
+            print(f"⚠️ Unknown time zone '{tz_name}' - skipping bucket")
+            continue
         
-        success_count = 0
-        for user in subscribers:
-            horoscope = generate_prediction_for_user(db, user, "weekly")
-            if horoscope:
-                send_prediction_email(user, horoscope, "weekly")
-                success_count += 1
+        local_today = now_utc.astimezone(tz).date()
+        # Tomorrow's bucket can already be open when the lead time crosses midnight
+        for period_date in (local_today, local_today + timedelta(days=1)):
+            send_at = datetime(
+                period_date.year, period_date.month, period_date.day, send_hour, send_minute, tzinfo=tz
+            )
+            if send_at - lead <= now_utc < send_at + window:
+                for prediction_type in due_prediction_types(period_date):
+                    due.append((send_at, prediction_type, tz_name, period_date.isoformat()))
+    
+    return sorted(due, key=lambda bucket: bucket[0])
+
+
+async def run_due_timezone_buckets():
+    """
+    Pre-generate scheduled predictions for every time zone bucket that is due.
+    
+    Each bucket (prediction type, time zone, local date) gets exactly one
+    run. Buckets are processed one after another, so the Gemini load follows
+    the subscribers' nights around the globe instead of peaking once a day.
+    Predictions are stored unreleased and emailed by deliver_due_runs() at the
+    bucket's send time. A bucket that is only picked up after its send time
+    (downtime) is generated and emailed right away instead.
+    """
+    timezones = await asyncio.to_thread(get_subscriber_timezones)
+    
+    for send_at, prediction_type, tz_name, period_date in get_due_buckets(timezones):
+        send_at_utc = send_at.astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
+        if send_at_utc <= datetime.utcnow():
+            send_at_utc = None
         
-        print(f"✅ Weekly predictions completed: {success_count}/{len(subscribers)} successful")
+        run_id = await asyncio.to_thread(create_bucket_run, prediction_type, tz_name, period_date, send_at_utc)
+        if not run_id:
+            continue
         
-    except Exception as e:
-        print(f"❌ Error in weekly prediction job: {e}")
-    finally:
-        db.close()
+        print(f"🌍 Starting {prediction_type} predictions for {tz_name} ({period_date}) at {datetime.now()}")
+        try:
+            stats = await execute_run(run_id, prediction_type)
+            print(
+                f"✅ {prediction_type.capitalize()} predictions for {tz_name} generated: "
+                f"{stats['successful']}/{stats['total']} successful"
+            )
+        except Exception as e:
+            print(f"❌ Error in {prediction_type} prediction run for {tz_name}: {e}")
 
 
-async def run_monthly_predictions():
+async def deliver_run(run_id: int, prediction_type: str, period_date: Optional[str] = None) -> dict:
     """
-    Generate monthly predictions for all active subscribers.
-    Runs every 30th of the month at 7:00 AM.
+    Release and email the predictions of a pre-generated run.
+    
+    Uses its own worker pool (PREDICTION_DELIVERY_WORKERS), so email sending
+    never waits for Gemini and vice versa. While the run is still being
+    generated in this process, only the predictions generated so far are
+    sent (the next pass picks up the rest). Otherwise the run is completed:
+    items that were never generated are generated inline as a fallback.
+    
+    Returns:
+        Dict with total and successful counts
     """
-    print(f"📆 Starting monthly prediction generation at {datetime.now()}")
+    generating = run_id in _active_runs
+    if not generating:
+        # Claim the run, so it is not resumed as a generation run meanwhile
+        _active_runs.add(run_id)
     
-    db = SessionLocal()
     try:
-        subscribers = get_active_subscribers(db)
-        print(f"📊 Found {len(subscribers)} active subscribers")
+        if generating:
+            batches = iter_open_items(run_id, statuses=(ITEM_GENERATED,))
+        else:
+            await asyncio.to_thread(mark_run_started, run_id)
+            await asyncio.to_thread(seed_run, run_id)
+            batches = iter_open_items(run_id)
         
-        success_count = 0
-        for user in subscribers:
-            horoscope = generate_prediction_for_user(db, user, "monthly")
-            if horoscope:
-                send_prediction_email(user, horoscope, "monthly")
-                success_count += 1
+        classes = PredictionClasses()
+        # Fallback generations count towards the run
+        with llm_call_log.track_run(run_id):
+            counts = await _process_items(
+                batches,
+                lambda row, executor: process_run_item(
+                    row, prediction_type, executor, target_date=period_date, classes=classes
+                ),
+                PREDICTION_DELIVERY_WORKERS,
+                f"{prediction_type}-delivery"
+            )
         
-        print(f"✅ Monthly predictions completed: {success_count}/{len(subscribers)} successful")
+        if not generating:
+            await asyncio.to_thread(finish_run, run_id, RUN_COMPLETED)
         
-    except Exception as e:
-        print(f"❌ Error in monthly prediction job: {e}")
+        if counts["total"]:
+            print(f"📬 Delivered {counts['successful']}/{counts['total']} {prediction_type} predictions of run #{run_id}")
+        return counts
     finally:
-        db.close()
+        if not generating:
+            _active_runs.discard(run_id)
+
+
+async def deliver_due_runs():
+    """Deliver every pre-generated run whose send time has passed."""
+    runs = await asyncio.to_thread(get_due_delivery_runs)
+    for run in runs:
+        try:
+            await deliver_run(run.id, run.prediction_type, run.period_date)
+        except Exception as e:
+            print(f"❌ Error delivering {run.prediction_type} run #{run.id}: {e}")
+
+
+async def pregenerate_previews():
+    """Generate today's front page previews for all signs (no-op once they exist)."""
+    ready = await preview_store.pregenerate()
+    if ready < len(PREVIEW_SIGNS):
+        print(f"⚠️ Previews ready for {ready}/{len(PREVIEW_SIGNS)} signs")
 
 
 # =============================================================================
@@ -847,15 +1488,27 @@ class PredictionScheduler:
     """
     Manages scheduled prediction generation jobs.
     
-    Schedule:
-    - Daily: Every day at 7:02 AM local time
-    - Weekly: Every Sunday at 7:02 AM
-    - Monthly: Every 28th of the month at 7:02 AM
+    Schedule (in each subscriber's own time zone, see user_timezones.py):
+    - Daily: Every day at 7:00 AM
+    - Weekly: Every Sunday at 7:00 AM
+    - Monthly: Every 28th of the month at 7:00 AM
+    
+    Two stages:
+    - Generation: a tick job checks every PREDICTION_TICK_MINUTES which time
+      zone buckets are due and pre-generates them during the night
+    - Delivery: every PREDICTION_DELIVERY_TICK_SECONDS, pre-generated runs
+      whose send time has passed are released and emailed
+    
+    Every process starts the scheduler, but the prediction jobs only run in
+    the process holding the scheduler lease (see scheduler_lease.py). The
+    others keep heartbeating and take over if the owner dies.
     """
     
     def __init__(self):
         self.scheduler = AsyncIOScheduler()
+        self.lease = LeaderLease("prediction_scheduler")
         self._started = False
+        self._was_leader = False
     
     def start(self):
         """Start the prediction scheduler."""
@@ -863,49 +1516,97 @@ class PredictionScheduler:
             print("⚠️ Scheduler already running")
             return
         
-        # Get timezone from environment or default to Europe/Helsinki (Finland)
-        timezone = os.getenv("PREDICTION_TIMEZONE", "Europe/Helsinki")
+        # Time zone buckets - a slow tick makes the next ones skip instead of piling up
+        self.scheduler.add_job(
+            self._leader_only(run_due_timezone_buckets),
+            IntervalTrigger(minutes=PREDICTION_TICK_MINUTES),
+            id="timezone_predictions",
+            name="Generate predictions for due time zones",
+            next_run_time=datetime.now() + timedelta(seconds=SCHEDULER_HEARTBEAT_SECONDS),
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
         
-        # Daily predictions - every day at 7:02 AM
+        # Delivery stage - emails pre-generated predictions at their send time
         self.scheduler.add_job(
-            run_daily_predictions,
-            CronTrigger(hour=7, minute=2, timezone=timezone),
-            id="daily_predictions",
-            name="Generate daily predictions",
+            self._leader_only(deliver_due_runs),
+            IntervalTrigger(seconds=PREDICTION_DELIVERY_TICK_SECONDS),
+            id="prediction_delivery",
+            name="Deliver pre-generated predictions",
+            max_instances=1,
+            coalesce=True,
             replace_existing=True
         )
         
-        # Weekly predictions - every Sunday at 7:02 AM
+        # Front page previews - 12 per day, shared with other processes via llm_cache
         self.scheduler.add_job(
-            run_weekly_predictions,
-            CronTrigger(day_of_week="sun", hour=7, minute=2, timezone=timezone),
-            id="weekly_predictions",
-            name="Generate weekly predictions",
+            self._leader_only(pregenerate_previews),
+            IntervalTrigger(minutes=PREVIEW_REFRESH_MINUTES),
+            id="preview_horoscopes",
+            name="Pre-generate daily preview horoscopes",
+            next_run_time=datetime.now() + timedelta(seconds=SCHEDULER_HEARTBEAT_SECONDS),
+            max_instances=1,
+            coalesce=True,
             replace_existing=True
         )
         
-        # Monthly predictions - every 28th at 7:02 AM
+        # Lease heartbeat - first one immediately, so leadership is settled at startup
         self.scheduler.add_job(
-            run_monthly_predictions,
-            CronTrigger(day=28, hour=7, minute=2, timezone=timezone),
-            id="monthly_predictions",
-            name="Generate monthly predictions",
+            self._heartbeat,
+            IntervalTrigger(seconds=SCHEDULER_HEARTBEAT_SECONDS),
+            id="scheduler_lease_heartbeat",
+            name="Scheduler lease heartbeat",
+            next_run_time=datetime.now(),
             replace_existing=True
         )
         
         self.scheduler.start()
         self._started = True
         
-        print(f"🚀 Prediction scheduler started (timezone: {timezone})")
-        print("   📅 Daily predictions: Every day at 7:02 AM")
-        print("   📅 Weekly predictions: Every Sunday at 7:02 AM")
-        print("   📅 Monthly predictions: Every 28th at 7:02 AM")
+        print(f"🚀 Prediction scheduler started (process: {self.lease.owner_id})")
+        print(f"   📅 Daily predictions: Every day at {PREDICTION_SEND_TIME} local time")
+        print(f"   📅 Weekly predictions: Every Sunday at {PREDICTION_SEND_TIME} local time")
+        print(f"   📅 Monthly predictions: Every 28th at {PREDICTION_SEND_TIME} local time")
+        print(f"   🔮 Preview horoscopes refreshed every {PREVIEW_REFRESH_MINUTES} min")
+        print(f"   🌍 Time zones checked every {PREDICTION_TICK_MINUTES} min, pre-generation starts {PREDICTION_LEAD_MINUTES} min ahead")
+    
+    def _leader_only(self, job):
+        """Wrap a job so it only runs in the process holding the scheduler lease."""
+        async def run_if_leader():
+            if not self.lease.is_leader:
+                print(f"⏭️ Skipping {job.__name__} - another process owns the scheduler")
+                return
+            await job()
+        run_if_leader.__name__ = job.__name__
+        return run_if_leader
+    
+    async def _heartbeat(self):
+        """Renew or acquire the scheduler lease and pick up runs waiting for the owner."""
+        is_leader = await asyncio.to_thread(self.lease.heartbeat)
+        
+        if is_leader and not self._was_leader:
+            print(f"👑 This process now owns the prediction scheduler ({self.lease.owner_id})")
+        elif self._was_leader and not is_leader:
+            print(f"⚠️ Lost the prediction scheduler lease ({self.lease.owner_id})")
+        self._was_leader = is_leader
+        
+        if is_leader:
+            # Runs interrupted by a restart or a dead owner, or queued by other processes
+            await resume_interrupted_runs()
+    
+    @property
+    def is_leader(self) -> bool:
+        """True if this process currently runs the prediction jobs."""
+        return self.lease.is_leader
     
     def stop(self):
         """Stop the scheduler."""
         if self._started:
             self.scheduler.shutdown()
+            self.lease.release()
             self._started = False
+            self._was_leader = False
             print("🛑 Prediction scheduler stopped")
     
     def get_jobs(self) -> list:
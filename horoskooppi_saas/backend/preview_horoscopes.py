@@ -0,0 +1,129 @@
+"""
+Daily Preview Horoscopes
+
+The front page preview only depends on the zodiac sign and today's
+transits (the lucky number is seeded per sign and date as well), so there
+are at most 12 distinct previews per day. They are generated once per day
+and served from memory:
+
+- The scheduler pre-generates all 12 (leader process, every
+  PREVIEW_REFRESH_MINUTES - a no-op once today's previews exist)
+- Otherwise the first request for a sign generates it; concurrent requests
+  for the same sign wait for that one call (single-flight)
+- Other processes pick up the leader's previews from the shared Gemini
+  response cache (llm_cache) instead of calling Gemini again
+"""
+import os
+import asyncio
+from datetime import datetime
+from typing import Dict, Tuple
+
+from gemini_client import gemini_client
+
+
+PREVIEW_REFRESH_MINUTES = int(os.getenv("PREVIEW_REFRESH_MINUTES", "30"))
+
+PREVIEW_SIGNS = [
+    "Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
+    "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"
+]
+
+
+def normalize_preview_sign(sign: str) -> str:
+    """
+    Normalize a sign name from a request ("leo", " LEO " -> "Leo").
+
+    Returns:
+        Sign as in PREVIEW_SIGNS, or an empty string if it is not a zodiac sign
+    """
+    sign = (sign or "").strip().capitalize()
+    return sign if sign in PREVIEW_SIGNS else ""
+
+
+class PreviewStore:
+    """Today's preview per sign, generated at most once per process."""
+
+    def __init__(self):
+        self._previews: Dict[Tuple[str, str], dict] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._hits = 0
+        self._generated = 0
+
+    async def get_preview(self, zodiac_sign: str) -> dict:
+        """
+        Get today's preview for a sign, generating it on first use.
+
+        Args:
+            zodiac_sign: Sign as in PREVIEW_SIGNS
+
+        Returns:
+            Dict with horoscope, lucky_number, zodiac_sign and generated_at
+
+        Raises:
+            GeminiAPIError: If generation fails (the next request retries)
+        """
+        key = (zodiac_sign, datetime.now().strftime("%Y-%m-%d"))
+
+        preview = self._previews.get(key)
+        if preview:
+            self._hits += 1
+            return preview
+
+        # Single-flight: all requests for the sign wait for one generation.
+        # It runs as its own task, so a disconnecting client does not cancel
+        # it for the others.
+        task = self._inflight.get(key)
+        if task:
+            self._hits += 1
+        else:
+            task = asyncio.create_task(self._generate(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _generate(self, key: Tuple[str, str]) -> dict:
+        zodiac_sign, day = key
+        horoscope_text, lucky_number = await gemini_client.generate_preview_horoscope_async(zodiac_sign)
+        preview = {
+            "horoscope": horoscope_text,
+            "lucky_number": lucky_number,
+            "zodiac_sign": zodiac_sign,
+            "generated_at": datetime.utcnow().isoformat()
+        }
+        self._drop_old_days(day)
+        self._previews[key] = preview
+        self._generated += 1
+        return preview
+
+    async def pregenerate(self) -> int:
+        """
+        Make sure today's previews exist for all 12 signs.
+
+        Returns:
+            Number of signs that have a preview for today
+        """
+        results = await asyncio.gather(
+            *(self.get_preview(sign) for sign in PREVIEW_SIGNS),
+            return_exceptions=True
+        )
+        failed = [sign for sign, result in zip(PREVIEW_SIGNS, results) if isinstance(result, Exception)]
+        if failed:
+            print(f"⚠️ Preview generation failed for: {', '.join(failed)}")
+        return len(PREVIEW_SIGNS) - len(failed)
+
+    def _drop_old_days(self, today: str):
+        for key in [key for key in self._previews if key[1] != today]:
+            del self._previews[key]
+
+    def get_stats(self) -> dict:
+        today = datetime.now().strftime("%Y-%m-%d")
+        return {
+            "date": today,
+            "signs_ready": sorted(sign for sign, day in self._previews if day == today),
+            "hits": self._hits,
+            "generated": self._generated
+        }
+
+
+# Singleton instance
+preview_store = PreviewStore()
@@ -0,0 +1,277 @@
+"""
+Gemini Prompt Builder
+
+Every horoscope prompt consists of a large invariant part (GENERAL_RULES,
+the type-specific rules, VOCABULARY_BANK, output format) and a small
+per-user part (chart data and aspects).
+
+The builder:
+- Compiles the invariant prefix once per (prediction type, language, age
+  bracket) and reuses it for every following prompt
+- Puts that prefix first, so prompts of one bucket share a byte-identical
+  beginning (provider-side context caching can hit it)
+- Serialises the chart data as compact JSON instead of indented JSON
+- Counts prompt sizes before (indented JSON) and after, globally and per
+  scheduled run, to show the token savings
+"""
+import json
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, Tuple
+
+from gemini_rules import GENERAL_RULES, VOCABULARY_BANK, load_prediction_rules
+
+
+# Language instructions
+LANGUAGE_INSTRUCTIONS = {
+    "fi": "IMPORTANT: Write ALL predictions in Finnish (Suomi). Use natural Finnish language.",
+    "sv": "IMPORTANT: Write ALL predictions in Swedish (Svenska). Use natural Swedish language.",
+    "no": "IMPORTANT: Write ALL predictions in Norwegian (Norsk). Use natural Norwegian language.",
+    "da": "IMPORTANT: Write ALL predictions in Danish (Dansk). Use natural Danish language.",
+    "de": "IMPORTANT: Write ALL predictions in German (Deutsch). Use natural German language.",
+    "fr": "IMPORTANT: Write ALL predictions in French (Français). Use natural French language.",
+    "es": "IMPORTANT: Write ALL predictions in Spanish (Español). Use natural Spanish language.",
+    "it": "IMPORTANT: Write ALL predictions in Italian (Italiano). Use natural Italian language.",
+    "en": "Write predictions in English."
+}
+
+# Age groups of the age-specific voice rules (GENERAL_RULES section 5).
+# 25-34 is split at 30 because of the general formality rule.
+AGE_BRACKETS = [
+    (13, 17),
+    (18, 24),
+    (25, 29),
+    (30, 34),
+    (35, 49),
+    (50, 64),
+    (65, None)
+]
+
+
+def get_age_bracket(age: Optional[int]) -> Optional[str]:
+    """
+    Get the age group label used in the prompt prefix.
+
+    Returns:
+        Label like "25-29" or "65+", None if the age is unknown
+    """
+    if age is None:
+        return None
+    for low, high in AGE_BRACKETS:
+        if high is None or age <= high:
+            return f"{low}+" if high is None else f"{low}-{high}"
+    return None
+
+
+def compact_json(data: Any) -> str:
+    """Serialise prompt data without whitespace."""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+class PromptStats:
+    """Prompt size counters (thread-safe, shared by concurrent workers)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.chars = 0
+        self.chars_before = 0
+        self.prefix_chars = 0
+
+    def record(self, chars: int, chars_before: int, prefix_chars: int):
+        with self._lock:
+            self.prompts += 1
+            self.chars += chars
+            self.chars_before += chars_before
+            self.prefix_chars += prefix_chars
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            # Same estimate as the rate limiter (about 4 characters per token)
+            tokens = self.chars // 4
+            tokens_before = self.chars_before // 4
+            return {
+                "prompts": self.prompts,
+                "avg_prompt_chars": round(self.chars / self.prompts) if self.prompts else 0,
+                "avg_prompt_chars_before": round(self.chars_before / self.prompts) if self.prompts else 0,
+                "est_prompt_tokens": tokens,
+                "est_prompt_tokens_before": tokens_before,
+                "est_tokens_saved": tokens_before - tokens,
+                "saved_percent": round((1 - self.chars / self.chars_before) * 100, 1) if self.chars_before else 0.0,
+                "cacheable_prefix_percent": round(self.prefix_chars / self.chars * 100, 1) if self.chars else 0.0
+            }
+
+
+# Stats of the scheduled run the current task belongs to (see track_run)
+_run_stats: ContextVar[Optional[PromptStats]] = ContextVar("prompt_run_stats", default=None)
+
+
+class PromptBuilder:
+    """Builds horoscope prompts from a cached invariant prefix and compact chart data."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._prefixes: Dict[Tuple[str, str, Optional[str]], str] = {}
+        self._prefix_hits = 0
+        self._prefix_misses = 0
+        self.stats = PromptStats()
+
+    def get_prefix(self, prediction_type: str, language: str, age_bracket: Optional[str]) -> str:
+        """
+        Get the invariant part of the prompt (system prompt + output format).
+
+        Built on first use and cached for the lifetime of the process.
+        """
+        key = (prediction_type, language, age_bracket)
+        prefix = self._prefixes.get(key)
+        if prefix is not None:
+            with self._lock:
+                self._prefix_hits += 1
+            return prefix
+
+        prefix = self._compile_prefix(prediction_type, language, age_bracket)
+        with self._lock:
+            self._prefix_misses += 1
+            self._prefixes[key] = prefix
+        return prefix
+
+    def _compile_prefix(self, prediction_type: str, language: str, age_bracket: Optional[str]) -> str:
+        lang_instruction = LANGUAGE_INSTRUCTIONS.get(language, LANGUAGE_INSTRUCTIONS["en"])
+
+        # Load type-specific rules from separate file
+        specific_rules, get_output_format = load_prediction_rules(prediction_type)
+
+        age_instruction = ""
+        if age_bracket:
+            age_instruction = f"\nIMPORTANT: The user is in the {age_bracket} age group (use the exact age too if the input data gives one; shared predictions only know the age group). You MUST use the age-specific voice guidelines from GENERAL_RULES section 5 to match the appropriate tone, focus, and language style for this age group."
+
+        period_sources = ""
+        if prediction_type in ("weekly", "monthly"):
+            period_instruction = (
+                "\n\nThe input's \"period\" lists the astrological events of the whole "
+                f"{'week' if prediction_type == 'weekly' else 'month'} with their dates: sign ingresses, "
+                "retrograde/direct stations and moon phases, plus the planets retrograde during it. "
+                "Describe how the period develops over time around these dates."
+            )
+            period_sources = "\n- events of the prediction period (ingresses, stations, moon phases)"
+        else:
+            period_instruction = ""
+
+        # SYSTEM PROMPT - Strict technical rules with gemini_rules
+        system_prompt = f"""You are an astrology prediction engine.
+
+{lang_instruction}{age_instruction}
+
+{GENERAL_RULES}
+
+{specific_rules}
+
+{VOCABULARY_BANK}
+
+You generate predictions strictly and only from the technical chart data provided to you.
+
+Never invent planets, aspects, angles or meanings not included in the input.
+
+Follow these rules:
+1. Use only the data given in the input JSON.
+2. Interpret planetary positions, houses, and aspects using classical astrological rules.
+3. Stronger aspects (orb under 1 degree) must be highlighted clearly.
+4. Tie each interpretation to the correct life area based on the house system.
+5. If no relevant aspect exists for a topic, say nothing about that topic.
+6. Produce a prediction that feels personal but is fully traceable back to the data.
+7. Do not mention that you are an AI.
+8. Never change the user's zodiac sign.
+
+All predictions must be derived from:
+- natal positions
+- current transits
+- aspects between current and natal planets
+- house meanings
+- planetary nature{period_sources}{period_instruction}
+
+IMMUTABLE DATA RULES:
+- The user's zodiac_sign is calculated from birth_date and CANNOT be changed
+- All birth data (birth_date, birth_time, birth_city) are permanent
+- Predictions must use stored profile data, not user-edited values"""
+
+        # Get output format from the type-specific rules file
+        output_format = get_output_format(language)
+
+        return f"""{system_prompt}
+
+{output_format}
+
+"""
+
+    def build(
+        self,
+        prediction_type: str,
+        zodiac_sign: str,
+        input_data: Dict[str, Any],
+        language: str = "fi",
+        age: Optional[int] = None,
+        age_bracket: Optional[str] = None
+    ) -> str:
+        """
+        Assemble the full prompt: cached prefix first, then the per-user data.
+
+        Args:
+            prediction_type: 'daily', 'weekly', or 'monthly'
+            zodiac_sign: User's zodiac sign
+            input_data: Chart data (user, current_transits, aspects, and period for weekly/monthly)
+            language: Prediction language code
+            age: User's age (selects the age bracket of the prefix)
+            age_bracket: Age bracket to use when the exact age is not given
+
+        Returns:
+            Prompt text
+        """
+        prefix = self.get_prefix(prediction_type, language, get_age_bracket(age) or age_bracket)
+
+        suffix_start = "=== INPUT DATA (JSON) ===\n"
+        suffix_end = f"""
+=== END INPUT DATA ===
+
+Generate the {prediction_type} prediction for {zodiac_sign.capitalize()} now.
+Use ONLY the data provided above. Do not invent aspects or positions not in the input."""
+
+        prompt = f"{prefix}{suffix_start}{compact_json(input_data)}{suffix_end}"
+
+        # Size of the same prompt with indented JSON, for the savings stats
+        chars_before = len(prefix) + len(suffix_start) + len(json.dumps(input_data, indent=2)) + len(suffix_end)
+        self.stats.record(len(prompt), chars_before, len(prefix))
+        run_stats = _run_stats.get()
+        if run_stats is not None:
+            run_stats.record(len(prompt), chars_before, len(prefix))
+
+        return prompt
+
+    @contextmanager
+    def track_run(self):
+        """
+        Collect the prompt stats of one scheduled run.
+
+        Prompts built by tasks and threads started inside the block (they
+        inherit the context) are counted into the yielded PromptStats.
+        """
+        stats = PromptStats()
+        token = _run_stats.set(stats)
+        try:
+            yield stats
+        finally:
+            _run_stats.reset(token)
+
+    def get_stats(self) -> dict:
+        """Get prefix cache and prompt size stats for the admin API."""
+        with self._lock:
+            cache = {
+                "cached_prefixes": len(self._prefixes),
+                "prefix_hits": self._prefix_hits,
+                "prefix_misses": self._prefix_misses
+            }
+        return {**cache, **self.stats.to_dict()}
+
+
+# Singleton instance
+prompt_builder = PromptBuilder()
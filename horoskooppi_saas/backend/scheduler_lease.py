@@ -0,0 +1,139 @@
+"""
+Scheduler Leader Election
+
+Every uvicorn worker (and every instance) runs the FastAPI startup event and
+therefore starts the prediction scheduler. Only one of them may actually fire
+the cron jobs, otherwise each subscriber gets one Gemini call and one email
+per process.
+
+Ownership is a lease row in the existing database:
+- The owner renews the lease by heartbeat (SCHEDULER_HEARTBEAT_SECONDS)
+- The lease expires after SCHEDULER_LEASE_TTL seconds without a heartbeat
+- Any other process takes it over on its next heartbeat after expiry
+
+All state changes are single conditional UPDATE statements, so two processes
+can never both believe they acquired the lease.
+"""
+import os
+import uuid
+import socket
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from models import SchedulerLease
+
+
+SCHEDULER_LEASE_TTL = int(os.getenv("SCHEDULER_LEASE_TTL", "60"))
+SCHEDULER_HEARTBEAT_SECONDS = int(os.getenv("SCHEDULER_HEARTBEAT_SECONDS", "20"))
+
+
+class LeaderLease:
+    """A named lease held by at most one process at a time."""
+
+    def __init__(self, name: str, ttl_seconds: int = SCHEDULER_LEASE_TTL):
+        self.name = name
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._expires_at: Optional[datetime] = None
+
+    @property
+    def is_leader(self) -> bool:
+        """True while this process holds an unexpired lease (as of its last heartbeat)."""
+        return self._expires_at is not None and datetime.utcnow() < self._expires_at
+
+    def heartbeat(self) -> bool:
+        """
+        Renew the lease if we hold it, or take it over if it is free or expired.
+
+        Returns:
+            True if this process holds the lease after the call
+        """
+        now = datetime.utcnow()
+        expires_at = now + self.ttl
+
+        db = SessionLocal()
+        try:
+            # 1. Renew our own lease
+            renewed = db.query(SchedulerLease).filter(
+                SchedulerLease.name == self.name,
+                SchedulerLease.owner_id == self.owner_id
+            ).update({
+                SchedulerLease.heartbeat_at: now,
+                SchedulerLease.expires_at: expires_at
+            }, synchronize_session=False)
+
+            # 2. Take over an expired lease
+            if not renewed:
+                renewed = db.query(SchedulerLease).filter(
+                    SchedulerLease.name == self.name,
+                    SchedulerLease.expires_at < now
+                ).update({
+                    SchedulerLease.owner_id: self.owner_id,
+                    SchedulerLease.acquired_at: now,
+                    SchedulerLease.heartbeat_at: now,
+                    SchedulerLease.expires_at: expires_at
+                }, synchronize_session=False)
+            db.commit()
+
+            # 3. First process ever: create the lease
+            if not renewed and not db.query(SchedulerLease.name).filter(SchedulerLease.name == self.name).first():
+                try:
+                    db.add(SchedulerLease(
+                        name=self.name,
+                        owner_id=self.owner_id,
+                        acquired_at=now,
+                        heartbeat_at=now,
+                        expires_at=expires_at
+                    ))
+                    db.commit()
+                    renewed = 1
+                except IntegrityError:
+                    # Another process created it first
+                    db.rollback()
+
+            self._expires_at = expires_at if renewed else None
+            return bool(renewed)
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ Scheduler lease heartbeat failed: {e}")
+            # Keep running on the current lease until it would expire anyway
+            return self.is_leader
+        finally:
+            db.close()
+
+    def release(self):
+        """Give up the lease (on shutdown) so another process can take over immediately."""
+        if self._expires_at is None:
+            return
+
+        db = SessionLocal()
+        try:
+            db.query(SchedulerLease).filter(
+                SchedulerLease.name == self.name,
+                SchedulerLease.owner_id == self.owner_id
+            ).update({SchedulerLease.expires_at: datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ Failed to release scheduler lease: {e}")
+        finally:
+            db.close()
+            self._expires_at = None
+
+    def get_status(self) -> dict:
+        """Get lease status for the admin API."""
+        db = SessionLocal()
+        try:
+            lease = db.query(SchedulerLease).filter(SchedulerLease.name == self.name).first()
+            return {
+                "name": self.name,
+                "this_process": self.owner_id,
+                "is_leader": self.is_leader,
+                "owner": lease.owner_id if lease else None,
+                "heartbeat_at": lease.heartbeat_at.isoformat() if lease and lease.heartbeat_at else None,
+                "expires_at": lease.expires_at.isoformat() if lease else None
+            }
+        finally:
+            db.close()
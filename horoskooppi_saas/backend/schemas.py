@@ -52,6 +52,8 @@ class UserProfileUpdate(BaseModel):
     birth_time: Optional[str] = None
     # Prediction language - determines language for all horoscopes
     prediction_language: Optional[str] = None  # 'fi', 'en', 'sv', etc.
+    # Delivery time zone for scheduled predictions (IANA name, e.g. 'Europe/Helsinki')
+    timezone: Optional[str] = None
 
 class UserResponse(UserBase):
     id: int
@@ -64,6 +66,7 @@ class UserResponse(UserBase):
     birth_city: Optional[str] = None
     zodiac_sign: Optional[str] = None  # Auto-calculated, never editable
     prediction_language: Optional[str] = None  # Language for predictions ('fi', 'en', 'sv', etc.)
+    timezone: Optional[str] = None  # Delivery time zone for scheduled predictions
     is_active: bool
     is_subscriber: bool
     created_at: datetime
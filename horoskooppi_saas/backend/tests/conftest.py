@@ -0,0 +1,30 @@
+"""
+Test setup: run against a throwaway SQLite database and import the backend
+modules the way the app does (from the backend directory).
+
+Run from the backend directory with:
+    python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR = tempfile.mkdtemp(prefix="horoskooppi-tests-")
+
+# Must be set before database.py is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ["GAZETTEER_PATH"] = os.path.join(TEST_DIR, "gazetteer.bin")
+
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Create the tables once per test session."""
+    import database
+    database.init_db()
+    return database
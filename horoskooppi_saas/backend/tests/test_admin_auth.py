@@ -0,0 +1,49 @@
+"""
+Every /api/admin endpoint requires admin credentials (auth.require_admin).
+"""
+import pytest
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+from auth import require_admin
+from main import app
+
+
+def admin_routes():
+    return [route for route in app.routes if isinstance(route, APIRoute) and route.path.startswith("/api/admin")]
+
+
+@pytest.fixture
+def client(database, monkeypatch):
+    monkeypatch.setenv("ADMIN_DOWNLOAD_USER", "admin")
+    monkeypatch.setenv("ADMIN_DOWNLOAD_PASS", "secret")
+    # Not used as a context manager: the startup hooks would start the scheduler
+    return TestClient(app)
+
+
+def test_every_admin_route_requires_admin():
+    routes = admin_routes()
+    assert routes
+    unprotected = [
+        f"{sorted(route.methods)} {route.path}"
+        for route in routes
+        if require_admin not in [dependency.call for dependency in route.dependant.dependencies]
+    ]
+    assert unprotected == []
+
+
+@pytest.mark.parametrize("method, path", [
+    ("GET", "/api/admin/gemini/calls"),
+    ("GET", "/api/admin/gemini/breaker"),
+    ("GET", "/api/admin/scheduler/status"),
+    ("POST", "/api/admin/scheduler/trigger/daily"),
+    ("GET", "/api/admin/scheduler/runs"),
+])
+def test_anonymous_admin_request_is_rejected(client, method, path):
+    assert client.request(method, path).status_code == 401
+    assert client.request(method, path, auth=("admin", "wrong")).status_code == 401
+
+
+def test_admin_credentials_are_accepted(client):
+    response = client.get("/api/admin/scheduler/runs", auth=("admin", "secret"))
+    assert response.status_code == 200
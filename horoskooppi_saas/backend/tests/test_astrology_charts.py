@@ -0,0 +1,60 @@
+"""
+Charts come from flatlib, not the mock fallback (astrology_service).
+
+Reference positions checked against published ephemerides.
+"""
+import pytest
+
+from astrology_service import astrology_service, flatlib_date, CHART_OBJECTS
+
+pytestmark = pytest.mark.skipif(not astrology_service.enabled, reason="flatlib not installed")
+
+OUTER_PLANETS = ["Uranus", "Neptune", "Pluto"]
+
+
+@pytest.fixture(scope="module")
+def natal_chart():
+    # Helsinki, 1 May 1990 12:00 local time (UTC+3)
+    return astrology_service.calculate_natal_chart("1990-05-01", "12:00", 60.1699, 24.9384, tz_str="+03:00")
+
+
+def test_flatlib_date_format():
+    assert flatlib_date("1990-05-01") == "1990/05/01"
+    assert flatlib_date(" 2026-10-16 ") == "2026/10/16"
+
+
+def test_chart_objects_include_the_outer_planets():
+    assert set(OUTER_PLANETS) <= set(CHART_OBJECTS)
+    assert "Chiron" not in CHART_OBJECTS
+
+
+def test_natal_chart_is_calculated(natal_chart):
+    assert "note" not in natal_chart
+    assert natal_chart["positions"]["Sun"]["sign"] == "Taurus"
+    assert natal_chart["positions"]["Sun"]["lon"] == pytest.approx(40.7, abs=0.1)
+
+
+def test_natal_chart_has_the_outer_planets(natal_chart):
+    positions = natal_chart["positions"]
+    assert [positions[planet]["sign"] for planet in OUTER_PLANETS] == ["Capricorn", "Capricorn", "Scorpio"]
+
+
+def test_natal_houses_come_from_the_house_cusps(natal_chart):
+    positions = natal_chart["positions"]
+    # Around local noon the Sun stands near the Midheaven (10th house);
+    # the old whole-sign fallback (longitude / 30) put it in the 2nd
+    assert positions["Sun"]["house"] == 10
+    assert positions["Ascendant"]["house"] == 1
+    assert positions["Midheaven"]["house"] == 10
+    assert positions["Pluto"]["house"] == 4
+    assert all(1 <= position["house"] <= 12 for position in positions.values())
+
+
+def test_transits_are_calculated():
+    transits = astrology_service.calculate_transits("2026-10-16")
+    assert "note" not in transits
+    positions = transits["positions"]
+    assert set(positions) == set(CHART_OBJECTS)
+    assert positions["Sun"]["sign"] == "Libra"
+    assert [positions[planet]["sign"] for planet in OUTER_PLANETS] == ["Gemini", "Aries", "Aquarius"]
+    assert positions["Pluto"]["lon"] == pytest.approx(303.1, abs=0.1)
@@ -0,0 +1,74 @@
+"""
+Time zone buckets: which (type, time zone, local date) runs are due (prediction_scheduler).
+
+Defaults: send at 07:00 local time, window opens 6 h before and closes 5 h after.
+"""
+from datetime import datetime, date
+from zoneinfo import ZoneInfo
+
+import prediction_scheduler
+from prediction_scheduler import get_due_buckets, due_prediction_types
+
+UTC = ZoneInfo("UTC")
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=UTC)
+
+
+def buckets(timezones, now_utc):
+    return [(kind, tz_name, period_date) for _, kind, tz_name, period_date in get_due_buckets(timezones, now_utc)]
+
+
+def test_due_types_by_local_date():
+    assert due_prediction_types(date(2026, 10, 16)) == ["daily"]              # Friday
+    assert due_prediction_types(date(2026, 10, 18)) == ["daily", "weekly"]    # Sunday
+    assert due_prediction_types(date(2026, 10, 28)) == ["daily", "monthly"]   # Wednesday the 28th
+    assert due_prediction_types(date(2026, 6, 28)) == ["daily", "weekly", "monthly"]  # Sunday the 28th
+
+
+def test_bucket_is_due_inside_its_window_only():
+    # Helsinki is UTC+3 in October: 07:00 local = 04:00 UTC, window 22:00-09:00 UTC
+    assert buckets(["Europe/Helsinki"], utc(2026, 10, 16, 21, 59)) == []
+    assert buckets(["Europe/Helsinki"], utc(2026, 10, 16, 22, 0)) == [("daily", "Europe/Helsinki", "2026-10-17")]
+    assert buckets(["Europe/Helsinki"], utc(2026, 10, 17, 8, 59)) == [("daily", "Europe/Helsinki", "2026-10-17")]
+    assert buckets(["Europe/Helsinki"], utc(2026, 10, 17, 9, 0)) == []
+
+
+def test_send_time_is_local_across_dst():
+    # After the DST change Helsinki is UTC+2: 07:00 local = 05:00 UTC
+    due = get_due_buckets(["Europe/Helsinki"], utc(2026, 11, 2, 5, 0))
+    assert [send_at.astimezone(UTC) for send_at, _, _, _ in due] == [utc(2026, 11, 2, 5, 0)]
+
+
+def test_sunday_and_28th_add_weekly_and_monthly_buckets():
+    assert buckets(["Europe/Helsinki"], utc(2026, 10, 18, 3, 0)) == [
+        ("daily", "Europe/Helsinki", "2026-10-18"),
+        ("weekly", "Europe/Helsinki", "2026-10-18"),
+    ]
+    assert buckets(["Europe/Helsinki"], utc(2026, 10, 28, 3, 0)) == [
+        ("daily", "Europe/Helsinki", "2026-10-28"),
+        ("monthly", "Europe/Helsinki", "2026-10-28"),
+    ]
+
+
+def test_each_time_zone_uses_its_own_local_date():
+    # 02:00 UTC: Tokyo (07:00 JST = 22:00 UTC the day before) and Helsinki are due,
+    # New York (07:00 EDT = 11:00 UTC) is not; the earliest send time comes first
+    now = utc(2026, 10, 17, 2, 0)
+    assert buckets(["Europe/Helsinki", "America/New_York", "Asia/Tokyo"], now) == [
+        ("daily", "Asia/Tokyo", "2026-10-17"),
+        ("daily", "Europe/Helsinki", "2026-10-17"),
+    ]
+
+
+def test_tomorrows_bucket_opens_before_local_midnight(monkeypatch):
+    # With a 10 h lead the 07:00 bucket opens at 21:00 local the evening before
+    monkeypatch.setattr(prediction_scheduler, "PREDICTION_LEAD_MINUTES", 600)
+    assert buckets(["Europe/Helsinki"], utc(2026, 10, 16, 19, 0)) == [("daily", "Europe/Helsinki", "2026-10-17")]
+
+
+def test_unknown_time_zone_is_skipped():
+    assert buckets(["Mars/Olympus_Mons", "Europe/Helsinki"], utc(2026, 10, 17, 3, 0)) == [
+        ("daily", "Europe/Helsinki", "2026-10-17")
+    ]
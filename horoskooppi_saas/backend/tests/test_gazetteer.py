@@ -0,0 +1,123 @@
+"""
+Offline gazetteer: index build from a GeoNames dump, lookups and autocomplete (gazetteer).
+"""
+import zipfile
+
+import pytest
+
+from gazetteer import Gazetteer, build_index, read_geonames, normalize_name, split_country
+
+# geonameid, name, asciiname, alternatenames, lat, lon, class, code, country, cc2,
+# admin1-4, population, elevation, dem, timezone, modified
+CITIES = [
+    ("658225", "Helsinki", "Helsinki", "Helsingfors,Khel'sinki", "60.16952", "24.93545", "FI", "558457", "Europe/Helsinki"),
+    ("655195", "Jyväskylä", "Jyvaskyla", "Jyvaskylae", "62.24147", "25.72088", "FI", "98136", "Europe/Helsinki"),
+    ("4409896", "Springfield", "Springfield", "", "37.21533", "-93.29824", "US", "169176", "America/Chicago"),
+    ("4951788", "Springfield", "Springfield", "", "42.10148", "-72.58981", "US", "155929", "America/New_York"),
+    ("2145214", "Springfield", "Springfield", "", "-27.67010", "153.00917", "AU", "20000", "Australia/Brisbane"),
+    ("2643743", "London", "London", "Lontoo", "51.50853", "-0.12574", "GB", "8961989", "Europe/London"),
+    ("6058560", "London", "London", "", "42.98339", "-81.23304", "CA", "422324", "America/Toronto"),
+    ("2643741", "City of London", "City of London", "", "51.51279", "-0.09184", "GB", "8071", "Europe/London"),
+]
+
+
+def geonames_line(geonameid, name, ascii_name, alternates, lat, lon, country, population, timezone):
+    fields = [geonameid, name, ascii_name, alternates, lat, lon, "P", "PPL", country, "", "", "", "", "",
+              population, "", "", timezone, "2024-01-01"]
+    return "\t".join(fields) + "\n"
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "cities15000.txt"
+    path.write_text("".join(geonames_line(*city) for city in CITIES), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def gazetteer(tmp_path, source):
+    path = str(tmp_path / "gazetteer.bin")
+    build_index(path, read_geonames(str(source)))
+    return Gazetteer(path)
+
+
+def test_normalize_and_split():
+    assert normalize_name("  Jyväskylä ") == "jyvaskyla"
+    assert normalize_name("Saint-Petersburg") == "saint petersburg"
+    assert split_country("Springfield, us") == ("Springfield", "US")
+    assert split_country("Washington, D.C.") == ("Washington, D.C.", None)
+
+
+def test_build_writes_name_and_ascii_name(tmp_path, source):
+    count = build_index(str(tmp_path / "gazetteer.bin"), read_geonames(str(source)))
+    # Jyväskylä and its ASCII name normalise to the same key
+    assert count == len(CITIES)
+
+
+def test_lookup_returns_the_place_with_its_time_zone(gazetteer):
+    place = gazetteer.lookup("Helsinki")
+    assert (place.name, place.country, place.timezone) == ("Helsinki", "FI", "Europe/Helsinki")
+    assert place.lat == pytest.approx(60.1695, abs=1e-4)
+    assert place.lon == pytest.approx(24.9355, abs=1e-4)
+    assert gazetteer.get_stats()["loaded"] is True
+
+
+def test_lookup_ignores_case_accents_and_spacing(gazetteer):
+    assert gazetteer.lookup("JYVÄSKYLÄ").name == "Jyväskylä"
+    assert gazetteer.lookup("jyvaskyla").name == "Jyväskylä"
+    assert gazetteer.lookup("  city   of london ").name == "City of London"
+
+
+def test_lookup_prefers_the_most_populous_place(gazetteer):
+    assert gazetteer.lookup("London").country == "GB"
+    assert gazetteer.lookup("Springfield").timezone == "America/Chicago"
+
+
+def test_lookup_with_a_country_code(gazetteer):
+    assert gazetteer.lookup("London, CA").timezone == "America/Toronto"
+    assert gazetteer.lookup("Springfield, AU").timezone == "Australia/Brisbane"
+    assert gazetteer.lookup("Helsinki, SE") is None
+
+
+def test_unknown_city_is_a_miss(gazetteer):
+    assert gazetteer.lookup("Atlantis") is None
+    assert gazetteer.lookup("") is None
+    assert gazetteer.get_stats()["misses"] == 1
+
+
+def test_alternate_names_are_optional(tmp_path, source):
+    path = str(tmp_path / "alternate.bin")
+    build_index(path, read_geonames(str(source), alternate_names=True))
+    with_alternates = Gazetteer(path)
+    assert with_alternates.lookup("Helsingfors").name == "Helsinki"
+    assert with_alternates.lookup("Lontoo").country == "GB"
+
+
+def test_suggest_lists_most_populous_first(gazetteer):
+    assert [place.country for place in gazetteer.suggest("lon")] == ["GB", "CA"]
+    assert [place.timezone for place in gazetteer.suggest("spring", limit=2)] == ["America/Chicago", "America/New_York"]
+    assert [place.country for place in gazetteer.suggest("spring, AU")] == ["AU"]
+    # Listed once although indexed under both "jyväskylä" and "jyvaskyla"
+    assert len(gazetteer.suggest("jyv")) == 1
+
+
+def test_reads_zipped_dump(tmp_path, source):
+    archive = tmp_path / "cities15000.zip"
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.write(source, "cities15000.txt")
+    assert sorted(key for key, _ in read_geonames(str(archive))) == sorted(key for key, _ in read_geonames(str(source)))
+
+
+def test_missing_file_falls_back_to_built_in_cities(tmp_path):
+    fallback = Gazetteer(str(tmp_path / "missing.bin"))
+    place = fallback.lookup("Tampere")
+    assert place.country is None
+    assert place.timezone == "Europe/Helsinki"
+    assert fallback.lookup("Tampere, FI") == place
+    assert fallback.get_stats()["loaded"] is False
+
+
+def test_corrupt_file_falls_back_to_built_in_cities(tmp_path):
+    path = tmp_path / "corrupt.bin"
+    path.write_bytes(b"not a gazetteer" * 10)
+    assert Gazetteer(str(path)).lookup("Helsinki").country is None
@@ -0,0 +1,69 @@
+"""
+Period keys: one prediction per user, type and period (prediction_runs).
+"""
+from datetime import date, timedelta
+
+from prediction_runs import prediction_period_key, prediction_period_range
+
+
+def test_daily_key_is_the_date():
+    assert prediction_period_key("daily", date(2026, 10, 16)) == "2026-10-16"
+
+
+def test_sunday_run_is_for_the_coming_week():
+    # 2026-10-18 is a Sunday; the week starting Monday 2026-10-19 is ISO week 43
+    assert prediction_period_key("weekly", date(2026, 10, 18)) == "2026-W43"
+
+
+def test_weekly_key_across_the_year_boundary():
+    # Sunday 2026-12-27 -> week of Monday 2026-12-28, the 53rd ISO week of 2026
+    assert prediction_period_key("weekly", date(2026, 12, 27)) == "2026-W53"
+    # Sunday 2027-01-03 -> week of Monday 2027-01-04, week 1 of 2027
+    assert prediction_period_key("weekly", date(2027, 1, 3)) == "2027-W01"
+
+
+def test_weekly_key_is_stable_within_a_run_week():
+    # A late (catch-up) run on Monday still belongs to the same week as Sunday's
+    sunday = date(2026, 10, 18)
+    assert prediction_period_key("weekly", sunday) == prediction_period_key("weekly", sunday + timedelta(days=1))
+
+
+def test_run_on_the_28th_is_for_the_coming_month():
+    assert prediction_period_key("monthly", date(2026, 10, 28)) == "2026-11"
+    assert prediction_period_key("monthly", date(2026, 12, 28)) == "2027-01"
+    assert prediction_period_key("monthly", date(2027, 2, 28)) == "2027-03"
+
+
+def test_period_types_get_distinct_keys():
+    day = date(2026, 10, 18)
+    keys = {prediction_period_key(kind, day) for kind in ("daily", "weekly", "monthly")}
+    assert len(keys) == 3
+
+
+def test_period_range_of_a_sunday_run_is_monday_to_sunday():
+    assert prediction_period_range("weekly", date(2026, 10, 18)) == (date(2026, 10, 19), 7)
+
+
+def test_period_range_of_a_monthly_run_is_the_coming_calendar_month():
+    assert prediction_period_range("monthly", date(2026, 10, 28)) == (date(2026, 11, 1), 30)
+    assert prediction_period_range("monthly", date(2027, 1, 28)) == (date(2027, 2, 1), 28)
+    assert prediction_period_range("monthly", date(2027, 12, 28)) == (date(2028, 1, 1), 31)
+
+
+def test_period_range_matches_the_period_key():
+    # For any run date, the range starts where its period starts and ends before the next one
+    day = date(2026, 1, 1)
+    for _ in range(400):
+        for kind in ("daily", "weekly", "monthly"):
+            start, days = prediction_period_range(kind, day)
+            key = prediction_period_key(kind, day)
+            if kind == "weekly":
+                # The week is keyed like its run date, the Sunday before it
+                assert prediction_period_key(kind, start - timedelta(days=1)) == key
+                assert start.weekday() == 0 and days == 7
+            elif kind == "monthly":
+                assert start.strftime("%Y-%m") == key
+                assert (start + timedelta(days=days)).day == 1
+            else:
+                assert (start, days) == (day, 1)
+        day += timedelta(days=1)
@@ -0,0 +1,77 @@
+"""
+Scheduler leader election: at most one process holds the lease (scheduler_lease).
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from scheduler_lease import LeaderLease
+
+
+@pytest.fixture
+def lease_name(database):
+    """A fresh lease per test."""
+    return f"test-{uuid.uuid4().hex[:8]}"
+
+
+def expire(database, name):
+    """Make the stored lease look like its owner stopped heartbeating."""
+    from models import SchedulerLease
+    db = database.SessionLocal()
+    try:
+        db.query(SchedulerLease).filter(SchedulerLease.name == name).update(
+            {SchedulerLease.expires_at: datetime.utcnow() - timedelta(seconds=1)}
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_first_process_creates_the_lease_and_others_wait(lease_name):
+    first, second = LeaderLease(lease_name), LeaderLease(lease_name)
+
+    assert first.heartbeat() is True
+    assert second.heartbeat() is False
+    assert first.is_leader and not second.is_leader
+    assert first.get_status()["owner"] == first.owner_id
+
+
+def test_owner_keeps_the_lease_by_heartbeat(lease_name):
+    first, second = LeaderLease(lease_name), LeaderLease(lease_name)
+    first.heartbeat()
+
+    for _ in range(3):
+        assert first.heartbeat() is True
+        assert second.heartbeat() is False
+
+
+def test_expired_lease_is_taken_over(database, lease_name):
+    first, second = LeaderLease(lease_name), LeaderLease(lease_name)
+    first.heartbeat()
+
+    expire(database, lease_name)
+    assert second.heartbeat() is True
+    assert second.get_status()["owner"] == second.owner_id
+
+    # The old owner cannot renew or take it back while the new one heartbeats
+    assert first.heartbeat() is False
+    assert not first.is_leader
+
+
+def test_released_lease_is_taken_over_immediately(lease_name):
+    first, second = LeaderLease(lease_name), LeaderLease(lease_name)
+    first.heartbeat()
+
+    first.release()
+    assert not first.is_leader
+    assert second.heartbeat() is True
+
+
+def test_only_one_of_many_processes_takes_over(database, lease_name):
+    owner = LeaderLease(lease_name)
+    owner.heartbeat()
+    expire(database, lease_name)
+
+    candidates = [LeaderLease(lease_name) for _ in range(5)]
+    assert sum(candidate.heartbeat() for candidate in candidates) == 1
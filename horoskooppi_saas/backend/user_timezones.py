@@ -0,0 +1,170 @@
+"""
+Subscriber Time Zones
+
+Scheduled predictions are delivered at 7:00 in each subscriber's own time
+zone. The zone is stored on the user (users.timezone) and comes from, in
+order of preference:
+- An explicit profile setting (IANA name, e.g. "America/New_York")
+- The country entered at checkout
+- The birth city
+- PREDICTION_TIMEZONE (default Europe/Helsinki)
+
+Birth cities are looked up in the offline gazetteer (gazetteer.py) first,
+then in the built-in cities below.
+
+Users without a stored zone are treated as PREDICTION_TIMEZONE.
+"""
+import os
+from datetime import datetime
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from gazetteer import gazetteer
+
+
+DEFAULT_TIMEZONE = os.getenv("PREDICTION_TIMEZONE", "Europe/Helsinki")
+
+# UTC offset of birth times whose time zone is unknown (Finnish standard time)
+DEFAULT_BIRTH_UTC_OFFSET = "+02:00"
+
+# Time zones for the cities in AstrologyService.city_coordinates
+CITY_TIMEZONES = {
+    "helsinki": "Europe/Helsinki",
+    "tampere": "Europe/Helsinki",
+    "turku": "Europe/Helsinki",
+    "oulu": "Europe/Helsinki",
+    "jyväskylä": "Europe/Helsinki",
+    "lahti": "Europe/Helsinki",
+    "kuopio": "Europe/Helsinki",
+    "pori": "Europe/Helsinki",
+    "joensuu": "Europe/Helsinki",
+    "lappeenranta": "Europe/Helsinki",
+    "stockholm": "Europe/Stockholm",
+    "oslo": "Europe/Oslo",
+    "copenhagen": "Europe/Copenhagen",
+    "london": "Europe/London",
+    "paris": "Europe/Paris",
+    "berlin": "Europe/Berlin",
+    "madrid": "Europe/Madrid",
+    "rome": "Europe/Rome",
+    "amsterdam": "Europe/Amsterdam",
+    "vienna": "Europe/Vienna",
+    "brussels": "Europe/Brussels",
+    "zurich": "Europe/Zurich",
+    "moscow": "Europe/Moscow",
+    "warsaw": "Europe/Warsaw",
+    "prague": "Europe/Prague",
+    "budapest": "Europe/Budapest",
+    "athens": "Europe/Athens",
+    "lisbon": "Europe/Lisbon",
+    "dublin": "Europe/Dublin",
+    "new york": "America/New_York",
+    "los angeles": "America/Los_Angeles",
+    "chicago": "America/Chicago",
+    "houston": "America/Chicago",
+    "phoenix": "America/Phoenix",
+    "philadelphia": "America/New_York",
+    "san antonio": "America/Chicago",
+    "san diego": "America/Los_Angeles",
+    "dallas": "America/Chicago",
+    "san jose": "America/Los_Angeles",
+    "tokyo": "Asia/Tokyo",
+    "beijing": "Asia/Shanghai",
+    "shanghai": "Asia/Shanghai",
+    "hong kong": "Asia/Hong_Kong",
+    "singapore": "Asia/Singapore",
+    "sydney": "Australia/Sydney",
+    "melbourne": "Australia/Melbourne",
+    "auckland": "Pacific/Auckland",
+}
+
+# Countries accepted at checkout (same spellings as get_language_from_country)
+COUNTRY_TIMEZONES = {
+    "finland": "Europe/Helsinki", "suomi": "Europe/Helsinki", "fi": "Europe/Helsinki",
+    "sweden": "Europe/Stockholm", "sverige": "Europe/Stockholm", "ruotsi": "Europe/Stockholm", "se": "Europe/Stockholm",
+    "norway": "Europe/Oslo", "norge": "Europe/Oslo", "norja": "Europe/Oslo", "no": "Europe/Oslo",
+    "denmark": "Europe/Copenhagen", "danmark": "Europe/Copenhagen", "tanska": "Europe/Copenhagen", "dk": "Europe/Copenhagen",
+    "germany": "Europe/Berlin", "deutschland": "Europe/Berlin", "saksa": "Europe/Berlin", "de": "Europe/Berlin",
+    "france": "Europe/Paris", "ranska": "Europe/Paris", "fr": "Europe/Paris",
+    "spain": "Europe/Madrid", "españa": "Europe/Madrid", "espanja": "Europe/Madrid", "es": "Europe/Madrid",
+    "italy": "Europe/Rome", "italia": "Europe/Rome", "it": "Europe/Rome",
+}
+
+
+def is_valid_timezone(name: Optional[str]) -> bool:
+    """Check that a name is a known IANA time zone."""
+    if not name:
+        return False
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+
+def timezone_for_city(city: Optional[str]) -> Optional[str]:
+    """Get the time zone of a known city (same matching as the city coordinates)."""
+    if not city:
+        return None
+    place = gazetteer.lookup(city)
+    if place and place.timezone:
+        return place.timezone
+    city_lower = city.lower().strip()
+    if city_lower in CITY_TIMEZONES:
+        return CITY_TIMEZONES[city_lower]
+    for city_key, tz_name in CITY_TIMEZONES.items():
+        if city_key in city_lower or city_lower in city_key:
+            return tz_name
+    return None
+
+
+def utc_offset_at(tz_name: Optional[str], local_date: str, local_time: str) -> str:
+    """
+    Get the UTC offset in force in a time zone at a local date and time.
+
+    Args:
+        tz_name: IANA time zone name (None = unknown)
+        local_date: "YYYY-MM-DD"
+        local_time: "HH:MM"
+
+    Returns:
+        Offset string e.g. "+03:00" (daylight saving time included),
+        DEFAULT_BIRTH_UTC_OFFSET if the zone or the date is not known
+    """
+    if not is_valid_timezone(tz_name):
+        return DEFAULT_BIRTH_UTC_OFFSET
+    try:
+        local = datetime.strptime(f"{local_date.strip()} {local_time.strip()[:5]}", "%Y-%m-%d %H:%M")
+    except (ValueError, AttributeError):
+        return DEFAULT_BIRTH_UTC_OFFSET
+    minutes = int(local.replace(tzinfo=ZoneInfo(tz_name)).utcoffset().total_seconds() // 60)
+    sign = "+" if minutes >= 0 else "-"
+    return f"{sign}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+
+
+def resolve_timezone(
+    explicit: Optional[str] = None,
+    country: Optional[str] = None,
+    birth_city: Optional[str] = None
+) -> str:
+    """
+    Pick the delivery time zone for a user.
+
+    Args:
+        explicit: Time zone chosen by the user (ignored if not a valid IANA name)
+        country: Country from checkout
+        birth_city: Birth city
+
+    Returns:
+        IANA time zone name, DEFAULT_TIMEZONE when nothing matches
+    """
+    if is_valid_timezone(explicit):
+        return explicit
+    if country and country.lower().strip() in COUNTRY_TIMEZONES:
+        return COUNTRY_TIMEZONES[country.lower().strip()]
+    return timezone_for_city(birth_city) or DEFAULT_TIMEZONE
+
+
+def local_now(tz_name: str) -> datetime:
+    """Current wall-clock time in a time zone (naive, for date/hour comparisons)."""
+    return datetime.now(ZoneInfo(tz_name)).replace(tzinfo=None)
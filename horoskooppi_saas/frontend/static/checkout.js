@@ -251,6 +251,37 @@ document.getElementById('phoneForm').addEventListener('submit', async (e) => {
     }
 });
 
+// Birth city autocomplete (offline gazetteer, most populous matches first)
+let birthcityTimer = null;
+let birthcityQuery = '';
+document.getElementById('birthcity').addEventListener('input', (e) => {
+    const query = e.target.value.trim();
+    clearTimeout(birthcityTimer);
+    if (query.length < 2 || query === birthcityQuery) {
+        return;
+    }
+    birthcityTimer = setTimeout(async () => {
+        birthcityQuery = query;
+        try {
+            const response = await fetch(`${API_BASE}/geo/cities?q=${encodeURIComponent(query)}&limit=8`);
+            if (!response.ok) {
+                return;
+            }
+            const result = await response.json();
+            const options = document.getElementById('birthcityOptions');
+            options.innerHTML = '';
+            result.cities.forEach(city => {
+                const option = document.createElement('option');
+                option.value = city.label;
+                options.appendChild(option);
+            });
+        } catch (error) {
+            // Suggestions are optional - the city can still be typed in full
+            console.warn('City suggestions unavailable:', error);
+        }
+    }, 150);
+});
+
 // Birthdate form submission
 document.getElementById('birthdateForm').addEventListener('submit', async (e) => {
     e.preventDefault();